@@ -0,0 +1,103 @@
+"""
+Benchmark the loading of folder based floras.
+
+The metadata loading phase (reading and parsing all `dataherb.json` files)
+and the full `Flora` construction are timed for different flora sizes and
+worker counts. The load time from a flora snapshot is reported as well.
+
+```
+python benchmarks/flora_load.py --sizes 100,1000,5000 --workers 1,2,4,8
+```
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import write_folder_flora
+
+from dataherb.flora import Flora, _load_json
+
+
+def _timeit(func, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="100,1000,5000")
+    parser.add_argument("--workers", default=f"1,2,4,{os.cpu_count()}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="also time the full Flora construction, including herbs",
+    )
+    args = parser.parse_args()
+
+    sizes = [int(i) for i in args.sizes.split(",")]
+    workers = sorted({int(i) for i in args.workers.split(",")})
+
+    print(
+        f"{'herbs':>8} {'loader':>16} {'workers':>8} "
+        f"{'metadata (s)':>14} {'flora (s)':>10}"
+    )
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            flora_path = write_folder_flora(Path(tmp) / "flora" / "bench", size)
+            herb_paths = [
+                f.joinpath("dataherb.json") for f in flora_path.iterdir() if f.is_dir()
+            ]
+
+            configs = [("serial", None, False)]
+            configs += [("threads", w, False) for w in workers]
+            configs += [("processes", w, True) for w in workers]
+
+            for loader, w, use_processes in configs:
+                # an empty flora object only to access the loader
+                fl = Flora.__new__(Flora)
+                fl.workers = w
+                fl.use_processes = use_processes
+                fl.is_aggregated = False
+                fl.workdir = flora_path.parent.parent
+
+                if w is None:
+                    t_meta = _timeit(
+                        lambda: [_load_json(p) for p in herb_paths], args.repeat
+                    )
+                else:
+                    t_meta = _timeit(
+                        lambda: fl._load_herb_jsons(herb_paths),  # noqa: B023
+                        args.repeat,
+                    )
+
+                t_flora = float("nan")
+                if args.full:
+                    t_flora = _timeit(
+                        lambda: Flora(  # noqa: B023
+                            flora_path, workers=w, use_processes=use_processes
+                        ),
+                        1,
+                    )
+
+                print(
+                    f"{size:>8} {loader:>16} {str(w or 1):>8} "
+                    f"{t_meta:>14.4f} {t_flora:>10.4f}"
+                )
+
+            # the first load writes the snapshot, the second one reuses it
+            for loader in ["snapshot (cold)", "snapshot (warm)"]:
+                t_flora = _timeit(
+                    lambda: Flora(flora_path, use_snapshot=True), 1  # noqa: B023
+                )
+                print(f"{size:>8} {loader:>16} {'1':>8} {'':>14} {t_flora:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark the clone modes of `dataherb download` on a local repository with
+a long data history: the bytes of the git objects that are transferred and
+the wall time of each mode.
+
+The repository has a resource that is rewritten in every commit, and a raw
+file that is not a resource, as data repositories often have.
+
+```
+python benchmarks/git_clone.py --commits 30 --size 1000000
+```
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import git
+
+from dataherb.cmd.download import CLONE_MODES, clone_herb
+from dataherb.core.base import Herb
+
+
+def _csv(rng: random.Random, size: int) -> str:
+    rows = ["id,value"]
+    length = len(rows[0]) + 1
+    while length < size:
+        rows.append(f"{len(rows)},{rng.random():.12f}")
+        length += len(rows[-1]) + 1
+
+    return "\n".join(rows) + "\n"
+
+
+def _history_repo(root: Path, commits: int, size: int) -> Path:
+    """a bare repository whose resource has one version per commit"""
+    rng = random.Random(42)
+    work = root / "work"
+    (work / "dataset").mkdir(parents=True)
+    (work / "raw").mkdir()
+    repo = git.Repo.init(work)
+    for i in range(commits):
+        (work / "dataset" / "data.csv").write_text(_csv(rng, size))
+        (work / "raw" / "dump.csv").write_text(_csv(rng, size))
+        repo.index.add(["dataset/data.csv", "raw/dump.csv"])
+        repo.index.commit(f"version {i}")
+
+    bare = root / "remote.git"
+    repo.clone(bare, bare=True)
+    git.Repo(bare).git.config("uploadpack.allowFilter", "true")
+
+    return bare
+
+
+def _objects_bytes(clone: Path) -> int:
+    """bytes of the git objects of a clone, i.e., the bytes transferred"""
+    return sum(
+        p.stat().st_size for p in (clone / ".git" / "objects").rglob("*") if p.is_file()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commits", type=int, default=30)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        bare = _history_repo(root, args.commits, args.size)
+        herb = Herb(
+            {
+                "id": "history",
+                "uri": str(bare),
+                "datapackage": {
+                    "name": "history",
+                    "resources": [{"name": "data", "path": "dataset/data.csv"}],
+                },
+            },
+            base_path=root,
+        )
+
+        print(f"{args.commits} commits of two {args.size / 1e6:.1f} MB files")
+        print(f'{"mode":>10} {"objects MB":>12} {"seconds":>10}')
+        for mode in CLONE_MODES:
+            destination = root / "clones" / mode
+            start = time.perf_counter()
+            clone_herb(herb, destination, mode=mode)
+            seconds = time.perf_counter() - start
+            megabytes = _objects_bytes(destination) / 1e6
+            print(f"{mode:>10} {megabytes:>12.2f} {seconds:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
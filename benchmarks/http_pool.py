@@ -0,0 +1,87 @@
+"""
+Benchmark fetching many small files from a local http server, with the
+pooled session shared by `get_data_from_url` and with a new session for
+every request.
+
+```
+python benchmarks/http_pool.py --files 200
+```
+"""
+import argparse
+import functools
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from dataherb.fetch.remote import configure_pool, get_data_from_url, new_session
+
+
+class Handler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _fetch_unpooled(url: str):
+    with new_session() as session:
+        return get_data_from_url(url, session=session)
+
+
+def _timeit(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        for i in range(args.files):
+            (root / f"herb-{i}.json").write_text(f'{{"id": "herb-{i}"}}')
+
+        server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), functools.partial(Handler, directory=tmp)
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+        urls = [f"http://{host}:{port}/herb-{i}.json" for i in range(args.files)]
+
+        configure_pool(pool_maxsize=args.threads)
+
+        def _serial(fetch):
+            return lambda: [fetch(u) for u in urls]
+
+        def _threaded(fetch):
+            def _run():
+                with ThreadPoolExecutor(max_workers=args.threads) as executor:
+                    list(executor.map(fetch, urls))
+
+            return _run
+
+        timings = {
+            "unpooled, serial": _timeit(_serial(_fetch_unpooled)),
+            "pooled, serial": _timeit(_serial(get_data_from_url)),
+            f"unpooled, {args.threads} threads": _timeit(_threaded(_fetch_unpooled)),
+            f"pooled, {args.threads} threads": _timeit(_threaded(get_data_from_url)),
+        }
+
+        server.shutdown()
+        server.server_close()
+
+    print(f"Fetching {args.files} files")
+    for name, seconds in timings.items():
+        print(f"{name:>24}: {seconds * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark the keyword search on a synthetic flora.
+
+The per-herb scoring of `search_by_keywords_in_flora` is compared with the
+batch scoring of `FuzzySearchEngine`.
+
+```
+python benchmarks/search.py --size 10000 --keywords "covid europe" "salary"
+```
+"""
+import argparse
+import time
+from pathlib import Path
+
+from synthetic import synthetic_flora
+
+from dataherb.core.base import Herb
+from dataherb.core.search import search_by_keywords_in_flora
+from dataherb.core.search_engine import FuzzySearchEngine
+
+
+def _timeit(func, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--keywords", nargs="+", default=["covid europe", "salary"])
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    herbs = [
+        Herb(h, base_path=Path("/nonexistent")) for h in synthetic_flora(args.size)
+    ]
+
+    t_build = _timeit(lambda: FuzzySearchEngine(herbs), 1)
+    engine = FuzzySearchEngine(herbs)
+
+    timings = {
+        "per herb": _timeit(
+            lambda: search_by_keywords_in_flora(herbs, args.keywords), args.repeat
+        ),
+        "batch": _timeit(lambda: engine.search(args.keywords), args.repeat),
+        f"batch, top {args.limit}": _timeit(
+            lambda: engine.search(args.keywords, limit=args.limit), args.repeat
+        ),
+    }
+
+    print(f"{args.size} herbs, {len(engine.choices)} choices, keywords {args.keywords}")
+    print(f"engine build: {t_build:.4f} s")
+    for name, t in timings.items():
+        print(f"{name:>16}: {t:.4f} s")
+
+
+if __name__ == "__main__":
+    main()
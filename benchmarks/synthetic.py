@@ -0,0 +1,105 @@
+"""
+Helpers to generate synthetic floras for the benchmarks.
+"""
+import json
+import random
+from pathlib import Path
+from typing import List, Optional
+
+WORDS = [
+    "covid",
+    "europe",
+    "freight",
+    "motorway",
+    "network",
+    "salary",
+    "science",
+    "job",
+    "ufo",
+    "records",
+    "geography",
+    "shapes",
+    "nuts",
+    "transport",
+    "population",
+    "climate",
+    "energy",
+    "finance",
+    "health",
+    "education",
+]
+
+
+def synthetic_herb(i: int, rng: Optional[random.Random] = None) -> dict:
+    """Generate the metadata of a herb
+
+    :param i: index of the herb, used in the id
+    :param rng: random number generator
+    """
+    if rng is None:
+        rng = random.Random(i)
+
+    words = rng.sample(WORDS, 4)
+    fields = rng.sample(WORDS, 3)
+
+    return {
+        "id": f"dataset-{'-'.join(words[:2])}-{i}",
+        "name": " ".join(words[:3]),
+        "description": f"A synthetic dataset about {' and '.join(words)}.",
+        "tags": words[2:],
+        "source": rng.choice(["git", "s3"]),
+        "uri": f"https://github.com/DataHerb/dataset-{i}.git",
+        "metadata_uri": (
+            f"https://raw.githubusercontent.com/DataHerb/dataset-{i}/main/dataherb.json"
+        ),
+        "datapackage": {
+            "resources": [
+                {
+                    "name": f"{words[0]}_{i}",
+                    "path": f"dataset/{words[0]}_{i}.csv",
+                    "format": "csv",
+                    "schema": {
+                        "fields": [{"name": f, "type": "string"} for f in fields]
+                    },
+                }
+            ]
+        },
+    }
+
+
+def synthetic_flora(n: int, seed: int = 42) -> List[dict]:
+    """Generate the metadata of n herbs
+
+    :param n: number of herbs
+    :param seed: random seed
+    """
+    rng = random.Random(seed)
+    return [synthetic_herb(i, rng) for i in range(n)]
+
+
+def write_folder_flora(path: Path, n: int) -> Path:
+    """Write a folder based flora with n herbs
+
+    :param path: folder of the flora
+    :param n: number of herbs
+    """
+    for herb in synthetic_flora(n):
+        herb_path = path / herb["id"]
+        herb_path.mkdir(parents=True, exist_ok=True)
+        with open(herb_path / "dataherb.json", "w") as fp:
+            json.dump(herb, fp, indent=4)
+
+    return path
+
+
+def write_aggregated_flora(path: Path, n: int) -> Path:
+    """Write an aggregated flora with n herbs
+
+    :param path: path to the flora json file
+    :param n: number of herbs
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as fp:
+        json.dump(synthetic_flora(n), fp, indent=4)
+
+    return path
@@ -0,0 +1,304 @@
+import errno
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from stat import S_IMODE, S_IWGRP, S_IWOTH, S_IWUSR
+from typing import Any, Dict, Iterator, List, Optional, cast
+
+from loguru import logger
+
+from dataherb.fetch.download import CHUNK_SIZE, parse_hash
+from dataherb.utils.configs import Config
+from dataherb.utils.files import atomic_write_bytes
+
+logger.remove()
+logger.add(sys.stderr, level="INFO", enqueue=True)
+
+
+# ioctl of linux to share the extents of a file, e.g., on btrfs and xfs
+FICLONE = 0x40049409
+
+LINK_MODES = ["auto", "reflink", "hardlink", "copy"]
+
+
+def reflink(source: Path, destination: Path) -> None:
+    """
+    reflink creates a copy-on-write clone of the source, which shares the
+    data on disk until one of the files is modified
+
+    :raises OSError: if the filesystem does not support reflinks
+    """
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.EOPNOTSUPP, "reflinks are not supported")
+
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.unlink(destination)
+            raise
+
+
+def make_read_only(path: Path) -> None:
+    """remove the write permissions of a file, so that writing to it in
+    place fails"""
+    mode = S_IMODE(os.stat(path).st_mode)
+    if mode & (S_IWUSR | S_IWGRP | S_IWOTH):
+        os.chmod(path, mode & ~(S_IWUSR | S_IWGRP | S_IWOTH))
+
+
+def _hash_file(path: Path, algorithms=("sha256",)) -> Dict[str, str]:
+    hashers = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE), b""):
+            for hasher in hashers.values():
+                hasher.update(chunk)
+
+    return {algorithm: hasher.hexdigest() for algorithm, hasher in hashers.items()}
+
+
+class BlobStore:
+    """
+    BlobStore keeps each distinct file once, under the sha256 of its
+    content, and exposes the files in the herbs through links to the blobs.
+
+    A file is linked with a reflink if the filesystem supports it, which is
+    copy-on-write; otherwise with a hard link, which shares the data with
+    every herb that contains the same file; otherwise the file is copied.
+    Blobs and herbs must be on the same filesystem for links.
+
+    Blobs are read-only, and so are the files hard linked to them, so that
+    writing to such a file in place fails instead of changing the file in
+    every herb; replace the file instead, e.g., write a new file and
+    rename it.
+
+    The store also remembers the other hashes of the blobs, e.g., the md5
+    in the datapackage, so that a resource with a known hash is linked
+    instead of downloaded.
+
+    ```python
+    store = BlobStore(Path("~/dataherb/.cache/blobs").expanduser())
+    store.dedupe(Path("~/dataherb").expanduser())
+    ```
+
+    :param path: folder of the blobs
+    :param mode: how the files are linked to the blobs: `auto`, `reflink`,
+        `hardlink` or `copy`
+    """
+
+    def __init__(self, path: Path, mode: str = "auto"):
+        if mode not in LINK_MODES:
+            raise Exception(f"Unknown link mode {mode}, use one of {LINK_MODES}")
+        self.path = Path(path)
+        self.mode = mode
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> Optional["BlobStore"]:
+        """
+        the store in the `.cache/blobs` folder of the dataherb workdir, or
+        None if dataherb is not configured
+        """
+        c = Config()
+        if not cast(Path, c.config_path).exists():
+            return None
+
+        return cls(Path(c.workdir) / ".cache" / "blobs")
+
+    @property
+    def aliases_path(self) -> Path:
+        return self.path / "aliases.json"
+
+    def blob_path(self, digest: str) -> Path:
+        """path of the blob with the sha256 digest"""
+        return self.path / digest[:2] / digest
+
+    def blobs(self) -> Iterator[Path]:
+        """paths of all the blobs"""
+        return (p for p in self.path.glob("??/*") if not p.name.startswith("."))
+
+    def _aliases(self) -> Dict[str, str]:
+        try:
+            return json.loads(self.aliases_path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def lookup(self, hash: str) -> Optional[Path]:
+        """
+        the blob with the hash, or None if there is no such blob
+
+        :param hash: hash of the file, e.g., `sha256:...`, or an md5 hex
+            digest as in datapackages, see `parse_hash`
+        """
+        algorithm, digest = parse_hash(hash)
+        if algorithm != "sha256":
+            digest = self._aliases().get(f"{algorithm}:{digest}", "")
+        blob = self.blob_path(digest) if digest else None
+
+        return blob if blob is not None and blob.exists() else None
+
+    def _link(self, blob: Path, destination: Path) -> str:
+        """link the destination to the blob; return how it is linked"""
+        modes = ["reflink", "hardlink", "copy"] if self.mode == "auto" else [self.mode]
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(
+            dir=destination.parent, prefix=f".{destination.name}."
+        )
+        os.close(fd)
+        os.unlink(tmp)
+        try:
+            for mode in modes:
+                try:
+                    if mode == "reflink":
+                        reflink(blob, Path(tmp))
+                    elif mode == "hardlink":
+                        os.link(blob, tmp)
+                    else:
+                        shutil.copyfile(blob, tmp)
+                    break
+                except OSError as e:
+                    if mode == modes[-1]:
+                        raise
+                    logger.debug(f"Can not {mode} {blob} to {destination}: {e}")
+            os.replace(tmp, destination)
+        finally:
+            if os.path.lexists(tmp):
+                os.unlink(tmp)
+
+        return mode
+
+    def link(self, hash: str, destination: Path) -> Optional[str]:
+        """
+        link the destination to the blob with the hash
+
+        :param hash: hash of the file, see `lookup`
+        :param destination: path of the file
+        :return: how the file is linked, `reflink`, `hardlink` or `copy`;
+            None if there is no such blob
+        """
+        blob = self.lookup(hash)
+        if blob is None:
+            return None
+
+        return self._link(blob, Path(destination))
+
+    def add(
+        self, path: Path, hash: Optional[str] = None, link: bool = True
+    ) -> Dict[str, Any]:
+        """
+        add a file to the store, and replace the file with a link to the
+        blob
+
+        :param path: path of the file
+        :param hash: another hash of the file to remember, e.g., the hash of
+            the datapackage resource, see `parse_hash`
+        :param link: replace the file with a link to the blob
+        :return: the `digest` of the blob, whether the blob is `new`, and
+            how the file is `linked`, if it is linked
+        """
+        path = Path(path)
+        algorithm, digest = parse_hash(hash) if hash else ("sha256", "")
+        digests = _hash_file(path, {"sha256", algorithm})
+        if hash and digests[algorithm] != digest:
+            raise Exception(f"{algorithm} of {path} does not match {hash}")
+
+        return self._add(path, digests, link=link)
+
+    def _add(self, path: Path, digests: Dict[str, str], link: bool) -> Dict[str, Any]:
+        """add a file whose digests are known, see `add`"""
+        blob = self.blob_path(digests["sha256"])
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        new = not blob.exists()
+        if new:
+            self._link(path, blob)
+        make_read_only(blob)
+
+        aliases = {a: d for a, d in digests.items() if a != "sha256"}
+        if aliases:
+            with self._lock:
+                known = self._aliases()
+                keys = {f"{a}:{d}" for a, d in aliases.items()}
+                if any(known.get(key) != digests["sha256"] for key in keys):
+                    known.update({key: digests["sha256"] for key in keys})
+                    atomic_write_bytes(
+                        self.aliases_path, json.dumps(known).encode("utf-8")
+                    )
+
+        linked = None
+        if link and not new and not os.path.samefile(path, blob):
+            linked = self._link(blob, path)
+
+        return {"digest": digests["sha256"], "new": new, "linked": linked}
+
+    def dedupe(self, root: Path, min_bytes: int = 1) -> Dict[str, int]:
+        """
+        dedupe links the files under the root, e.g., the herbs in the
+        workdir, to the blobs, so that files with the same content share
+        their data.
+
+        Only the files whose size matches another file or a blob are
+        hashed, and only the files with the content of another file or of a
+        blob are added to the store; the other files are left as they are.
+        Hidden folders, e.g., `.git` and `.cache`, are skipped.
+
+        :param root: folder of the files
+        :param min_bytes: files smaller than min_bytes are skipped
+        :return: the number of `files` looked at, and of the `hashed` and
+            `linked` files, the number of `blobs`, and the `bytes_saved`
+        """
+        root = Path(root)
+        by_size: Dict[int, list] = {}
+        inodes = set()
+        for blob in self.blobs():
+            stat = blob.stat()
+            by_size.setdefault(stat.st_size, []).append(None)
+            inodes.add((stat.st_dev, stat.st_ino))
+
+        files = 0
+        for folder, dirs, names in os.walk(root):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in names:
+                path = Path(folder) / name
+                if name.startswith(".") or path.is_symlink():
+                    continue
+                stat = path.stat()
+                if stat.st_size < min_bytes:
+                    continue
+                files += 1
+                # hard links to a blob are already deduplicated
+                if (stat.st_dev, stat.st_ino) not in inodes:
+                    by_size.setdefault(stat.st_size, []).append(path)
+
+        stats = {"files": files, "hashed": 0, "linked": 0, "bytes_saved": 0}
+        for size, paths in by_size.items():
+            if len(paths) < 2:
+                continue
+            by_digest: Dict[str, List[Path]] = {}
+            for path in paths:
+                if path is None:
+                    continue
+                digest = _hash_file(path)["sha256"]
+                by_digest.setdefault(digest, []).append(path)
+                stats["hashed"] += 1
+
+            for digest, same in by_digest.items():
+                if len(same) < 2 and not self.blob_path(digest).exists():
+                    continue
+                for path in same:
+                    result = self._add(path, {"sha256": digest}, link=True)
+                    if result["linked"] in ("reflink", "hardlink"):
+                        stats["linked"] += 1
+                        stats["bytes_saved"] += size
+
+        stats["blobs"] = sum(1 for _ in self.blobs())
+        logger.debug(f"Deduplicated {root}: {stats}")
+
+        return stats
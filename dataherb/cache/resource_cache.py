@@ -0,0 +1,530 @@
+import atexit
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple, cast
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore[assignment]
+
+from loguru import logger
+
+from dataherb.fetch.download import CHUNK_SIZE, download_file
+from dataherb.utils.configs import Config
+from dataherb.utils.files import atomic_write_bytes
+
+logger.remove()
+logger.add(sys.stderr, level="INFO", enqueue=True)
+
+
+DEFAULT_MAX_BYTES = 10 * 1024**3
+
+MANIFEST_VERSION = 1
+
+# seconds between the writes of the access times of cache hits
+FLUSH_INTERVAL = 60.0
+
+
+def sha256_file(path: Path) -> str:
+    """sha256 hex digest of a file, read in chunks"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+
+def _suffix(url: str) -> str:
+    """file extension of the url, so that the format of a cached file can
+    still be inferred"""
+    suffix = PurePosixPath(urlparse(url).path).suffix
+    return suffix if suffix[1:].isalnum() else ""
+
+
+class ResourceCache:
+    """
+    ResourceCache keeps the resource files fetched from remote herbs in a
+    folder, so that repeated reads of a resource are served from the local
+    disk.
+
+    The files are stored by the sha256 of their content, so that the same
+    file published at different urls is only stored once. A sidecar
+    `manifest.json` maps the urls to the files and records the size and the
+    last access of each file. Once the files exceed `max_bytes`, the least
+    recently used files are evicted.
+
+    Cache hits only read the manifest, which is kept in memory until it
+    changes on disk. Their access times are written with the next change
+    of the manifest, at most every `flush_interval` seconds, and at exit for
+    the caches of `default`. Changes of the manifest are serialized by a
+    file lock, `.lock`, so that several processes can share the cache.
+
+    A cached file is checked against the `hash` and `bytes` of the resource
+    if they are given; otherwise it is used until it is evicted or pruned.
+
+    ```python
+    cache = ResourceCache(Path("~/dataherb/.cache/resources").expanduser())
+    path = cache.fetch("https://example.com/data.csv")
+    ```
+
+    :param path: folder of the cache
+    :param max_bytes: byte budget of the cache
+    :param flush_interval: seconds between the writes of the access times of
+        cache hits
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+        flush_interval: float = FLUSH_INTERVAL,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_file: Optional[IO[bytes]] = None
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._manifest_stamp: Optional[Tuple[int, int, int]] = None
+        self._accessed: Dict[str, float] = {}
+        self._hits = 0
+        self._misses = 0
+        self._flushed_at = time.monotonic()
+        self._download_locks: Dict[str, threading.Lock] = {}
+
+    @classmethod
+    def default(cls) -> Optional["ResourceCache"]:
+        """
+        the cache in the `.cache/resources` folder of the dataherb workdir,
+        with the budget in `cache.max_bytes` of the config; None if dataherb
+        is not configured. The same instance is returned for the same
+        folder and budget.
+        """
+        c = Config()
+        if not cast(Path, c.config_path).exists():
+            return None
+
+        key = (Path(c.workdir) / ".cache" / "resources", c.cache_max_bytes)
+        with _instances_lock:
+            if key not in _instances:
+                _instances[key] = cls(*key)
+
+            return _instances[key]
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.path / "manifest.json"
+
+    @property
+    def lock_path(self) -> Path:
+        return self.path / ".lock"
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """hold the lock of the threads and the file lock of the processes"""
+        with self._lock:
+            self._lock_depth += 1
+            try:
+                if self._lock_depth == 1 and fcntl is not None:
+                    self.path.mkdir(parents=True, exist_ok=True)
+                    self._lock_file = open(self.lock_path, "ab")
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+                yield
+            finally:
+                if self._lock_depth == 1 and self._lock_file is not None:
+                    # closing the file releases the file lock
+                    self._lock_file.close()
+                    self._lock_file = None
+                self._lock_depth -= 1
+
+    def _stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = self.manifest_path.stat()
+        except OSError:
+            return None
+
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _load(self) -> Dict[str, Any]:
+        """read the manifest from disk, for changes of the manifest"""
+        manifest: Dict[str, Any] = {}
+        try:
+            manifest = json.loads(self.manifest_path.read_text())
+        except (OSError, ValueError):
+            pass
+        if manifest.get("version") != MANIFEST_VERSION:
+            manifest = {
+                "version": MANIFEST_VERSION,
+                "entries": {},
+                "urls": {},
+                "hits": 0,
+                "misses": 0,
+            }
+
+        return manifest
+
+    def _cached(self) -> Dict[str, Any]:
+        """the manifest, read again only if it has changed on disk; it must
+        not be modified"""
+        stamp = self._stamp()
+        if self._manifest is None or stamp is None or stamp != self._manifest_stamp:
+            self._manifest = self._load()
+            self._manifest_stamp = stamp
+
+        return self._manifest
+
+    def _save(self, manifest: Dict[str, Any]) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(
+            self.manifest_path, json.dumps(manifest, indent=1).encode("utf-8")
+        )
+        self._manifest = manifest
+        self._manifest_stamp = self._stamp()
+
+    def _apply_pending(self, manifest: Dict[str, Any]) -> None:
+        """add the access times and the counts of the lookups that have not
+        been written yet to the manifest"""
+        for digest, accessed in self._accessed.items():
+            entry = manifest["entries"].get(digest)
+            if entry is not None:
+                entry["accessed"] = max(entry["accessed"], accessed)
+        manifest["hits"] += self._hits
+        manifest["misses"] += self._misses
+        self._accessed = {}
+        self._hits = self._misses = 0
+        self._flushed_at = time.monotonic()
+
+    def flush(self) -> None:
+        """write the access times and the counts of the lookups to the
+        manifest"""
+        with self._lock:
+            if not (self._accessed or self._hits or self._misses):
+                return
+            with self._locked():
+                manifest = self._load()
+                self._apply_pending(manifest)
+                self._save(manifest)
+
+    def file_path(self, entry: Dict[str, Any]) -> Path:
+        """path of the cached file of a manifest entry"""
+        return self.path / entry["file"]
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """
+        the cached files, most recently used first; each entry has the
+        `digest`, `file`, `size`, `accessed` and `created` of the file, and
+        the `urls` it was fetched from
+        """
+        self.flush()
+        with self._lock:
+            manifest = self._cached()
+
+        urls: Dict[str, List[str]] = {}
+        for url, ref in manifest["urls"].items():
+            urls.setdefault(ref["digest"], []).append(url)
+
+        return sorted(
+            (
+                {"digest": digest, **entry, "urls": sorted(urls.get(digest, []))}
+                for digest, entry in manifest["entries"].items()
+            ),
+            key=lambda entry: entry["accessed"],
+            reverse=True,
+        )
+
+    def get(
+        self, url: str, hash: Optional[str] = None, bytes: Optional[int] = None
+    ) -> Optional[Path]:
+        """
+        the cached file of the url, or None if it is not cached
+
+        :param url: url of the file
+        :param hash: expected hash of the file, e.g., of the datapackage
+            resource; a file cached with another hash is outdated.
+        :param bytes: expected size of the file; a cached file of another
+            size is outdated.
+        """
+        with self._lock:
+            path = self._lookup(url, hash=hash, bytes=bytes)
+            if path is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+
+            if time.monotonic() - self._flushed_at >= self.flush_interval:
+                self.flush()
+
+        return path
+
+    def _lookup(
+        self, url: str, hash: Optional[str] = None, bytes: Optional[int] = None
+    ) -> Optional[Path]:
+        """the cached file of the url, see `get`, without counting the hit"""
+        manifest = self._cached()
+        ref = manifest["urls"].get(url)
+        entry = manifest["entries"].get(ref["digest"]) if ref else None
+        if entry is not None and hash and ref.get("hash") != hash:
+            entry = None
+        if entry is not None and bytes is not None and entry["size"] != bytes:
+            entry = None
+        if entry is None or not self.file_path(entry).exists():
+            return None
+
+        self._accessed[ref["digest"]] = time.time()
+
+        return self.file_path(entry)
+
+    def _open_download_lock(self, key: str, blocking: bool) -> Optional[IO[bytes]]:
+        """
+        open and lock the lock file of a download in `.downloads`; None if
+        not blocking and the lock is held by another download
+        """
+        path = self.path / ".downloads" / f"{key}.lock"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        while True:
+            fp = open(path, "ab")
+            try:
+                fcntl.flock(fp.fileno(), flags)
+            except BlockingIOError:
+                fp.close()
+                return None
+            try:
+                if os.fstat(fp.fileno()).st_ino == os.stat(path).st_ino:
+                    return fp
+            except FileNotFoundError:
+                pass
+            # prune removed the lock file while we waited for the lock
+            fp.close()
+
+    @contextmanager
+    def _download_lock(self, key: str, blocking: bool = True) -> Iterator[bool]:
+        """
+        hold the lock of the download of a url, so that the threads and
+        processes download the url one at a time; yields whether the lock is
+        held, which is always the case if blocking
+
+        :param key: key of the url
+        :param blocking: wait for the lock
+        """
+        if fcntl is None:
+            with self._lock:
+                lock = self._download_locks.setdefault(key, threading.Lock())
+            acquired = lock.acquire(blocking)
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    lock.release()
+            return
+
+        fp = self._open_download_lock(key, blocking)
+        try:
+            yield fp is not None
+        finally:
+            if fp is not None:
+                # closing the file releases the file lock
+                fp.close()
+
+    def put(self, source: Path, url: str, hash: Optional[str] = None) -> Path:
+        """
+        move a file into the cache as the content of the url, and evict the
+        least recently used files if the cache exceeds its budget
+
+        :param source: the file, which is moved into the cache
+        :param url: url of the file
+        :param hash: hash of the file as given by the datapackage resource
+        :return: path of the cached file
+        """
+        source = Path(source)
+        digest = sha256_file(source)
+        now = time.time()
+        with self._locked():
+            manifest = self._load()
+            self._apply_pending(manifest)
+            entry = manifest["entries"].get(digest)
+            if entry is None:
+                entry = {
+                    "file": f"{digest}{_suffix(url)}",
+                    "size": source.stat().st_size,
+                    "created": now,
+                }
+                manifest["entries"][digest] = entry
+            path = self.file_path(entry)
+            if path.exists():
+                source.unlink()
+            else:
+                os.replace(source, path)
+            entry["accessed"] = now
+            manifest["urls"][url] = {"digest": digest, "hash": hash}
+
+            self._evict(manifest, self.max_bytes, keep=digest)
+            self._save(manifest)
+
+        return path
+
+    def fetch(
+        self,
+        url: str,
+        bytes: Optional[int] = None,
+        hash: Optional[str] = None,
+        siblings: bool = False,
+    ) -> Path:
+        """
+        the cached file of the url, downloading it into the cache first if
+        it is not cached yet, see `download_file`
+
+        A url is downloaded by one thread or process at a time; the others
+        wait for the download and use the cached file.
+
+        :param url: url of the file
+        :param bytes: expected size of the file
+        :param hash: expected hash of the file, see `parse_hash`
+        :param siblings: look for precompressed siblings of the url
+        :return: path of the cached file
+        """
+        path = self.get(url, hash=hash, bytes=bytes)
+        if path is not None:
+            logger.debug(f"Using cached {url}: {path}")
+            return path
+
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        with self._download_lock(key):
+            with self._lock:
+                path = self._lookup(url, hash=hash, bytes=bytes)
+            if path is not None:
+                logger.debug(f"Using {url} downloaded by another process: {path}")
+                return path
+
+            # interrupted downloads are resumed from here
+            download = download_file(
+                url,
+                self.path / ".downloads" / key,
+                bytes=bytes,
+                hash=hash,
+                overwrite=True,
+                siblings=siblings,
+            )
+
+            return self.put(download, url, hash=hash)
+
+    def _evict(
+        self,
+        manifest: Dict[str, Any],
+        max_bytes: Optional[int],
+        keep: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """remove the least recently used entries until the cache fits in
+        max_bytes"""
+        entries = manifest["entries"]
+        total = sum(entry["size"] for entry in entries.values())
+        evicted: List[Dict[str, Any]] = []
+        if max_bytes is None:
+            return evicted
+
+        for digest, entry in sorted(entries.items(), key=lambda e: e[1]["accessed"]):
+            if total <= max_bytes:
+                break
+            if digest == keep:
+                continue
+            self.file_path(entry).unlink(missing_ok=True)
+            del entries[digest]
+            total -= entry["size"]
+            evicted.append({"digest": digest, **entry})
+
+        if total > max_bytes:
+            logger.warning(
+                f"Resource cache {self.path} uses {total} bytes, "
+                f"more than its budget of {max_bytes} bytes"
+            )
+        manifest["urls"] = {
+            url: ref
+            for url, ref in manifest["urls"].items()
+            if ref["digest"] in entries
+        }
+
+        return evicted
+
+    def prune(self, max_bytes: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        evict the least recently used files until the cache fits in the
+        budget, and remove the files that are not in the manifest, e.g.,
+        abandoned downloads; downloads in progress are kept
+
+        :param max_bytes: budget of the cache; defaults to `max_bytes` of
+            the cache, use 0 to empty the cache.
+        :return: the evicted entries
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+
+        with self._locked():
+            manifest = self._load()
+            self._apply_pending(manifest)
+            for digest, entry in list(manifest["entries"].items()):
+                if not self.file_path(entry).exists():
+                    del manifest["entries"][digest]
+            evicted = self._evict(manifest, max_bytes)
+            self._save(manifest)
+
+            files = {entry["file"] for entry in manifest["entries"].values()}
+            for path in self.path.glob("*"):
+                # temporary files of the manifest start with a dot
+                if path.is_file() and not path.name.startswith("."):
+                    if path.name not in files | {self.manifest_path.name}:
+                        path.unlink()
+            keys = {p.name.split(".")[0] for p in self.path.glob(".downloads/*")}
+            for key in keys:
+                with self._download_lock(key, blocking=False) as acquired:
+                    if not acquired:
+                        logger.debug(f"Keeping download {key} in progress")
+                        continue
+                    for path in self.path.glob(f".downloads/{key}*"):
+                        path.unlink()
+
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        size and usage of the cache: the number of `files` and `urls`, the
+        `bytes` of the files and the `max_bytes`, and the `hits` and
+        `misses` of the lookups
+        """
+        self.flush()
+        with self._lock:
+            manifest = self._cached()
+
+        lookups = manifest["hits"] + manifest["misses"]
+        return {
+            "path": str(self.path),
+            "files": len(manifest["entries"]),
+            "urls": len(manifest["urls"]),
+            "bytes": sum(entry["size"] for entry in manifest["entries"].values()),
+            "max_bytes": self.max_bytes,
+            "hits": manifest["hits"],
+            "misses": manifest["misses"],
+            "hit_rate": manifest["hits"] / lookups if lookups else 0.0,
+        }
+
+
+_instances: Dict[Tuple[Path, Optional[int]], ResourceCache] = {}
+_instances_lock = threading.Lock()
+
+
+@atexit.register
+def _flush_instances() -> None:
+    for cache in list(_instances.values()):
+        try:
+            cache.flush()
+        except OSError as e:
+            logger.debug(f"Can not write the resource cache {cache.path}: {e}")
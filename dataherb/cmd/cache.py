@@ -0,0 +1,62 @@
+import time
+from typing import Any, Dict, List, Optional
+
+from rich.table import Table
+
+
+def format_bytes(size: Optional[float]) -> str:
+    """Format a number of bytes for humans, e.g., 1.5 MiB"""
+    if size is None:
+        return "unlimited"
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+    return f"{size:.1f} TiB"
+
+
+def cache_table(entries: List[Dict[str, Any]]) -> Table:
+    """Table of the files in the resource cache, most recently used first
+
+    :param entries: entries of the cache, see `ResourceCache.entries`
+    """
+    table = Table(title="DataHerb resource cache")
+
+    table.add_column("file", style="cyan", no_wrap=True)
+    table.add_column("size", justify="right", style="magenta")
+    table.add_column("last access", style="green")
+    table.add_column("urls", no_wrap=False)
+
+    for entry in entries:
+        table.add_row(
+            entry["file"][:12],
+            format_bytes(entry["size"]),
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["accessed"])),
+            "\n".join(entry["urls"]),
+        )
+
+    return table
+
+
+def stats_table(stats: Dict[str, Any]) -> Table:
+    """Table of the usage of the resource cache
+
+    :param stats: usage of the cache, see `ResourceCache.stats`
+    """
+    table = Table(title="DataHerb resource cache")
+
+    table.add_column("key", justify="right", style="cyan")
+    table.add_column("value", style="magenta")
+
+    table.add_row("Path", stats["path"])
+    table.add_row("Files", f'{stats["files"]}')
+    table.add_row("URLs", f'{stats["urls"]}')
+    table.add_row(
+        "Size", f'{format_bytes(stats["bytes"])} of {format_bytes(stats["max_bytes"])}'
+    )
+    table.add_row("Hits", f'{stats["hits"]}')
+    table.add_row("Misses", f'{stats["misses"]}')
+    table.add_row("Hit rate", f'{stats["hit_rate"]:.1%}')
+
+    return table
@@ -0,0 +1,262 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import git
+from loguru import logger
+from rich.table import Table
+
+from dataherb.cache.blob_store import BlobStore
+from dataherb.core.base import Herb
+
+logger.remove()
+logger.add(sys.stderr, level="INFO", enqueue=True)
+
+
+ProgressCallback = Callable[[str, str, Optional[float]], None]
+
+
+GIT_STAGES = {
+    git.RemoteProgress.COUNTING: "counting",
+    git.RemoteProgress.COMPRESSING: "compressing",
+    git.RemoteProgress.RECEIVING: "receiving",
+    git.RemoteProgress.RESOLVING: "resolving",
+    git.RemoteProgress.CHECKING_OUT: "checking out",
+}
+
+
+def git_progress(id: str, callback: ProgressCallback):
+    """Forward the progress of a git clone of a herb to a callback
+
+    :param id: id of the herb
+    :param callback: called with the id of the herb, a message and the
+        fraction of the current stage that is done, if known
+    """
+
+    def update(op_code, cur_count, max_count=None, message=""):
+        stage = GIT_STAGES.get(op_code & git.RemoteProgress.OP_MASK, "cloning")
+        fraction = float(cur_count) / float(max_count) if max_count else None
+        callback(id, stage, fraction)
+
+    return update
+
+
+CLONE_MODES = ["full", "shallow", "blobless", "sparse"]
+
+CLONE_OPTIONS = {
+    "full": [],
+    "shallow": ["--depth=1"],
+    "blobless": ["--filter=blob:none"],
+    "sparse": ["--filter=blob:none", "--no-checkout"],
+}
+
+# files checked out by a sparse clone besides the resources
+SPARSE_METADATA = ["dataherb.json", "datapackage.json", "README.md"]
+
+
+def _clone_url(uri: str) -> str:
+    """local repositories are cloned through file:// urls, as git ignores
+    the depth and filter of local clones otherwise"""
+    if "://" not in uri and Path(uri).exists():
+        return Path(uri).resolve().as_uri()
+
+    return uri
+
+
+def resource_paths(herb: Herb) -> List[str]:
+    """Paths of the resource files in the datapackage of the herb
+
+    :param herb: the herb
+    """
+    paths: List[str] = []
+    for resource in herb.datapackage.resources:
+        path = resource.descriptor.get("path")
+        paths.extend([path] if isinstance(path, str) else path or [])
+
+    return paths
+
+
+def clone_herb(
+    herb: Herb,
+    destination: Path,
+    mode: str = "full",
+    progress: Optional[ProgressCallback] = None,
+) -> git.Repo:
+    """Clone the git repository of a herb.
+
+    The modes trade the history and the files of the repository against
+    the bytes transferred:
+
+    - `full`: the whole history, as `git clone`;
+    - `shallow`: only the latest commit, `--depth=1`;
+    - `blobless`: the whole history of the commits and trees, but only the
+      files of the latest commit, `--filter=blob:none`; older versions of
+      the files are fetched on demand;
+    - `sparse`: a blobless clone that only checks out the resource files of
+      the datapackage and the metadata files.
+
+    :param herb: the herb to clone
+    :param destination: folder of the clone
+    :param mode: one of `CLONE_MODES`
+    :param progress: called with the id of the herb, a message and the
+        fraction of the current stage that is done, if known
+    """
+    if mode not in CLONE_MODES:
+        raise Exception(f"Unknown clone mode {mode}, use one of {CLONE_MODES}")
+    if not herb.uri:
+        raise Exception(f"{herb.id} has no uri to clone from")
+
+    repo = git.Repo.clone_from(
+        _clone_url(herb.uri),
+        to_path=destination,
+        multi_options=CLONE_OPTIONS[mode],
+        progress=git_progress(herb.id, progress) if progress else None,
+    )
+    if mode == "sparse":
+        paths = SPARSE_METADATA + resource_paths(herb)
+        logger.debug(f"Sparse checkout of {herb.id}: {paths}")
+        repo.git.sparse_checkout("set", "--no-cone", *[f"/{p}" for p in paths])
+        repo.git.checkout()
+
+    return repo
+
+
+def download_herb(
+    herb: Herb,
+    workdir: Path,
+    pull: bool = True,
+    blob_store: Optional[BlobStore] = None,
+    progress: Optional[ProgressCallback] = None,
+    mode: str = "full",
+    dedupe: bool = False,
+) -> Dict[str, Any]:
+    """Clone the git repository of a herb into the workdir, or pull it if it
+    has been downloaded before.
+
+    Errors are reported in the result instead of raised, so that one
+    failing herb does not stop the others.
+
+    :param herb: the herb to download
+    :param workdir: the herb is downloaded into the folder `workdir/<id>`
+    :param pull: whether to pull herbs that have been downloaded before
+    :param blob_store: store of the files shared by herbs, see `BlobStore`
+    :param progress: called with the id of the herb, a message and the
+        fraction of the current stage that is done, if known
+    :param mode: how new herbs are cloned, see `clone_herb`
+    :param dedupe: link the files of a new clone that are already in the
+        blob store, or duplicated in the clone, to the blobs, see
+        `BlobStore.dedupe`; linked files are read-only.
+    :return: the `id` and `path` of the herb, the `action` (clone, pull or
+        skip), the `status` (ok or failed), the `message` and the `seconds`
+    """
+    destination = Path(workdir) / herb.id
+    result: Dict[str, Any] = {
+        "id": herb.id,
+        "path": destination,
+        "action": "clone",
+        "status": "ok",
+        "message": "",
+    }
+    if progress is None:
+        progress = lambda id, message, fraction: None  # noqa: E731
+    started_at = time.monotonic()
+
+    try:
+        if destination.exists():
+            result["action"] = "pull" if pull else "skip"
+            if pull:
+                progress(herb.id, "pulling", None)
+                git.Repo(destination).git.pull()
+        else:
+            progress(herb.id, "cloning", None)
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            clone_herb(herb, destination, mode=mode, progress=progress)
+            if dedupe and blob_store is not None:
+                stats = blob_store.dedupe(destination)
+                if stats["linked"]:
+                    result["message"] = f'linked {stats["linked"]} known files'
+    except Exception as e:
+        logger.debug(f"Could not download {herb.id}: {e}")
+        result["status"] = "failed"
+        result["message"] = str(e).strip().splitlines()[-1] if str(e).strip() else ""
+    finally:
+        result["seconds"] = time.monotonic() - started_at
+
+    progress(herb.id, result["status"], 1.0)
+
+    return result
+
+
+def download_herbs(
+    herbs: List[Herb],
+    workdir: Path,
+    workers: int = 4,
+    pull: bool = True,
+    blob_store: Optional[BlobStore] = None,
+    progress: Optional[ProgressCallback] = None,
+    mode: str = "full",
+    dedupe: bool = False,
+) -> List[Dict[str, Any]]:
+    """Download herbs concurrently on a pool of workers, see `download_herb`.
+
+    :param herbs: the herbs to download
+    :param workdir: the herbs are downloaded into the folders `workdir/<id>`
+    :param workers: number of herbs that are downloaded at the same time
+    :param pull: whether to pull herbs that have been downloaded before
+    :param blob_store: store of the files shared by herbs
+    :param progress: called with the id of a herb, a message and the
+        fraction of the current stage that is done, if known
+    :param mode: how new herbs are cloned, see `clone_herb`
+    :param dedupe: link the files of new clones to the blob store, see
+        `download_herb`
+    :return: results of the herbs, in the order of the herbs
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(
+                download_herb,
+                herb,
+                workdir,
+                pull=pull,
+                blob_store=blob_store,
+                progress=progress,
+                mode=mode,
+                dedupe=dedupe,
+            ): herb.id
+            for herb in herbs
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+
+    return [results[herb.id] for herb in herbs]
+
+
+def summary_table(results: List[Dict[str, Any]]) -> Table:
+    """Summary of the downloads as a table
+
+    :param results: results of `download_herbs`
+    """
+    failed = sum(r["status"] != "ok" for r in results)
+    table = Table(
+        title=f"Downloaded {len(results) - failed} of {len(results)} DataHerbs"
+    )
+
+    table.add_column("id", style="cyan", no_wrap=True)
+    table.add_column("action")
+    table.add_column("status")
+    table.add_column("seconds", justify="right")
+    table.add_column("message", no_wrap=False)
+
+    for r in results:
+        table.add_row(
+            r["id"],
+            r["action"],
+            "[green]ok[/green]" if r["status"] == "ok" else "[red]failed[/red]",
+            f'{r["seconds"]:.1f}',
+            r["message"],
+        )
+
+    return table
@@ -47,7 +47,7 @@ class HerbTable:
         """Show list of resources"""
 
         tree = Tree(f"{self.herb.id}")
-        for r in self.herb.resources:
+        for r in self.herb.datapackage.resources:
             tree.add(f'{r.descriptor.get("path")}')
 
         pl = Panel(tree, title=f"Resources of {self.herb.id}")
@@ -0,0 +1,385 @@
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import git
+from loguru import logger
+from rich.table import Table
+
+from dataherb.cache.blob_store import BlobStore
+from dataherb.cmd.download import SPARSE_METADATA
+from dataherb.core.base import Herb
+from dataherb.fetch.download import download_file, part_path, verify_file
+from dataherb.fetch.remote import get_data_from_url
+from dataherb.utils.awscli import aws_cli as _aws_cli
+from dataherb.utils.files import atomic_write_bytes
+
+logger.remove()
+logger.add(sys.stderr, level="INFO", enqueue=True)
+
+
+SYNC_MANIFEST = ".dataherb-sync.json"
+
+# fields of a resource descriptor that tell whether the file has changed
+FINGERPRINT_KEYS = ["bytes", "hash", "mtime"]
+
+
+def resource_fingerprint(descriptor: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields of a resource descriptor that change with the file: the
+    `bytes`, the `hash` and the modification time, `mtime` or
+    `last_modified`
+
+    :param descriptor: descriptor of the resource in the datapackage
+    """
+    fingerprint = {key: descriptor.get(key) for key in FINGERPRINT_KEYS}
+    if fingerprint["mtime"] is None:
+        fingerprint["mtime"] = descriptor.get("last_modified")
+
+    return {key: value for key, value in fingerprint.items() if value is not None}
+
+
+def _resources(metadata: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """resource descriptors of the herb metadata by path"""
+    datapackage = metadata.get("datapackage") or metadata
+    resources = {}
+    for descriptor in datapackage.get("resources", []):
+        path = descriptor.get("path")
+        if isinstance(path, str) and path:
+            resources[path] = descriptor
+
+    return resources
+
+
+class GitTransport:
+    """Fetch the files of a herb hosted in a git repository, through the raw
+    urls next to the `metadata_uri` of the herb
+
+    :param herb: the herb
+    """
+
+    def __init__(self, herb: Herb, blob_store: Optional[BlobStore] = None):
+        if not herb.metadata_uri:
+            raise Exception(f"{herb.id} has no metadata_uri to sync from")
+        self.herb = herb
+        self.metadata_uri = herb.metadata_uri
+        self.blob_store = blob_store
+
+    def metadata(self) -> Dict[str, Any]:
+        """the remote dataherb.json"""
+        response = get_data_from_url(self.metadata_uri)
+        if response.status_code != 200:
+            raise Exception(
+                f"Could not fetch remote file: {self.metadata_uri}; "
+                f"{response.status_code}"
+            )
+
+        return response.json()
+
+    def fetch(self, path: str, destination: Path, descriptor: Dict[str, Any]) -> None:
+        """download a resource file, or link it to a known blob"""
+        hash = descriptor.get("hash")
+        if self.blob_store is not None and hash:
+            if self.blob_store.link(hash, destination):
+                return
+
+        download_file(
+            self.herb.resource_url(path),
+            destination,
+            bytes=descriptor.get("bytes"),
+            hash=hash,
+            overwrite=True,
+        )
+        if self.blob_store is not None and hash:
+            self.blob_store.add(destination, hash=hash)
+
+
+class S3Transport:
+    """Fetch the files of a herb hosted on S3, under the `uri` of the herb,
+    with the aws cli
+
+    :param herb: the herb
+    """
+
+    def __init__(self, herb: Herb, blob_store: Optional[BlobStore] = None):
+        if not herb.uri:
+            raise Exception(f"{herb.id} has no uri to sync from")
+        self.uri = herb.uri.rstrip("/")
+        self.blob_store = blob_store
+
+    def _copy(self, key: str, destination: Path) -> None:
+        _aws_cli(
+            ("s3", "cp", "--only-show-errors", f"{self.uri}/{key}", str(destination))
+        )
+
+    def metadata(self) -> Dict[str, Any]:
+        """the remote dataherb.json"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "dataherb.json"
+            self._copy("dataherb.json", path)
+            return json.loads(path.read_text())
+
+    def fetch(self, path: str, destination: Path, descriptor: Dict[str, Any]) -> None:
+        """copy a resource file into a partial file, verify it, and move it
+        into place"""
+        hash = descriptor.get("hash")
+        if self.blob_store is not None and hash:
+            if self.blob_store.link(hash, destination):
+                return
+
+        part = part_path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self._copy(path, part)
+            verify_file(part, bytes=descriptor.get("bytes"), hash=hash)
+        except BaseException:
+            part.unlink(missing_ok=True)
+            raise
+        os.replace(part, destination)
+        if self.blob_store is not None and hash:
+            self.blob_store.add(destination, hash=hash)
+
+
+def transport_for(herb: Herb, blob_store: Optional[BlobStore] = None):
+    """The transport of the files of a herb, by the source of the herb
+
+    :param herb: the herb
+    :param blob_store: store of the resource files shared by herbs
+    """
+    if herb.source == "git":
+        return GitTransport(herb, blob_store=blob_store)
+    if herb.source == "s3":
+        return S3Transport(herb, blob_store=blob_store)
+
+    raise Exception(f"Can not sync {herb.id} from source {herb.source}")
+
+
+def is_git_checkout(folder: Path) -> bool:
+    """whether the folder is a git working tree, e.g., a herb cloned by
+    `dataherb download`
+
+    :param folder: folder of the herb
+    """
+    return (Path(folder) / ".git").exists()
+
+
+def _is_current(path: Path, descriptor: Dict[str, Any]) -> bool:
+    """whether a local file matches the `bytes` and `hash` of the resource
+    descriptor; False if the descriptor has neither"""
+    if not path.is_file() or not (descriptor.get("bytes") or descriptor.get("hash")):
+        return False
+    try:
+        verify_file(path, bytes=descriptor.get("bytes"), hash=descriptor.get("hash"))
+    except Exception:
+        return False
+
+    return True
+
+
+def sync_git_checkout(
+    herb: Herb, folder: Path, dry_run: bool = False
+) -> Dict[str, Any]:
+    """Sync a git checkout of a herb, e.g., of `dataherb download`, with
+    `git pull`, as its files are tracked by git.
+
+    The files changed by the pull are reported as `updated` and the deleted
+    files as `removed`. A sparse checkout is set to the resource files of the
+    pulled datapackage, so that new resources are checked out.
+
+    :param herb: the herb
+    :param folder: the git checkout of the herb
+    :param dry_run: only fetch, and compare with the upstream branch
+    :return: the paths that are `updated`, `unchanged` and `removed`, as
+        `sync_herb`
+    """
+    repo = git.Repo(folder)
+    before = repo.head.commit.hexsha
+    if dry_run:
+        repo.git.fetch()
+        after = repo.commit("@{u}").hexsha
+    else:
+        repo.git.pull()
+        after = repo.head.commit.hexsha
+
+    updated: List[str] = []
+    removed: List[str] = []
+    if before != after:
+        changes = repo.git.diff("--name-status", "--no-renames", before, after)
+        for line in changes.splitlines():
+            status, path = line.split("\t", 1)
+            (removed if status == "D" else updated).append(path)
+
+    metadata_path = Path(folder) / "dataherb.json"
+    metadata = (
+        json.loads(metadata_path.read_text())
+        if metadata_path.exists()
+        else herb.metadata
+    )
+    resources = _resources(metadata)
+    sparse = repo.git.config("--bool", "core.sparseCheckout", with_exceptions=False)
+    if not dry_run and sparse == "true":
+        paths = SPARSE_METADATA + list(resources)
+        logger.debug(f"Sparse checkout of {herb.id}: {paths}")
+        repo.git.sparse_checkout("set", "--no-cone", *[f"/{p}" for p in paths])
+
+    return {
+        "updated": updated,
+        "unchanged": sorted(set(resources) - set(updated)),
+        "removed": removed,
+        "failed": {},
+    }
+
+
+def load_manifest(folder: Path) -> Dict[str, Any]:
+    """The sync manifest of a herb folder; empty if the herb has not been
+    synced
+
+    :param folder: folder of the herb
+    """
+    try:
+        return json.loads((Path(folder) / SYNC_MANIFEST).read_text())
+    except (OSError, ValueError):
+        return {"resources": {}}
+
+
+def sync_herb(
+    herb: Herb,
+    folder: Path,
+    delete: bool = False,
+    dry_run: bool = False,
+    blob_store: Optional[BlobStore] = None,
+    transport=None,
+) -> Dict[str, Any]:
+    """Sync the resources of a herb folder with the remote herb, transferring
+    only the resources that have changed.
+
+    The resource descriptors of the remote `dataherb.json` are compared with
+    the manifest of the last sync, `.dataherb-sync.json` in the folder, by
+    their `bytes`, `hash` and modification time, see `resource_fingerprint`.
+    A resource is transferred if its descriptor has changed, if it has no
+    such fields, or if the local file is missing. A resource that is not in
+    the manifest yet is not transferred if the local file matches its
+    `bytes` and `hash`, so the first sync of a downloaded herb only
+    transfers what has changed.
+
+    Git checkouts, e.g., of `dataherb download`, are pulled instead, see
+    `sync_git_checkout`, as transferred files would conflict with the next
+    `git pull`.
+
+    The manifest and the local `dataherb.json` are replaced atomically once
+    the resources are transferred. A resource that fails keeps its old
+    entry in the manifest, so that it is tried again by the next sync.
+
+    :param herb: the herb, whose `source` is git or s3
+    :param folder: folder of the herb
+    :param delete: remove the local files of the resources that have been
+        removed from the remote herb
+    :param dry_run: only compare, without transferring any file
+    :param blob_store: store of the resource files shared by herbs
+    :param transport: transport of the remote files; defaults to the
+        transport of the source of the herb, see `transport_for`
+    :return: the paths of the resources that are `updated`, `unchanged`
+        and `removed`, and the errors of the `failed` resources
+    """
+    folder = Path(folder)
+    if is_git_checkout(folder):
+        logger.debug(f"{folder} is a git checkout, pulling it")
+        return sync_git_checkout(herb, folder, dry_run=dry_run)
+    if transport is None:
+        transport = transport_for(herb, blob_store=blob_store)
+
+    metadata = transport.metadata()
+    remote = _resources(metadata)
+    manifest = load_manifest(folder)
+    synced: Dict[str, Dict[str, Any]] = manifest.get("resources", {})
+
+    result: Dict[str, Any] = {
+        "updated": [],
+        "unchanged": [],
+        "removed": sorted(set(synced) - set(remote)),
+        "failed": {},
+    }
+    for path, descriptor in list(remote.items()):
+        fingerprint = resource_fingerprint(descriptor)
+        destination = folder / path
+        if not destination.resolve().is_relative_to(folder.resolve()):
+            result["failed"][path] = "resource path is outside of the herb folder"
+            del remote[path]
+        elif fingerprint and synced.get(path) == fingerprint and destination.exists():
+            result["unchanged"].append(path)
+        elif path not in synced and _is_current(destination, descriptor):
+            synced[path] = fingerprint
+            result["unchanged"].append(path)
+        else:
+            result["updated"].append(path)
+
+    if dry_run:
+        return result
+
+    resources = {path: synced[path] for path in result["unchanged"]}
+    for path in result["updated"]:
+        try:
+            logger.debug(f"Syncing {path} of {herb.id}")
+            transport.fetch(path, folder / path, remote[path])
+            resources[path] = resource_fingerprint(remote[path])
+        except Exception as e:
+            logger.debug(f"Could not sync {path} of {herb.id}: {e}")
+            result["failed"][path] = str(e)
+            if path in synced:
+                resources[path] = synced[path]
+    result["updated"] = [p for p in result["updated"] if p not in result["failed"]]
+
+    for path in result["removed"]:
+        if delete:
+            (folder / path).unlink(missing_ok=True)
+        else:
+            resources[path] = synced[path]
+
+    folder.mkdir(parents=True, exist_ok=True)
+    atomic_write_bytes(
+        folder / "dataherb.json",
+        json.dumps(metadata, sort_keys=True, indent=4, separators=(",", ": ")).encode(
+            "utf-8"
+        ),
+    )
+    atomic_write_bytes(
+        folder / SYNC_MANIFEST,
+        json.dumps(
+            {
+                "id": herb.id,
+                "source": herb.source,
+                "synced_at": time.time(),
+                "resources": resources,
+            },
+            sort_keys=True,
+            indent=4,
+        ).encode("utf-8"),
+    )
+
+    return result
+
+
+def sync_table(id: str, result: Dict[str, Any]) -> Table:
+    """Summary of a sync as a table
+
+    :param id: id of the herb
+    :param result: result of `sync_herb`
+    """
+    table = Table(title=f"Sync of {id}")
+
+    table.add_column("resource", style="cyan", no_wrap=False)
+    table.add_column("status")
+
+    for path in result["updated"]:
+        table.add_row(path, "[green]updated[/green]")
+    for path, error in result["failed"].items():
+        table.add_row(path, f"[red]failed[/red]: {error}")
+    for path in result["removed"]:
+        table.add_row(path, "[yellow]removed[/yellow]")
+    for path in result["unchanged"]:
+        table.add_row(path, "unchanged")
+
+    return table
@@ -4,22 +4,28 @@ import sys
 from pathlib import Path
 
 import click
-import git
 import inquirer
 from datapackage import Package
 from loguru import logger
 from mkdocs.commands.serve import serve as _serve
 from rich.console import Console
+from rich.progress import Progress
 
 
 from dataherb.version import __version__
+from dataherb.cache.blob_store import LINK_MODES, BlobStore
+from dataherb.cache.resource_cache import ResourceCache
+from dataherb.cmd.cache import cache_table, format_bytes, stats_table
 from dataherb.cmd.create import describe_dataset
+from dataherb.cmd.download import CLONE_MODES, download_herbs, summary_table
 from dataherb.cmd.search import HerbTable
+from dataherb.cmd.sync import sync_herb, sync_table
 from dataherb.cmd.sync_git import remote_git_repo, upload_dataset_to_git
 from dataherb.cmd.sync_s3 import upload_dataset_to_s3
 from dataherb.core.base import Herb
 from dataherb.fetch.remote import get_data_from_url
 from dataherb.flora import Flora
+from dataherb.multi_flora import MultiFlora
 from dataherb.parse.model_json import MetaData
 from dataherb.parse.utils import STATUS_CODE
 from dataherb.serve.save_mkdocs import SaveMkDocs
@@ -172,7 +178,32 @@ def configure(show, locate):
     default=False,
     help="Locate the folder that contains the dataset, only works for --id mode",
 )
-def search(flora, id, keywords, full, locate):
+@click.option(
+    "--limit",
+    "-n",
+    type=int,
+    default=None,
+    help="Show only the top results; Defaults to showing all the results.",
+)
+@click.option(
+    "--all-floras/--one-flora",
+    "-a/ ",
+    default=False,
+    help="Search all the floras in the working directory.",
+)
+@click.option(
+    "--tag",
+    "-t",
+    multiple=True,
+    help="Only search datasets with the tag; can be given multiple times.",
+)
+@click.option(
+    "--source",
+    "-s",
+    default=None,
+    help="Only search datasets from the source, e.g., git or s3.",
+)
+def search(flora, id, keywords, full, locate, limit, all_floras, tag, source):
     """
     search datasets on DataHerb by keywords or id
 
@@ -182,15 +213,24 @@ def search(flora, id, keywords, full, locate):
     :param keywords: the keywords to search.
     :param full: whether to show the full json result.
     :param locate: if flag is given, will locate the dataset folder.
+    :param limit: the maximum number of results to show.
+    :param all_floras: whether to search all the floras in the working
+        directory instead of one flora.
+    :param tag: only search datasets with any of the tags.
+    :param source: only search datasets from the source.
     """
-    if flora is None:
-        c = Config()
-        flora = c.flora_path
+    if all_floras:
+        fl = MultiFlora.from_workdir(Path(Config().workdir), use_snapshot=True)
+    else:
+        if flora is None:
+            c = Config()
+            flora = c.flora_path
+        fl = Flora(flora_path=Path(flora), use_snapshot=True)
 
-    fl = Flora(flora_path=flora)
     if not id:
         click.echo("Searching Herbs in DataHerb Flora ...")
-        results = fl.search(keywords)
+        facets = {"tag": list(tag) or None, "source": source}
+        results = fl.search(keywords, limit=limit, facets=facets)
         click.echo(f"Found {len(results)} results")
         if not results:
             click.echo(f"Could not find dataset related to {keywords}")
@@ -198,6 +238,8 @@ def search(flora, id, keywords, full, locate):
             for result in results:
                 result_herb = result.get("herb")
                 result_metadata = result.get("herb").metadata
+                if "flora" in result:
+                    click.secho(f"Flora: {result['flora']}")
                 if not full:
                     ht = HerbTable(result_herb)
                     console.rule(title=f"{result_herb.id}", characters="||")
@@ -276,7 +318,7 @@ def serve(flora, workdir, dev_addr, recreate):
         c = Config()
         workdir = c.workdir
 
-    fl = Flora(flora_path=flora)
+    fl = Flora(flora_path=flora, use_snapshot=True)
 
     mk = SaveMkDocs(flora=fl, workdir=workdir, folder=".serve")
     mk.save_all(recreate=recreate)
@@ -287,7 +329,7 @@ def serve(flora, workdir, dev_addr, recreate):
 
 
 @dataherb.command()
-@click.argument("id", required=True)
+@click.argument("ids", nargs=-1, required=False)
 @click.option(
     "--flora",
     "-f",
@@ -300,15 +342,66 @@ def serve(flora, workdir, dev_addr, recreate):
     default=None,
     help="Specify the path to the work directory; defaults to the workdir in configuration.",
 )
-def download(id, flora, workdir):
+@click.option(
+    "--all", "all_herbs", is_flag=True, default=False, help="Download all the datasets."
+)
+@click.option(
+    "--tag",
+    "-t",
+    multiple=True,
+    help="Download the datasets with any of the tags; can be repeated.",
+)
+@click.option(
+    "--workers",
+    "-j",
+    type=int,
+    default=4,
+    show_default=True,
+    help="Number of datasets that are downloaded at the same time.",
+)
+@click.option(
+    "--mode",
+    "-m",
+    type=click.Choice(CLONE_MODES),
+    default="full",
+    show_default=True,
+    help="How to clone: full history, shallow (latest commit), blobless (files of the latest commit only) or sparse (resource files only).",
+)
+@click.option(
+    "--pull/--no-pull",
+    default=None,
+    help="Whether to pull the datasets that have been downloaded before; asks if not given.",
+)
+@click.option(
+    "--dedupe/--no-dedupe",
+    default=None,
+    help="Whether to link the files of new datasets that are already in the blob store; defaults to cache.dedupe in the configuration, off if not set.",
+)
+def download(ids, flora, workdir, all_herbs, tag, workers, mode, pull, dedupe):
     """
-    Download dataset using id.
+    Download datasets using ids.
+
+    The datasets are cloned into the work directory concurrently, and
+    the datasets that have been downloaded before are pulled.
 
-    :param id: the id of the dataset to download.
+    ```
+    dataherb download geo-countries geo-cities
+    dataherb download --tag covid --workers 8
+    dataherb download --mode sparse geo-countries
+    ```
+
+    :param ids: the ids of the datasets to download.
     :param flora: the path to the flora file. If not given,
         will use the default flora in the configuration.
     :param workdir: the path to the work directory. If not given,
         will use the workdir in the configuration.
+    :param all_herbs: download all the datasets in the flora.
+    :param tag: download the datasets with any of the tags.
+    :param workers: number of datasets downloaded at the same time.
+    :param mode: how to clone the datasets, see `clone_herb`.
+    :param pull: whether to pull the existing datasets.
+    :param dedupe: whether to link the files of new datasets to the blob
+        store, see `BlobStore.dedupe`.
     """
 
     if flora is None:
@@ -319,33 +412,132 @@ def download(id, flora, workdir):
         c = Config()
         workdir = c.workdir
 
-    fl = Flora(flora_path=flora)
-    click.echo(f"Fetching Herbs {id} in DataHerb Flora ...")
-    result = fl.herb(id)
-    if not result:
-        click.echo(f"Could not find dataset with id {id}")
+    if dedupe is None:
+        dedupe = Config().cache_dedupe
+
+    if not (ids or all_herbs or tag):
+        click.echo("Please specify the ids of the datasets, --all or --tag.")
+        sys.exit(1)
+
+    fl = Flora(flora_path=Path(flora), use_snapshot=True)
+    click.echo(f"Fetching Herbs in DataHerb Flora ...")
+    if all_herbs:
+        herbs = list(fl.flora)
     else:
-        result_metadata = result.metadata
-        result_uri = result_metadata.get("uri")
-        result_id = result_metadata.get("id")
-        dest_folder = Path(workdir) / result_id
-        click.echo(
-            f'Downloading DataHerb ID: {result_metadata.get("id")} into {dest_folder}'
+        herbs = fl.filter(tag=list(tag)) if tag else []
+        for id in ids:
+            herb = fl.herb(id)
+            if not herb:
+                click.echo(f"Could not find dataset with id {id}")
+            else:
+                herbs.append(herb)
+    herbs = list({herb.id: herb for herb in herbs}.values())
+    if not herbs:
+        click.echo("There is no dataset to download.")
+        sys.exit(1)
+
+    existing = [herb.id for herb in herbs if (Path(workdir) / herb.id).exists()]
+    if existing and pull is None:
+        click.echo(f'Datasets exist in {workdir}: {", ".join(existing)}')
+        pull = click.confirm("Would you like to pull them from remote?")
+
+    click.echo(f"Downloading {len(herbs)} DataHerbs into {workdir} ...")
+    with Progress(console=console, transient=True) as progress:
+        tasks = {herb.id: progress.add_task(herb.id, total=None) for herb in herbs}
+
+        def update(id, message, fraction):
+            progress.update(
+                tasks[id],
+                description=f"{id}: {message}",
+                completed=fraction,
+                total=None if fraction is None else 1.0,
+            )
+
+        results = download_herbs(
+            herbs,
+            Path(workdir),
+            workers=workers,
+            pull=bool(pull),
+            blob_store=BlobStore(Path(workdir) / ".cache" / "blobs"),
+            progress=update,
+            mode=mode,
+            dedupe=dedupe,
         )
-        if dest_folder.exists():
-            click.echo(f"Can not download dataset to {dest_folder}: folder exists.\n")
 
-            is_pull = click.confirm(f"Would you like to pull from remote?")
-            if is_pull:
-                repo = git.Repo(dest_folder)
-                repo.git.pull()
-            else:
-                click.echo(
-                    f"Please go to the folder {dest_folder} and sync your repo manually."
-                )
-        else:
-            dest_folder.mkdir(parents=True, exist_ok=False)
-            repo = git.repo.base.Repo.clone_from(result_uri, to_path=dest_folder)
+    console.print(summary_table(results))
+    if any(r["status"] != "ok" for r in results):
+        sys.exit(1)
+
+
+@dataherb.command(name="sync")
+@click.argument("id", required=True)
+@click.option(
+    "--flora",
+    "-f",
+    default=None,
+    help="Specify the path to the flora; defaults to default flora in configuration.",
+)
+@click.option(
+    "--workdir",
+    "-w",
+    default=None,
+    help="Specify the path to the work directory; defaults to the workdir in configuration.",
+)
+@click.option(
+    "--delete",
+    is_flag=True,
+    default=False,
+    help="Remove the local files of resources that have been removed remotely.",
+)
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    default=False,
+    help="Only show the resources that would be transferred.",
+)
+def sync_herb_command(id, flora, workdir, delete, dry_run):
+    """
+    Sync a downloaded dataset, transferring only the resources that changed.
+
+    The resources in the remote dataherb.json are compared with the
+    manifest of the last sync by their size, hash and modification time.
+    Datasets from git and S3 are supported. Git checkouts, e.g., of
+    `dataherb download`, are pulled instead.
+
+    :param id: the id of the dataset to sync.
+    :param flora: the path to the flora file. If not given,
+        will use the default flora in the configuration.
+    :param workdir: the path to the work directory. If not given,
+        will use the workdir in the configuration.
+    :param delete: remove the files of resources that were removed.
+    :param dry_run: only compare the resources.
+    """
+    if flora is None:
+        c = Config()
+        flora = c.flora_path
+
+    if workdir is None:
+        c = Config()
+        workdir = c.workdir
+
+    fl = Flora(flora_path=Path(flora), use_snapshot=True)
+    herb = fl.herb(id)
+    if not herb:
+        click.echo(f"Could not find dataset with id {id}")
+        sys.exit(1)
+
+    folder = Path(workdir) / herb.id
+    click.echo(f"Syncing DataHerb ID: {herb.id} into {folder} ...")
+    result = sync_herb(
+        herb,
+        folder,
+        delete=delete,
+        dry_run=dry_run,
+        blob_store=BlobStore(Path(workdir) / ".cache" / "blobs"),
+    )
+    console.print(sync_table(herb.id, result))
+    if result["failed"]:
+        sys.exit(1)
 
 
 @dataherb.command()
@@ -465,6 +657,159 @@ def remove(flora, herb_id):
         click.echo("We did nothing.")
 
 
+@dataherb.group(name="flora")
+def flora_group():
+    """
+    manage the storage of a flora
+    """
+
+
+@flora_group.command(name="compact")
+@click.option(
+    "--flora",
+    "-f",
+    default=None,
+    help="Specify the path to the flora; defaults to default flora in configuration.",
+)
+def flora_compact(flora):
+    """
+    fold the journal of an aggregated flora back into the flora file
+
+    :param flora: the path to the flora file. If not given,
+        will use the default flora in the configuration.
+    """
+    if flora is None:
+        c = Config()
+        flora = c.flora_path
+
+    fl = Flora(flora_path=Path(flora))
+    if not fl.is_aggregated:
+        click.echo(f"{flora} is not an aggregated flora, there is nothing to compact.")
+        sys.exit()
+
+    fl.compact()
+    click.echo(f"Compacted the journal of {flora}.")
+
+
+@flora_group.command(name="convert")
+@click.argument("destination", type=click.Path(exists=False))
+@click.option(
+    "--flora",
+    "-f",
+    default=None,
+    help="Specify the path to the flora; defaults to default flora in configuration.",
+)
+def flora_convert(destination, flora):
+    """
+    convert the flora into another storage format
+
+    The format is determined by the destination: a SQLite file
+    (.db, .sqlite, .sqlite3), an aggregated json file (.json),
+    or a folder of herbs otherwise.
+
+    :param destination: the path to the new flora.
+    :param flora: the path to the flora file. If not given,
+        will use the default flora in the configuration.
+    """
+    if flora is None:
+        c = Config()
+        flora = c.flora_path
+
+    fl = Flora(flora_path=Path(flora))
+    fl.export(Path(destination))
+    click.echo(f"Converted {flora} into {destination}.")
+
+
+@dataherb.group(name="cache")
+def cache_group():
+    """
+    manage the local cache of remote resources
+    """
+
+
+def _resource_cache() -> ResourceCache:
+    cache = ResourceCache.default()
+    if cache is None:
+        click.echo("Please run `dataherb configure` to set up the workdir first.")
+        sys.exit(1)
+
+    return cache
+
+
+@cache_group.command(name="ls")
+def cache_ls():
+    """
+    list the cached files, most recently used first
+    """
+    console.print(cache_table(_resource_cache().entries()))
+
+
+@cache_group.command(name="prune")
+@click.option(
+    "--max-bytes",
+    "-m",
+    type=int,
+    default=None,
+    help="Budget of the cache in bytes; defaults to cache.max_bytes in the configuration, 0 empties the cache.",
+)
+def cache_prune(max_bytes):
+    """
+    evict the least recently used files until the cache fits in its budget
+
+    :param max_bytes: budget of the cache in bytes. If not given,
+        will use cache.max_bytes in the configuration.
+    """
+    evicted = _resource_cache().prune(max_bytes=max_bytes)
+    click.echo(
+        f"Evicted {len(evicted)} files, "
+        f'{format_bytes(sum(entry["size"] for entry in evicted))}.'
+    )
+
+
+@cache_group.command(name="dedupe")
+@click.option(
+    "--workdir",
+    "-w",
+    default=None,
+    help="Specify the path to the work directory; defaults to the workdir in configuration.",
+)
+@click.option(
+    "--mode",
+    "-m",
+    type=click.Choice(LINK_MODES),
+    default="auto",
+    help="How files are linked to the blobs; auto uses reflinks if possible, then hard links.",
+)
+def cache_dedupe(workdir, mode):
+    """
+    store the identical files of the downloaded datasets once, and link
+    the files to the stored blobs
+
+    :param workdir: the path to the work directory. If not given,
+        will use the workdir in the configuration.
+    :param mode: how the files are linked to the blobs.
+    """
+    if workdir is None:
+        c = Config()
+        workdir = c.workdir
+
+    store = BlobStore(Path(workdir) / ".cache" / "blobs", mode=mode)
+    stats = store.dedupe(Path(workdir))
+    click.echo(
+        f'Looked at {stats["files"]} files, hashed {stats["hashed"]}, '
+        f'linked {stats["linked"]} to {stats["blobs"]} blobs; '
+        f'saved {format_bytes(stats["bytes_saved"])}.'
+    )
+
+
+@cache_group.command(name="stats")
+def cache_stats():
+    """
+    show the size and the hit rate of the cache
+    """
+    console.print(stats_table(_resource_cache().stats()))
+
+
 @dataherb.command()
 @click.confirmation_option(
     prompt=f"Your current working directory is {__CWD__}\n"
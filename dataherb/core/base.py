@@ -1,5 +1,7 @@
 import io
+import json
 import sys
+from functools import cached_property
 from pathlib import Path
 
 import click
@@ -8,24 +10,54 @@ from datapackage import Package, Resource
 from loguru import logger
 from rapidfuzz import fuzz
 
+from dataherb.cache.blob_store import BlobStore
+from dataherb.cache.resource_cache import ResourceCache
 from dataherb.utils.configs import Config
+from dataherb.fetch.download import download_file, download_segmented
+from dataherb.fetch.http_cache import HTTPCache
 from dataherb.fetch.remote import get_data_from_url
 from dataherb.parse.model_json import MetaData
 from dataherb.utils.data import flatten_dict as _flatten_dict
-from typing import Optional, List, Tuple, Set, Union
+from typing import Any, Dict, Optional, List, Tuple, Set, Union
 
 
 logger.remove()
 logger.add(sys.stderr, level="INFO", enqueue=True)
 
 
+SEARCH_KEYS = ["name", "id", "repository", "tags", "description"]
+
+SEGMENTED_DOWNLOAD_BYTES = 64 * 1024 * 1024
+
+
+def herb_search_corpus(
+    meta_dict: dict, keys: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    herb_search_corpus flattens the fields of the herb metadata
+    that are looked into by the search.
+
+    :param meta_dict: the dictionary that specifies the herb
+    :param keys: list of keys in the dictionary to look into.
+    """
+    if keys is None:
+        keys = SEARCH_KEYS
+
+    return _flatten_dict({key: val for key, val in meta_dict.items() if key in keys})
+
+
 class Herb:
     """
     Herb is a collection of the dataset.
 
+    The `datapackage` and `resources` of the herb are only built on first
+    access, so that loading a flora only parses the lightweight metadata.
+
     :param meta_dict: the dictionary that specifies the herb.
     :param base_path: the path to the dataset.
-    :param with_resources: whether to load the resources, i.e., data files.
+    :param with_resources: whether the herb has resources, i.e., data files;
+        if False, `resources` is empty. Resources are hydrated lazily on
+        first access of `resources`.
     """
 
     def __init__(
@@ -71,6 +103,28 @@ class Herb:
 
         return is_local
 
+    def _is_local_resource(self, descriptor: dict) -> bool:
+        """whether the file of the resource is in the base path of the herb"""
+        path = descriptor.get("path")
+        if isinstance(path, str) and path:
+            return (self.base_path / path).exists()
+
+        return self.is_local
+
+    @property
+    def remote_path(self) -> str:
+        """url of the folder of the `metadata_uri`, which the paths of the
+        resources are relative to"""
+        return self.metadata_uri.rsplit("/", 1)[0] + "/"
+
+    def resource_url(self, path: str) -> str:
+        """
+        url of a resource file of a remote git herb
+
+        :param path: path of the resource in the datapackage
+        """
+        return f"{self.remote_path}{path}"
+
     def _from_meta_dict(self, meta_dict: dict) -> None:
         """Build properties from meta dict"""
         self.name = meta_dict.get("name")
@@ -81,15 +135,36 @@ class Herb:
         self.source = meta_dict.get("source")
         self.metadata_uri = meta_dict.get("metadata_uri", "")
         self.uri = meta_dict.get("uri")
-        self.datapackage = Package(meta_dict.get("datapackage"))
-        if not self.datapackage:
-            self.update_datapackage()
 
-        if self.with_resources:
-            self.resources = [
-                self.get_resource(i, source_only=False)
-                for i in range(len(self.datapackage.resources))
-            ]
+    @cached_property
+    def datapackage(self) -> Package:
+        """datapackage of the herb, built on first access"""
+        datapackage = Package(self.herb_meta_json.get("datapackage"))
+        if not datapackage:
+            datapackage = self.update_datapackage()
+
+        return datapackage
+
+    @cached_property
+    def resources(self) -> List[Resource]:
+        """resources of the herb, built on first access"""
+        if not self.with_resources:
+            return []
+
+        return [
+            self.get_resource(i, source_only=False, download=False)
+            for i in range(len(self.datapackage.resources))
+        ]
+
+    @cached_property
+    def search_corpus(self) -> Dict[str, Any]:
+        """flattened metadata fields looked into by the search"""
+        return herb_search_corpus(self.herb_meta_json)
+
+    @property
+    def is_hydrated(self) -> bool:
+        """whether the datapackage of the herb has been built"""
+        return "datapackage" in self.__dict__
 
     def get_resource(
         self,
@@ -97,7 +172,28 @@ class Herb:
         path: Optional[str] = None,
         name: Optional[str] = None,
         source_only: bool = True,
+        download: bool = True,
+        cache: Optional[ResourceCache] = None,
     ) -> Resource:
+        """
+        get_resource finds the resource by index, path or name.
+
+        A resource whose file is in the base path of the herb is read from
+        there. Other resources of remote git herbs are read from the
+        resource cache, and fetched into the cache first if needed, see
+        `ResourceCache`. If `download` is False, or if there is no cache,
+        the resource points to the remote file. The base path of the herb is
+        left untouched; use `download_resource` or `dataherb download` to
+        download the herb itself.
+
+        :param idx: index of the resource in the datapackage
+        :param path: path of the resource
+        :param name: name of the resource
+        :param source_only: whether to return only the source of the resource
+        :param download: whether to download remote resources
+        :param cache: cache of the remote resources; defaults to the cache
+            in the workdir if dataherb is configured.
+        """
         if idx is None:
             if path:
                 all_paths = [
@@ -120,68 +216,180 @@ class Herb:
                     f"Please specify at least one of the keywords: idx, path, name."
                 )
 
-        if self.is_local:
+        r = self.datapackage.resources[idx]
+        is_local = self._is_local_resource(r.descriptor)
+        if download and not is_local and self.source == "git" and self.metadata_uri:
+            if cache is None:
+                cache = ResourceCache.default()
+            if cache is not None:
+                cached = cache.fetch(
+                    self.resource_url(r.descriptor.get("path", "")),
+                    bytes=r.descriptor.get("bytes"),
+                    hash=r.descriptor.get("hash"),
+                )
+                resource = Resource(
+                    {**r.descriptor, "path": cached.name},
+                    base_path=str(cached.parent),
+                )
+                return resource.source if source_only else resource
+
+        if is_local:
             logger.debug(
                 f"Using local dataset for {self.id}, sync it if you need the updated version."
             )
-            r = self.datapackage.resources[idx]
             logger.debug(f"using base_path: {str(self.base_path)}")
             logger.debug(f"using descriptor: {r.descriptor}")
             resource = Resource(r.descriptor, base_path=str(self.base_path))
             logger.debug(f"base_path of r_1: {resource._Resource__base_path}")
-        elif (not self.is_local) and (self.source == "git"):
+        elif self.source == "git":
             logger.debug(f"Using remote data")
-            self.remote_path = f"{self.metadata_uri[:-16]}"
-            r = self.datapackage.resources[idx]
             resource = Resource(
                 {
                     **(r.descriptor),
-                    **{"path": self.remote_path + r.descriptor.get("path", "")},
+                    **{"path": self.resource_url(r.descriptor.get("path", ""))},
                 }
             )
-        elif (not self.is_local) and (self.source == "s3"):
+        elif self.source == "s3":
             logger.debug(f"Using remote data")
             logger.debug(
                 f"Direct resource from S3 is not supported yet. "
                 f"Please sync the dataset to local using the command line first.\n"
                 f"TODO: Sync S3 to local after confirmation from here."
             )
-            resource = self.datapackage.resources[idx]
+            resource = r
         else:
             logger.error("Resource is not supported. Currently supporting S3 and git.")
-            resource = self.datapackage.resources[idx]
+            resource = r
 
         if source_only:
             return resource.source
         else:
             return resource
 
-    def update_datapackage(self) -> None:
+    def download_resource(
+        self,
+        idx: int,
+        overwrite: bool = False,
+        workers: Optional[int] = None,
+        siblings: bool = False,
+        blob_store: Optional[BlobStore] = None,
+    ) -> Path:
+        """
+        download_resource streams a resource of a git herb to the base path
+        of the herb, verifying the `bytes` and `hash` of the resource while
+        downloading. Interrupted downloads are resumed.
+
+        Large resources are downloaded in concurrent byte ranges, see
+        `download_segmented`.
+
+        Resources with a `hash` are kept in the blob store: a resource whose
+        hash is already known is linked to the blob instead of downloaded,
+        and a downloaded resource is added to the store, see `BlobStore`.
+
+        :param idx: index of the resource in the datapackage
+        :param overwrite: download even if the file exists
+        :param workers: number of concurrent byte ranges; by default,
+            resources of at least `SEGMENTED_DOWNLOAD_BYTES` are downloaded
+            in 4 ranges and the others in one stream.
+        :param siblings: download the precompressed `<path>.zst` or
+            `<path>.gz` of the resource if it is published, decompressing
+            it in one stream.
+        :param blob_store: store of the resource files; defaults to the
+            store in the workdir if dataherb is configured.
+        :return: path of the downloaded file
+        """
+        descriptor = self.datapackage.resources[idx].descriptor
+        path = descriptor.get("path", "")
+        size = descriptor.get("bytes")
+        hash = descriptor.get("hash")
+        destination = self.base_path / path
+
+        if destination.exists() and not overwrite:
+            logger.debug(f"{destination} exists, skipping download")
+            return destination
+
+        if blob_store is None and hash:
+            blob_store = BlobStore.default()
+        if blob_store is not None and hash:
+            linked = blob_store.link(hash, destination)
+            if linked:
+                logger.debug(f"Linked {destination} to a known blob ({linked})")
+                return destination
+
+        if workers is None:
+            workers = 4 if (size or 0) >= SEGMENTED_DOWNLOAD_BYTES else 1
+
+        if workers > 1 and not siblings:
+            download_segmented(
+                self.resource_url(path),
+                destination,
+                bytes=size,
+                hash=hash,
+                overwrite=overwrite,
+                workers=workers,
+            )
+        else:
+            download_file(
+                self.resource_url(path),
+                destination,
+                bytes=size,
+                hash=hash,
+                overwrite=overwrite,
+                siblings=siblings,
+            )
+
+        if blob_store is not None and hash:
+            blob_store.add(destination, hash=hash)
+
+        return destination
+
+    def update_datapackage(self, http_cache: Optional[HTTPCache] = None) -> Package:
         """
         update_datapackage gets the datapackage metadata from the metadata_uri
+
+        The metadata is only downloaded again if it has changed on the
+        server, see `HTTPCache`.
+
+        :param http_cache: cache of the http responses; defaults to the
+            cache in the workdir if dataherb is configured.
         """
 
         if self.source == "git":
-            file_content = get_data_from_url(self.metadata_uri)
+            if http_cache is None:
+                http_cache = HTTPCache.default()
 
-            if not file_content.status_code == 200:
-                file_error_msg = "Could not fetch remote file: {}; {}".format(
-                    self.metadata_uri, file_content.status_code
-                )
-                click.ClickException(file_error_msg)
-                # file_content = json.dumps([{"url": self.url, "error": file_error_msg}])
+            if http_cache is not None:
+                file_content = json.loads(http_cache.get(self.metadata_uri))
             else:
-                file_content = file_content.json()  # .decode(self.decode)
+                file_content = get_data_from_url(self.metadata_uri)
+
+                if not file_content.status_code == 200:
+                    file_error_msg = "Could not fetch remote file: {}; {}".format(
+                        self.metadata_uri, file_content.status_code
+                    )
+                    click.ClickException(file_error_msg)
+                    # file_content = json.dumps([{"url": self.url, "error": file_error_msg}])
+                else:
+                    file_content = file_content.json()  # .decode(self.decode)
         elif self.source == "s3":
             raise NotImplementedError(
                 "Directly get dataherb.json from S3 is not yet implemented."
             )
 
-        self.datapackage_meta = file_content
+        return self.set_datapackage(file_content)
+
+    def set_datapackage(self, datapackage_meta: dict) -> Package:
+        """
+        set_datapackage replaces the datapackage metadata of the herb
+
+        :param datapackage_meta: content of the datapackage.json
+        """
+        self.datapackage_meta = datapackage_meta
 
         self.herb_meta_json["datapackage"] = self.datapackage_meta
 
         self.datapackage = Package(self.datapackage_meta)
+        self.__dict__.pop("resources", None)
 
         return self.datapackage
 
@@ -199,17 +407,13 @@ class Herb:
         :type keys: list, optional
         """
 
-        if keys is None:
-            keys = ["name", "id", "repository", "tags", "description"]
-
         if not isinstance(keywords, (list, tuple, set)):
             keywords = [keywords]
 
-        herb_for_search = {
-            key: val for key, val in self.herb_meta_json.items() if key in keys
-        }
-
-        herb_for_search = _flatten_dict(herb_for_search)
+        if keys is None:
+            herb_for_search = self.search_corpus
+        else:
+            herb_for_search = herb_search_corpus(self.herb_meta_json, keys=keys)
 
         keywords_scores = []
         for keyword in keywords:
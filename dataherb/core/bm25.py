@@ -0,0 +1,208 @@
+import math
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from rapidfuzz import fuzz, process
+
+from dataherb.core.base import Herb
+from dataherb.core.inverted_index import tokenize
+
+FIELD_WEIGHTS = {"id": 3.0, "name": 2.5, "tags": 2.0, "description": 1.0}
+
+
+def field_tokens(metadata: dict, fields: Sequence[str]) -> Dict[str, List[str]]:
+    """
+    field_tokens tokenizes the fields of the herb that are ranked
+
+    :param metadata: the dictionary that specifies the herb
+    :param fields: names of the fields
+    """
+    tokens = {}
+    for field in fields:
+        value = metadata.get(field) or ""
+        if isinstance(value, (list, tuple)):
+            value = " ".join(str(v) for v in value)
+        tokens[field] = tokenize(str(value))
+
+    return tokens
+
+
+class BM25SearchEngine:
+    """
+    BM25SearchEngine ranks the herbs with field weighted BM25 (BM25F).
+
+    The term frequencies of the fields are weighted and normalized by the
+    average length of each field, and the document frequencies of the terms
+    are computed once when the engine is built. Keywords that do not show up
+    in the corpus are matched to similar terms using fuzzy matching, with the
+    contribution of the term scaled by the similarity, which tolerates typos.
+
+    Scores are reported relative to the best match, which scores 100, so
+    that `min_score` has the same range as the fuzzy search engine. The
+    threshold is therefore relative too: the best match is always kept,
+    however poorly it matches; use `min_bm25` for an absolute threshold on
+    the raw BM25 score, which is kept in `bm25`. Relative scores of
+    different engines are not comparable.
+
+    :param herbs: list of herbs
+    :param weights: weight of each field; defaults to `FIELD_WEIGHTS`.
+    :param k1: term frequency saturation of BM25
+    :param b: length normalization of BM25
+    :param fuzzy_cutoff: minimum similarity (0-100) of a keyword and a term
+        for the term to be considered a typo of the keyword.
+    :param expansion_cache_size: number of keyword tokens whose matching
+        terms are cached, see `expand`.
+    """
+
+    def __init__(
+        self,
+        herbs: List[Herb],
+        weights: Optional[Dict[str, float]] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+        fuzzy_cutoff: float = 80,
+        expansion_cache_size: int = 4096,
+    ):
+        self.herbs = herbs
+        self.weights = FIELD_WEIGHTS if weights is None else weights
+        self.k1 = k1
+        self.b = b
+        self.fuzzy_cutoff = fuzzy_cutoff
+
+        fields = list(self.weights)
+        lengths: Dict[str, List[int]] = {f: [] for f in fields}
+        self.postings: Dict[str, Dict[int, Dict[str, int]]] = {}
+        for i, herb in enumerate(herbs):
+            for field, tokens in field_tokens(herb.metadata, fields).items():
+                lengths[field].append(len(tokens))
+                for term, tf in Counter(tokens).items():
+                    self.postings.setdefault(term, {}).setdefault(i, {})[field] = tf
+
+        self.lengths = lengths
+        self.avg_lengths = {
+            f: (sum(v) / len(v) if v and sum(v) else 1.0) for f, v in lengths.items()
+        }
+        self.vocabulary = list(self.postings)
+
+        n = len(herbs)
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+        self._expand = lru_cache(maxsize=expansion_cache_size)(self._match_terms)
+
+    def _match_terms(self, token: str) -> List[tuple]:
+        if token in self.postings:
+            return [(token, 1.0)]
+
+        return [
+            (term, score / 100)
+            for term, score, _ in process.extract(
+                token,
+                self.vocabulary,
+                scorer=fuzz.ratio,
+                score_cutoff=self.fuzzy_cutoff,
+                limit=None,
+            )
+        ]
+
+    def expand(self, token: str) -> List[tuple]:
+        """
+        expand finds the terms of the corpus that match a keyword token,
+        cached across queries in a bounded LRU cache.
+
+        :param token: a keyword token
+        :return: list of (term, similarity) with similarity in [0, 1]
+        """
+        return self._expand(token)
+
+    def term_scores(self, term: str) -> Dict[int, float]:
+        """
+        term_scores calculates the BM25F score of a term for the herbs that
+        contain it
+
+        :param term: a term of the corpus
+        """
+        scores = {}
+        for i, tfs in self.postings.get(term, {}).items():
+            tf = sum(
+                self.weights[field]
+                * count
+                / (
+                    1
+                    - self.b
+                    + self.b * self.lengths[field][i] / self.avg_lengths[field]
+                )
+                for field, count in tfs.items()
+            )
+            scores[i] = self.idf[term] * tf / (self.k1 + tf)
+
+        return scores
+
+    def scores(self, keywords: Sequence[str]) -> Dict[int, float]:
+        """
+        scores calculates the BM25 score of the herbs that match any keyword
+
+        :param keywords: search keywords
+        :return: dictionary from the position of the herb to its score
+        """
+        tokens = []
+        for keyword in keywords:
+            tokens.extend(tokenize(str(keyword)))
+
+        herb_scores: Dict[int, float] = {}
+        for token in dict.fromkeys(tokens):
+            # a token contributes its best matching term to each herb
+            best: Dict[int, float] = {}
+            for term, similarity in self.expand(token):
+                for i, score in self.term_scores(term).items():
+                    best[i] = max(best.get(i, 0.0), similarity * score)
+            for i, score in best.items():
+                herb_scores[i] = herb_scores.get(i, 0.0) + score
+
+        return herb_scores
+
+    def search(
+        self,
+        keywords: Sequence[str],
+        min_score: float = 50,
+        limit: Optional[int] = None,
+        candidates: Optional[Iterable[int]] = None,
+        min_bm25: float = 0,
+    ) -> List[dict]:
+        """
+        search ranks the herbs that match the keywords
+
+        :param keywords: search keywords
+        :param min_score: minimum score of the herbs, relative to the best
+            match which scores 100; the best match is always kept
+        :param limit: maximum number of herbs to return, all if None
+        :param candidates: positions of the herbs to be ranked, all if None
+        :param min_bm25: minimum raw BM25 score of the herbs
+        :return: list of dicts with keys id, herb, score and bm25, ranked by
+            score
+        """
+        herb_scores = self.scores(keywords)
+        if candidates is not None:
+            allowed = set(candidates)
+            herb_scores = {i: s for i, s in herb_scores.items() if i in allowed}
+        herb_scores = {i: s for i, s in herb_scores.items() if s >= min_bm25}
+        top = max(herb_scores.values(), default=0.0)
+        if top <= 0:
+            return []
+
+        ranked = sorted(herb_scores.items(), key=lambda i: (-i[1], i[0]))
+        results = [
+            {
+                "id": self.herbs[i].id,
+                "herb": self.herbs[i],
+                "score": 100 * (score / top),
+                "bm25": score,
+            }
+            for i, score in ranked
+            if 100 * (score / top) >= min_score
+        ]
+
+        return results[:limit]
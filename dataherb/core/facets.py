@@ -0,0 +1,136 @@
+from pathlib import PurePosixPath
+from typing import Dict, Iterable, List, Mapping, Set, Union
+
+import numpy as np
+
+from dataherb.core.base import Herb
+
+FACETS = ["tag", "source", "license", "format"]
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    return [value]
+
+
+def facet_values(metadata: dict) -> Dict[str, Set[str]]:
+    """
+    facet_values extracts the facets of the herb from its metadata: the tags,
+    the source (e.g., git or s3), the licenses and the formats of the
+    resources. Values are lower cased.
+
+    :param metadata: the dictionary that specifies the herb
+    """
+    datapackage = metadata.get("datapackage") or {}
+
+    licenses = _as_list(metadata.get("license"))
+    for license in datapackage.get("licenses") or []:
+        if isinstance(license, dict):
+            licenses.append(license.get("name") or license.get("title"))
+        else:
+            licenses.append(license)
+
+    formats = []
+    for resource in datapackage.get("resources") or []:
+        format = resource.get("format")
+        if not format and isinstance(resource.get("path"), str):
+            format = PurePosixPath(resource["path"]).suffix.lstrip(".")
+        formats.append(format)
+
+    values = {
+        "tag": _as_list(metadata.get("tags")),
+        "source": _as_list(metadata.get("source")),
+        "license": licenses,
+        "format": formats,
+    }
+
+    return {
+        facet: {str(v).lower() for v in vals if v} for facet, vals in values.items()
+    }
+
+
+class FacetIndex:
+    """
+    Bitmaps of the herbs for every value of the facets tag, source, license
+    and format.
+
+    A query intersects the bitmaps of the facets, so that a search only
+    scores the herbs that pass the filters.
+
+    :param herbs: list of herbs
+    """
+
+    def __init__(self, herbs: List[Herb]):
+        self.herbs = herbs
+        self.bitmaps: Dict[str, Dict[str, np.ndarray]] = {f: {} for f in FACETS}
+        for i, herb in enumerate(herbs):
+            for facet, values in facet_values(herb.metadata).items():
+                for value in values:
+                    bitmap = self.bitmaps[facet].get(value)
+                    if bitmap is None:
+                        bitmap = np.zeros(len(herbs), dtype=bool)
+                        self.bitmaps[facet][value] = bitmap
+                    bitmap[i] = True
+
+    def values(self, facet: str) -> Dict[str, int]:
+        """
+        values of a facet with the number of herbs of each value
+
+        :param facet: name of the facet
+        """
+        return {
+            value: int(bitmap.sum())
+            for value, bitmap in sorted(self.bitmaps[facet].items())
+        }
+
+    def mask(self, **facets: Union[str, Iterable[str]]) -> np.ndarray:
+        """
+        mask of the herbs that match the facets
+
+        A herb has to match all the facets, and matches a facet if it has
+        any of the values given for the facet.
+
+        :param facets: values of the facets, e.g., `tag=["ml", "nlp"]`
+        """
+        mask = np.ones(len(self.herbs), dtype=bool)
+        for facet, values in facets.items():
+            if facet not in self.bitmaps:
+                raise Exception(f"Unknown facet {facet}; use one of {FACETS}")
+            if values is None:
+                continue
+            matched = np.zeros(len(self.herbs), dtype=bool)
+            for value in _as_list(values) if isinstance(values, str) else values:
+                bitmap = self.bitmaps[facet].get(str(value).lower())
+                if bitmap is not None:
+                    matched |= bitmap
+            mask &= matched
+
+        return mask
+
+    def positions(self, **facets: Union[str, Iterable[str]]) -> np.ndarray:
+        """
+        positions of the herbs that match the facets, see `mask`
+
+        :param facets: values of the facets
+        """
+        (positions,) = np.nonzero(self.mask(**facets))
+
+        return positions
+
+
+def facets_key(facets: Mapping[str, Union[str, Iterable[str]]]) -> tuple:
+    """
+    facets_key converts facets to a hashable key, e.g., for caches
+
+    :param facets: values of the facets
+    """
+    return tuple(
+        sorted(
+            (facet, tuple(sorted(_as_list(v) if isinstance(v, str) else v)))
+            for facet, v in facets.items()
+            if v is not None
+        )
+    )
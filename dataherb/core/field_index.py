@@ -0,0 +1,63 @@
+from typing import Dict, Iterator, List, Optional
+
+from dataherb.core.base import Herb
+
+
+def resource_fields(metadata: dict) -> Iterator[dict]:
+    """
+    resource_fields lists the schema fields of the resources in the
+    datapackage of the herb metadata, without loading the resources.
+
+    :param metadata: the dictionary that specifies the herb
+    :return: dicts with keys resource, path, name and type
+    """
+    for resource in (metadata.get("datapackage") or {}).get("resources", []):
+        for field in (resource.get("schema") or {}).get("fields", []):
+            if not field.get("name"):
+                continue
+            yield {
+                "resource": resource.get("name"),
+                "path": resource.get("path"),
+                "name": field["name"],
+                "type": field.get("type"),
+            }
+
+
+class FieldIndex:
+    """
+    An index of the column names in the resource schemas of the herbs.
+
+    Field names are matched case insensitively. The index is built from the
+    herb metadata, so that the resources of the herbs are never hydrated.
+
+    :param herbs: list of herbs
+    """
+
+    def __init__(self, herbs: List[Herb]):
+        self.herbs = herbs
+        self.fields: Dict[str, Dict[int, List[dict]]] = {}
+        for i, herb in enumerate(herbs):
+            for field in resource_fields(herb.metadata):
+                self.fields.setdefault(field["name"].lower(), {}).setdefault(
+                    i, []
+                ).append(field)
+
+    def find(self, name: str, type: Optional[str] = None) -> List[dict]:
+        """
+        find the herbs that have a field with the name
+
+        :param name: name of the field
+        :param type: type of the field, e.g., `string`; any type if None
+        :return: list of dicts with keys id, herb and fields, in the order
+            of the herbs
+        """
+        found = []
+        for i, fields in sorted(self.fields.get(name.lower(), {}).items()):
+            if type is not None:
+                fields = [f for f in fields if f["type"] == type]
+            if fields:
+                found.append(
+                    {"id": self.herbs[i].id, "herb": self.herbs[i], "fields": fields}
+                )
+
+        return found
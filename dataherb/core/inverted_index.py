@@ -0,0 +1,246 @@
+import hashlib
+import math
+import pickle
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from loguru import logger
+
+from dataherb.core.base import herb_search_corpus
+from dataherb.utils.files import atomic_write_bytes
+
+logger.remove()
+logger.add(sys.stderr, level="INFO", enqueue=True)
+
+
+INDEX_VERSION = 2
+
+
+def indexed_text(metadata: dict) -> List[str]:
+    """
+    indexed_text collects the texts of the herb that go into the index,
+    which are the texts scored by the fuzzy search: the fields in
+    `SEARCH_KEYS`, see `herb_search_corpus`.
+
+    :param metadata: the dictionary that specifies the herb
+    """
+    return [str(v) for v in herb_search_corpus(metadata).values() if v is not None]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    tokenize splits the text into lower case words
+
+    :param text: text to be tokenized
+    """
+    return re.findall(r"[^\W_]+", text.lower())
+
+
+def ngrams(token: str, n: int = 3) -> List[str]:
+    """
+    ngrams generates the character n-grams of a token, with the token
+    padded so that the beginning and the end of a word have their own
+    n-grams.
+
+    :param token: a word
+    :param n: size of the n-grams
+    """
+    padded = f" {token} "
+    if len(padded) <= n:
+        return [padded]
+
+    return [padded[i : i + n] for i in range(len(padded) - n + 1)]
+
+
+def _terms(metadata: dict) -> Set[str]:
+    """terms of the herb: words prefixed with `w:` and n-grams with `g:`"""
+    terms = set()
+    for text in indexed_text(metadata):
+        for token in tokenize(text):
+            terms.add(f"w:{token}")
+            terms.update(f"g:{g}" for g in ngrams(token))
+
+    return terms
+
+
+def _fingerprint(metadata: dict) -> str:
+    return hashlib.blake2b(
+        "\x1f".join(indexed_text(metadata)).encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+class InvertedIndex:
+    """
+    An inverted index of the words and character trigrams of the herbs.
+
+    The index maps each term to the ids of the herbs that contain it, and is
+    used to shortlist the candidates of a keyword search. A herb is a
+    candidate if it contains a keyword as a word, or shares a large enough
+    fraction of the trigrams of a keyword, which tolerates typos.
+
+    The shortlist is not exact: a fuzzy match of a short keyword, e.g.,
+    `jbs` for `jobs`, shares too few trigrams to become a candidate. See
+    `shortlist` for the keywords whose shortlists are used.
+
+    :param min_overlap: minimum fraction of the trigrams of a keyword that a
+        herb needs to share to become a candidate.
+    :param min_token_length: words of the keywords shorter than this have
+        too few trigrams for a shortlist.
+    """
+
+    def __init__(self, min_overlap: float = 0.5, min_token_length: int = 4):
+        self.min_overlap = min_overlap
+        self.min_token_length = min_token_length
+        self.postings: Dict[str, Set[str]] = {}
+        self.herb_terms: Dict[str, Set[str]] = {}
+        self.fingerprints: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.herb_terms)
+
+    def add(self, id: str, metadata: dict) -> None:
+        """
+        Add or replace a herb in the index
+
+        :param id: herb id
+        :param metadata: the dictionary that specifies the herb
+        """
+        if id in self.herb_terms:
+            self.remove(id)
+
+        terms = _terms(metadata)
+        for term in terms:
+            self.postings.setdefault(term, set()).add(id)
+        self.herb_terms[id] = terms
+        self.fingerprints[id] = _fingerprint(metadata)
+
+    def remove(self, id: str) -> None:
+        """
+        Remove a herb from the index
+
+        :param id: herb id
+        """
+        for term in self.herb_terms.pop(id, set()):
+            ids = self.postings.get(term)
+            if ids is None:
+                continue
+            ids.discard(id)
+            if not ids:
+                self.postings.pop(term)
+        self.fingerprints.pop(id, None)
+
+    def sync(self, metadatas: Dict[str, dict]) -> bool:
+        """
+        sync updates the index incrementally to match the herbs
+
+        Only the herbs that are new or whose indexed texts have changed are
+        indexed again.
+
+        :param metadatas: dictionary from herb id to herb metadata
+        :return: whether the index has changed
+        """
+        changed = False
+        for id in set(self.herb_terms) - set(metadatas):
+            self.remove(id)
+            changed = True
+
+        for id, metadata in metadatas.items():
+            if self.fingerprints.get(id) != _fingerprint(metadata):
+                self.add(id, metadata)
+                changed = True
+
+        return changed
+
+    def candidates(self, keywords: Iterable[str]) -> Set[str]:
+        """
+        candidates finds the ids of the herbs that may match the keywords
+
+        :param keywords: search keywords
+        """
+        found: Set[str] = set()
+        for keyword in keywords:
+            for token in tokenize(str(keyword)):
+                found.update(self.postings.get(f"w:{token}", set()))
+
+                grams = set(ngrams(token))
+                counts: Counter = Counter()
+                for g in grams:
+                    counts.update(self.postings.get(f"g:{g}", set()))
+
+                threshold = math.ceil(self.min_overlap * len(grams))
+                found.update(id for id, c in counts.items() if c >= threshold)
+
+        return found
+
+    def shortlist(self, keywords: Iterable[str]) -> Optional[Set[str]]:
+        """
+        shortlist finds the candidates of a search, see `candidates`, or None
+        if the search has to score all the herbs: when a word of the keywords
+        is too short for its trigrams to find typos, or when nothing is found,
+        as a fuzzy match may still score high enough.
+
+        :param keywords: search keywords
+        """
+        keywords = list(keywords)
+        tokens = [t for keyword in keywords for t in tokenize(str(keyword))]
+        if not tokens or any(len(t) < self.min_token_length for t in tokens):
+            return None
+
+        return self.candidates(keywords) or None
+
+    def save(self, path: Path) -> None:
+        """
+        Save the index to disk
+
+        :param path: path to the index file
+        """
+        content = pickle.dumps(
+            {
+                "version": INDEX_VERSION,
+                "min_overlap": self.min_overlap,
+                "postings": self.postings,
+                "herb_terms": self.herb_terms,
+                "fingerprints": self.fingerprints,
+            },
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        try:
+            atomic_write_bytes(path, content)
+        except OSError as e:
+            logger.warning(f"Can not write search index {path}: {e}")
+
+    @classmethod
+    def load(cls, path: Path, min_overlap: Optional[float] = None) -> "InvertedIndex":
+        """
+        Load the index from disk; an empty index is returned if the file does
+        not exist or can not be read.
+
+        :param path: path to the index file
+        :param min_overlap: overrides the min_overlap stored in the index
+        """
+        index = cls()
+        if not path.exists():
+            return index
+
+        try:
+            with open(path, "rb") as fp:
+                content = pickle.load(fp)
+        except Exception as e:
+            logger.warning(f"Can not read search index {path}: {e}")
+            return index
+
+        if not isinstance(content, dict) or content.get("version") != INDEX_VERSION:
+            logger.debug(f"Discarding outdated search index {path}")
+            return index
+
+        index.min_overlap = content["min_overlap"]
+        index.postings = content["postings"]
+        index.herb_terms = content["herb_terms"]
+        index.fingerprints = content["fingerprints"]
+        if min_overlap is not None:
+            index.min_overlap = min_overlap
+
+        return index
@@ -1,18 +1,20 @@
-from typing import Sequence, Union, List, Sequence, Optional
+import heapq
+from typing import Iterable, Iterator, Sequence, Union, List, Sequence, Optional
 
 from dataherb.core.base import Herb
 
 
-def search_by_keywords_in_flora(
-    flora: List[Herb],
+def iter_search_by_keywords_in_flora(
+    flora: Iterable[Herb],
     keywords: List[str],
     keys: Optional[List[str]] = None,
     min_score: float = 50,
-) -> List[dict]:
+) -> Iterator[dict]:
     """
-    search_in_flora calculates the match score of each herb and returns the top 10.
+    iter_search_by_keywords_in_flora yields the herbs that match the
+    keywords as soon as they are scored, in the order of the flora.
 
-    :param flora: list of herbs
+    :param flora: herbs to be searched
     :param keywords: search keywords
     :param keys: list of dictionary keys to look into
     :param min_score: minimum score of the dataset, default to 50
@@ -21,21 +23,42 @@ def search_by_keywords_in_flora(
     if not isinstance(keywords, List):
         keywords = [keywords]
 
-    herb_scores = []
-
     for herb in flora:
-        herb_search_score = {
-            "id": herb.id,
-            "herb": herb,
-            "score": herb.search_score(keywords),
-        }
-        herb_scores.append(herb_search_score)
+        score = herb.search_score(keywords, keys=keys)
+        if score >= min_score:
+            yield {"id": herb.id, "herb": herb, "score": score}
+
+
+def search_by_keywords_in_flora(
+    flora: Iterable[Herb],
+    keywords: List[str],
+    keys: Optional[List[str]] = None,
+    min_score: float = 50,
+    limit: Optional[int] = None,
+) -> List[dict]:
+    """
+    search_in_flora calculates the match score of each herb and returns
+    the herbs ranked by score.
+
+    With a limit, only the top herbs are kept in a bounded heap while the
+    flora is scored.
+
+    :param flora: list of herbs
+    :param keywords: search keywords
+    :param keys: list of dictionary keys to look into
+    :param min_score: minimum score of the dataset, default to 50
+    :param limit: maximum number of herbs to return, all if None
+    """
 
-    ranked_herbs = sorted(herb_scores, key=lambda i: i["score"], reverse=True)
+    matches = iter_search_by_keywords_in_flora(
+        flora, keywords, keys=keys, min_score=min_score
+    )
 
-    ranked_herbs = [i for i in ranked_herbs if i.get("score", 0) >= min_score]
+    if limit is not None:
+        # ties keep the order of the flora, same as sorted
+        return heapq.nlargest(limit, matches, key=lambda i: i["score"])
 
-    return ranked_herbs
+    return sorted(matches, key=lambda i: i["score"], reverse=True)
 
 
 def search_by_ids_in_flora(flora: List[Herb], ids: Sequence[str]) -> List[dict]:
@@ -50,12 +73,14 @@ def search_by_ids_in_flora(flora: List[Herb], ids: Sequence[str]) -> List[dict]:
     :rtype: list
     """
 
-    if not isinstance(ids, Sequence):
+    if isinstance(ids, str) or not isinstance(ids, Sequence):
         ids = [ids]
 
+    ids_set = set(ids)
+
     herbs = []
     for herb in flora:
-        if herb.id in ids:
+        if herb.id in ids_set:
             herb_matched = {"herb": herb, "id": herb.id}
             herbs.append(herb_matched)
 
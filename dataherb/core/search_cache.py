@@ -0,0 +1,67 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+
+class SearchCache:
+    """
+    A bounded least recently used cache of search results.
+
+    The keys are built by the caller and should include everything the
+    results depend on, e.g., the version of the flora, so that stale
+    results are never returned.
+
+    :param maxsize: maximum number of cached searches; 0 disables the cache.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results: "OrderedDict[Hashable, List[dict]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get(self, key: Hashable) -> Optional[List[dict]]:
+        """
+        Get the cached results and mark them as recently used
+
+        :param key: key of the search
+        :return: a copy of the cached results, or None if not cached
+        """
+        if key not in self._results:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._results.move_to_end(key)
+
+        return list(self._results[key])
+
+    def put(self, key: Hashable, results: List[dict]) -> None:
+        """
+        Cache the results, evicting the least recently used ones
+
+        :param key: key of the search
+        :param results: results of the search
+        """
+        if self.maxsize <= 0:
+            return
+
+        self._results[key] = list(results)
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all the cached results"""
+        self._results.clear()
+
+    def info(self) -> Dict[str, int]:
+        """hits, misses, size and maxsize of the cache"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._results),
+            "maxsize": self.maxsize,
+        }
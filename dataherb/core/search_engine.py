@@ -0,0 +1,138 @@
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from dataherb.core.base import Herb
+
+
+class FuzzySearchEngine:
+    """
+    FuzzySearchEngine scores all the herbs of a flora in one batch.
+
+    The search corpus of every herb is flattened into one list of choices
+    when the engine is built. A search scores all the keywords against all
+    the choices in a single call of `rapidfuzz.process.cdist`, and the score
+    of a herb is the maximum score among its choices, the same as
+    `Herb.search_score`.
+
+    :param herbs: list of herbs
+    :param workers: number of threads used for the scoring; -1 uses all cores.
+    """
+
+    def __init__(self, herbs: List[Herb], workers: int = -1):
+        self.herbs = herbs
+        self.workers = workers
+
+        choices = []
+        owners = []
+        for i, herb in enumerate(herbs):
+            for val in herb.search_corpus.values():
+                if val is None:
+                    continue
+                choices.append(str(val))
+                owners.append(i)
+
+        self.choices = choices
+        self.owners = np.asarray(owners, dtype=np.intp)
+
+        self.positions: Dict[str, int] = {}
+        for i, herb in enumerate(herbs):
+            self.positions.setdefault(herb.id, i)
+
+    def _mask(self, candidates: Iterable[int]) -> np.ndarray:
+        """boolean mask of the herbs at the candidate positions"""
+        mask = np.zeros(len(self.herbs), dtype=bool)
+        mask[np.fromiter(candidates, dtype=np.intp)] = True
+
+        return mask
+
+    def scores(
+        self,
+        keywords: Sequence[str],
+        score_cutoff: float = 0,
+        candidates: Optional[Iterable[int]] = None,
+    ) -> np.ndarray:
+        """
+        scores calculates the score of every herb
+
+        :param keywords: search keywords
+        :param score_cutoff: choice scores below the cutoff are set to 0
+        :param candidates: positions of the herbs to be scored; the other
+            herbs get a score of 0. All herbs are scored if None.
+        :return: array of scores, aligned with the herbs
+        """
+        herb_scores = np.zeros(len(self.herbs), dtype=np.float64)
+        if not self.choices or not keywords:
+            return herb_scores
+
+        owners = self.owners
+        choices = self.choices
+        if candidates is not None:
+            (selected,) = np.nonzero(self._mask(candidates)[self.owners])
+            if not len(selected):
+                return herb_scores
+            owners = self.owners[selected]
+            choices = [self.choices[j] for j in selected]
+
+        matrix = process.cdist(
+            [str(k) for k in keywords],
+            choices,
+            scorer=fuzz.token_set_ratio,
+            score_cutoff=score_cutoff,
+            dtype=np.float64,
+            workers=self.workers,
+        )
+        np.maximum.at(herb_scores, owners, matrix.max(axis=0))
+
+        return herb_scores
+
+    def search(
+        self,
+        keywords: Sequence[str],
+        min_score: float = 50,
+        limit: Optional[int] = None,
+        candidates: Optional[Iterable[int]] = None,
+    ) -> List[dict]:
+        """
+        search ranks the herbs that match the keywords
+
+        :param keywords: search keywords
+        :param min_score: minimum score of the herbs
+        :param limit: maximum number of herbs to return, all if None
+        :param candidates: positions of the herbs to be scored, all if None
+        :return: list of dicts with keys id, herb and score, ranked by score
+        """
+        if candidates is not None:
+            candidates = list(candidates)
+
+        herb_scores = self.scores(
+            keywords, score_cutoff=min_score, candidates=candidates
+        )
+
+        is_selected = herb_scores >= min_score
+        if candidates is not None:
+            is_selected &= self._mask(candidates)
+        (positions,) = np.nonzero(is_selected)
+        selected = herb_scores[positions]
+
+        if limit is not None and len(positions) > limit:
+            if limit <= 0:
+                return []
+            threshold = np.partition(selected, len(selected) - limit)[
+                len(selected) - limit
+            ]
+            keep = selected >= threshold
+            positions, selected = positions[keep], selected[keep]
+
+        # rank by score; ties keep the order of the flora
+        order = np.lexsort((positions, -selected))[:limit]
+
+        return [
+            {
+                "id": self.herbs[i].id,
+                "herb": self.herbs[i],
+                "score": float(herb_scores[i]),
+            }
+            for i in positions[order]
+        ]
@@ -0,0 +1,196 @@
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Union
+
+import requests
+from loguru import logger
+from yarl import URL
+
+from dataherb.fetch.remote import get_data_from_url, new_session
+
+logger.remove()
+logger.add(sys.stderr, level="INFO", enqueue=True)
+
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class HostRateLimiter:
+    """
+    HostRateLimiter spaces out the requests to the same host.
+
+    :param rate: maximum number of requests per second to each host; no
+        limit if None.
+    """
+
+    def __init__(self, rate: Optional[float] = None):
+        self.rate = rate
+        self._next: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def wait(self, link: str) -> None:
+        """
+        wait until a request to the host of the link is allowed
+
+        :param link: url of the request
+        """
+        if not self.rate:
+            return
+
+        host = URL(link).host or ""
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + 1 / self.rate
+            if start > now:
+                await asyncio.sleep(start - now)
+
+
+async def async_get_data_from_url(
+    link: str,
+    session: Optional[requests.Session] = None,
+    executor: Optional[ThreadPoolExecutor] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    retries: int = 3,
+    backoff_factor: float = 0.3,
+    headers: Optional[dict] = None,
+    timeout: Optional[tuple] = None,
+) -> requests.Response:
+    """
+    async_get_data_from_url is the asyncio counterpart of
+    `get_data_from_url`.
+
+    The request runs on the pooled session in a worker thread. Failed
+    connections and responses with a status in `RETRY_STATUS` are retried
+    with exponential backoff, waiting in the event loop instead of blocking
+    the thread.
+
+    :param link: link to the data file
+    :param session: requests session; defaults to the shared session
+    :param executor: thread pool that runs the requests; defaults to the
+        default executor of the event loop
+    :param semaphore: bounds the number of concurrent requests
+    :param rate_limiter: limits the rate of requests per host
+    :param retries: number of retries
+    :param backoff_factor: the n-th retry waits backoff_factor * 2 ** n
+        seconds
+    :param headers: headers of the request
+    :param timeout: timeout of the request
+    :return: the response of the last attempt
+    """
+    loop = asyncio.get_running_loop()
+
+    for attempt in range(retries + 1):
+        if semaphore is not None:
+            await semaphore.acquire()
+        try:
+            if rate_limiter is not None:
+                await rate_limiter.wait(link)
+            response = await loop.run_in_executor(
+                executor,
+                lambda: get_data_from_url(
+                    link, headers=headers, timeout=timeout, session=session
+                ),
+            )
+        except (
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.RetryError,
+        ) as e:
+            if attempt == retries:
+                raise
+            logger.debug(f"Retrying {link} after {e}")
+        else:
+            if response.status_code not in RETRY_STATUS or attempt == retries:
+                return response
+            logger.debug(f"Retrying {link} after status {response.status_code}")
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+        await asyncio.sleep(backoff_factor * 2**attempt)
+
+    raise Exception(f"Could not fetch {link}")
+
+
+async def fetch_all(
+    links: Sequence[str],
+    concurrency: int = 32,
+    rate: Optional[float] = None,
+    retries: int = 3,
+    backoff_factor: float = 0.3,
+) -> List[Union[requests.Response, BaseException]]:
+    """
+    fetch_all fetches the links concurrently.
+
+    :param links: links to be fetched
+    :param concurrency: maximum number of requests in flight
+    :param rate: maximum number of requests per second to each host
+    :param retries: number of retries of each link
+    :param backoff_factor: backoff of the retries, see
+        `async_get_data_from_url`
+    :return: the responses, or the exceptions of the links that failed, in
+        the order of the links
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    rate_limiter = HostRateLimiter(rate)
+    # retries are handled here so that they don't block a worker thread;
+    # without a status forcelist, urllib3 returns the failed responses
+    # instead of raising a RetryError
+    session = new_session(
+        {"retries": 0, "status_forcelist": ()}, pool_maxsize=concurrency
+    )
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return await asyncio.gather(
+                *[
+                    async_get_data_from_url(
+                        link,
+                        session=session,
+                        executor=executor,
+                        semaphore=semaphore,
+                        rate_limiter=rate_limiter,
+                        retries=retries,
+                        backoff_factor=backoff_factor,
+                    )
+                    for link in links
+                ],
+                return_exceptions=True,
+            )
+    finally:
+        session.close()
+
+
+def fetch_many(
+    links: Sequence[str], **kwargs
+) -> List[Union[requests.Response, BaseException]]:
+    """
+    fetch_many fetches the links concurrently from synchronous code, see
+    `fetch_all` for the arguments.
+
+    It can also be called while an event loop is running, e.g., in a
+    notebook, in which case the links are fetched in a separate thread.
+
+    :param links: links to be fetched
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(fetch_all(links, **kwargs))
+
+    results: list = []
+
+    def _run():
+        results.extend(asyncio.run(fetch_all(links, **kwargs)))
+
+    thread = threading.Thread(target=_run)
+    thread.start()
+    thread.join()
+
+    return results
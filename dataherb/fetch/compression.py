@@ -0,0 +1,100 @@
+import gzip
+import zlib
+from typing import List
+
+from urllib3.util.request import ACCEPT_ENCODING
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, install dataherb[zstd]
+    zstandard = None  # type: ignore
+
+
+COMPRESSED_SUFFIXES = [".zst", ".gz"]
+
+
+def accept_encoding() -> str:
+    """
+    the encodings that the http client can decode, e.g., `gzip,deflate` and
+    `zstd` if zstandard is installed
+    """
+    return ACCEPT_ENCODING
+
+
+def available_suffixes() -> List[str]:
+    """
+    suffixes of the precompressed files that can be decompressed, in order
+    of preference
+    """
+    return [s for s in COMPRESSED_SUFFIXES if s != ".zst" or zstandard is not None]
+
+
+def _check(suffix: str) -> None:
+    if suffix not in COMPRESSED_SUFFIXES:
+        raise Exception(f"Unsupported compression: {suffix}")
+    if suffix == ".zst" and zstandard is None:
+        raise Exception("zstandard is required for .zst files: pip install zstandard")
+
+
+class StreamDecompressor:
+    """
+    StreamDecompressor decompresses a gzip or zstd stream chunk by chunk.
+
+    :param suffix: `.gz` or `.zst`
+    """
+
+    def __init__(self, suffix: str):
+        _check(suffix)
+        self.suffix = suffix
+        self._decompressor = self._new()
+
+    def _new(self):
+        if self.suffix == ".gz":
+            return zlib.decompressobj(wbits=31)
+        return zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, chunk: bytes) -> bytes:
+        """decompress the next chunk of the stream"""
+        output = self._decompressor.decompress(chunk)
+        # concatenated gzip members, e.g., from appending
+        while self.suffix == ".gz" and self._decompressor.unused_data:
+            unused = self._decompressor.unused_data
+            self._decompressor = self._new()
+            output += self._decompressor.decompress(unused)
+
+        return output
+
+    def flush(self) -> bytes:
+        """the remaining output once the stream has ended"""
+        if self.suffix == ".gz":
+            if not self._decompressor.eof:
+                raise Exception("Compressed stream ended early")
+            return self._decompressor.flush()
+
+        return b""
+
+
+def decompress(content: bytes, suffix: str) -> bytes:
+    """
+    decompress the content of a `.gz` or `.zst` file
+
+    :param content: compressed content
+    :param suffix: `.gz` or `.zst`
+    """
+    decompressor = StreamDecompressor(suffix)
+
+    return decompressor.decompress(content) + decompressor.flush()
+
+
+def compress(content: bytes, suffix: str) -> bytes:
+    """
+    compress the content into a `.gz` or `.zst` file
+
+    :param content: content to be compressed
+    :param suffix: `.gz` or `.zst`
+    """
+    _check(suffix)
+    if suffix == ".gz":
+        return gzip.compress(content, compresslevel=9, mtime=0)
+
+    return zstandard.ZstdCompressor(level=19).compress(content)
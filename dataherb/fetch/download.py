@@ -0,0 +1,495 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+from loguru import logger
+
+from dataherb.fetch.compression import (
+    StreamDecompressor,
+    accept_encoding,
+    available_suffixes,
+)
+from dataherb.fetch.remote import get_session, random_user_agent
+
+logger.remove()
+logger.add(sys.stderr, level="INFO", enqueue=True)
+
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def parse_hash(hash: str) -> Tuple[str, str]:
+    """
+    parse_hash splits the `hash` of a datapackage resource into the
+    algorithm and the hex digest, e.g., `sha256:abc...`. The algorithm
+    defaults to md5, as in the data package specification.
+
+    :param hash: hash of the resource
+    """
+    if ":" in hash:
+        algorithm, digest = hash.split(":", 1)
+    else:
+        algorithm, digest = "md5", hash
+
+    algorithm = algorithm.lower().replace("-", "")
+    if algorithm not in hashlib.algorithms_available:
+        raise Exception(f"Unsupported hash algorithm: {algorithm}")
+
+    return algorithm, digest.lower()
+
+
+def part_path(destination: Path) -> Path:
+    """path of the partial download of the destination"""
+    return destination.with_name(f"{destination.name}.part")
+
+
+def _hash_file(hasher, path: Path) -> None:
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+
+
+def verify_file(
+    path: Path, bytes: Optional[int] = None, hash: Optional[str] = None
+) -> None:
+    """
+    verify_file checks the size and the hash of a file, as specified by the
+    `bytes` and `hash` of a datapackage resource
+
+    :param path: path to the file
+    :param bytes: expected size of the file
+    :param hash: expected hash of the file, see `parse_hash`
+    """
+    size = path.stat().st_size
+    if bytes is not None and size != bytes:
+        raise Exception(f"{path} has {size} bytes, expected {bytes}")
+
+    if hash:
+        algorithm, digest = parse_hash(hash)
+        hasher = hashlib.new(algorithm)
+        _hash_file(hasher, path)
+        if hasher.hexdigest() != digest:
+            raise Exception(f"{algorithm} of {path} does not match {hash}")
+
+
+def _write_stream(
+    response: requests.Response,
+    fp,
+    size: int,
+    hasher,
+    bytes: Optional[int],
+    chunk_size: int,
+    decompressor: Optional[StreamDecompressor] = None,
+) -> int:
+    """
+    write the body of the response to fp, decompressing it on the fly if a
+    decompressor is given; return the size of the file
+    """
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        fp.write(chunk)
+        size += len(chunk)
+        if hasher is not None:
+            hasher.update(chunk)
+        if bytes is not None and size > bytes:
+            return size
+
+    if decompressor is not None:
+        chunk = decompressor.flush()
+        fp.write(chunk)
+        size += len(chunk)
+        if hasher is not None:
+            hasher.update(chunk)
+
+    return size
+
+
+def _download_sibling(
+    url: str,
+    part: Path,
+    hasher,
+    bytes: Optional[int],
+    chunk_size: int,
+    session: requests.Session,
+    timeout: tuple,
+) -> Optional[int]:
+    """
+    download the first precompressed sibling of the url that exists, e.g.,
+    `data.csv.zst` or `data.csv.gz`, decompressing it into the part file;
+    return the size of the file, or None if there is no sibling
+    """
+    for suffix in available_suffixes():
+        headers = {**random_user_agent(), "Accept-Encoding": "identity"}
+        with session.get(
+            f"{url}{suffix}", headers=headers, stream=True, timeout=timeout
+        ) as response:
+            if response.status_code != 200:
+                continue
+            logger.debug(f"Downloading precompressed {url}{suffix}")
+            with open(part, "wb") as fp:
+                size = _write_stream(
+                    response,
+                    fp,
+                    0,
+                    hasher,
+                    bytes,
+                    chunk_size,
+                    decompressor=StreamDecompressor(suffix),
+                )
+                fp.flush()
+                os.fsync(fp.fileno())
+            return size
+
+    return None
+
+
+def download_file(
+    url: str,
+    destination: Path,
+    bytes: Optional[int] = None,
+    hash: Optional[str] = None,
+    overwrite: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+    session: Optional[requests.Session] = None,
+    timeout: Optional[tuple] = None,
+    siblings: bool = False,
+) -> Path:
+    """
+    download_file streams the url to the destination without holding the
+    file in memory.
+
+    The data is written to `<destination>.part` and renamed to the
+    destination once it is complete and verified, so the destination is
+    never a partial file. An existing `.part` file from an interrupted
+    download is resumed with a Range request; if the server does not
+    support ranges, the download starts over.
+
+    The size and the hash are checked while the data streams in, e.g., with
+    the `bytes` and `hash` of the datapackage resource. A partial file that
+    fails the checks is removed.
+
+    The response may be compressed with any encoding in `accept_encoding`;
+    resumed downloads ask for the identity encoding as the byte ranges
+    refer to the file itself. With `siblings`, a precompressed
+    `<url>.zst` or `<url>.gz` is downloaded instead of the url if it is
+    published, and decompressed while it streams in.
+
+    :param url: url of the file
+    :param destination: path of the downloaded file
+    :param bytes: expected size of the file
+    :param hash: expected hash of the file, e.g., `sha256:...`; plain hex
+        digests are md5.
+    :param overwrite: download even if the destination exists
+    :param chunk_size: size of the chunks written to disk
+    :param session: requests session; defaults to the shared session
+    :param timeout: timeout of the request
+    :param siblings: look for precompressed siblings of the url
+    :return: the destination
+    """
+    destination = Path(destination)
+    if destination.exists() and not overwrite:
+        logger.debug(f"{destination} exists, skipping download")
+        return destination
+
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    part = part_path(destination)
+    if session is None:
+        session = get_session()
+    if timeout is None:
+        timeout = (5, 60)
+
+    hasher = hashlib.new(parse_hash(hash)[0]) if hash else None
+    offset = part.stat().st_size if part.exists() else 0
+    if bytes is not None and offset > bytes:
+        part.unlink()
+        offset = 0
+
+    size: Optional[int] = None
+    if siblings and not offset:
+        size = _download_sibling(url, part, hasher, bytes, chunk_size, session, timeout)
+
+    if size is None:
+        headers = {**random_user_agent(), "Accept-Encoding": accept_encoding()}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["Accept-Encoding"] = "identity"
+
+        with session.get(
+            url, headers=headers, stream=True, timeout=timeout
+        ) as response:
+            if response.status_code == 416 and offset:
+                # the partial file is already complete
+                mode = "ab"
+            elif response.status_code == 206 and offset:
+                logger.debug(f"Resuming download of {url} from byte {offset}")
+                mode = "ab"
+            elif response.status_code == 200:
+                mode = "wb"
+                offset = 0
+            else:
+                raise Exception(f"Could not download {url}; {response.status_code}")
+
+            if hasher is not None and offset:
+                _hash_file(hasher, part)
+
+            size = offset
+            with open(part, mode) as fp:
+                if response.status_code != 416:
+                    size = _write_stream(response, fp, size, hasher, bytes, chunk_size)
+                fp.flush()
+                os.fsync(fp.fileno())
+
+    try:
+        if bytes is not None and size != bytes:
+            raise Exception(f"Downloaded {size} bytes from {url}, expected {bytes}")
+        if hasher is not None and hasher.hexdigest() != parse_hash(hash or "")[1]:
+            raise Exception(f"Hash of {url} does not match {hash}")
+    except Exception:
+        part.unlink()
+        raise
+
+    os.replace(part, destination)
+
+    return destination
+
+
+class DownloadProgress:
+    """
+    DownloadProgress counts the bytes of a download, and can be shared by
+    the threads of a segmented download.
+
+    :param total: size of the download, if known
+    :param callback: called with the progress after every chunk
+    """
+
+    def __init__(
+        self,
+        total: Optional[int] = None,
+        callback: Optional[Callable[["DownloadProgress"], None]] = None,
+    ):
+        self.total = total
+        self.callback = callback
+        self.downloaded = 0
+        self.retries = 0
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def update(self, size: int) -> None:
+        """add size bytes to the download"""
+        with self._lock:
+            self.downloaded += size
+        if self.callback is not None:
+            self.callback(self)
+
+    def retried(self) -> None:
+        """count a retry"""
+        with self._lock:
+            self.retries += 1
+
+    @property
+    def elapsed(self) -> float:
+        """seconds since the download started"""
+        return time.monotonic() - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """bytes per second"""
+        return self.downloaded / max(self.elapsed, 1e-9)
+
+    def report(self) -> Dict[str, Any]:
+        """summary of the download"""
+        return {
+            "downloaded": self.downloaded,
+            "total": self.total,
+            "seconds": self.elapsed,
+            "throughput": self.throughput,
+            "retries": self.retries,
+        }
+
+
+def _probe(url: str, session: requests.Session, timeout: tuple) -> Optional[int]:
+    """size of the file if the server supports range requests, else None"""
+    headers = {
+        **random_user_agent(),
+        "Range": "bytes=0-0",
+        "Accept-Encoding": "identity",
+    }
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        content_range = response.headers.get("Content-Range", "")
+        if response.status_code == 206 and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            if total.isdigit():
+                return int(total)
+
+    return None
+
+
+def _download_segment(
+    url: str,
+    part: Path,
+    start: int,
+    end: int,
+    session: requests.Session,
+    timeout: tuple,
+    progress: DownloadProgress,
+    retries: int,
+    backoff_factor: float,
+    chunk_size: int,
+) -> None:
+    """download the bytes from start to end (inclusive) into the part file"""
+    position = start
+    for attempt in range(retries + 1):
+        headers = {
+            **random_user_agent(),
+            "Range": f"bytes={position}-{end}",
+            "Accept-Encoding": "identity",
+        }
+        try:
+            with session.get(
+                url, headers=headers, stream=True, timeout=timeout
+            ) as response:
+                if response.status_code != 206:
+                    raise Exception(
+                        f"Range request to {url} failed; {response.status_code}"
+                    )
+                with open(part, "r+b") as fp:
+                    fp.seek(position)
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        chunk = chunk[: end + 1 - position]
+                        fp.write(chunk)
+                        position += len(chunk)
+                        progress.update(len(chunk))
+            if position > end:
+                return
+            raise requests.ConnectionError(f"Segment of {url} ended early")
+        except requests.RequestException as e:
+            if attempt == retries:
+                raise
+            progress.retried()
+            logger.debug(f"Retrying bytes {position}-{end} of {url}: {e}")
+            time.sleep(backoff_factor * 2**attempt)
+
+
+def download_segmented(
+    url: str,
+    destination: Path,
+    bytes: Optional[int] = None,
+    hash: Optional[str] = None,
+    overwrite: bool = False,
+    workers: int = 4,
+    segment_size: Optional[int] = None,
+    retries: int = 3,
+    backoff_factor: float = 0.3,
+    progress: Optional[Callable[[DownloadProgress], None]] = None,
+    chunk_size: int = CHUNK_SIZE,
+    session: Optional[requests.Session] = None,
+    timeout: Optional[tuple] = None,
+) -> Path:
+    """
+    download_segmented downloads a large file in byte ranges that are
+    fetched concurrently into a preallocated `<destination>.part` file,
+    which is renamed to the destination once it is complete and verified.
+
+    Each segment is retried on its own, continuing from the last byte it
+    received. If the server does not support range requests, the file is
+    downloaded in a single stream with `download_file`.
+
+    :param url: url of the file
+    :param destination: path of the downloaded file
+    :param bytes: expected size of the file
+    :param hash: expected hash of the file, see `parse_hash`
+    :param overwrite: download even if the destination exists
+    :param workers: number of segments downloaded at the same time
+    :param segment_size: size of the segments; defaults to splitting the
+        file into one segment per worker
+    :param retries: number of retries of each segment
+    :param backoff_factor: the n-th retry of a segment waits
+        backoff_factor * 2 ** n seconds
+    :param progress: called with the `DownloadProgress` after every chunk
+    :param chunk_size: size of the chunks written to disk
+    :param session: requests session; defaults to the shared session
+    :param timeout: timeout of the requests
+    :return: the destination
+    """
+    destination = Path(destination)
+    if destination.exists() and not overwrite:
+        logger.debug(f"{destination} exists, skipping download")
+        return destination
+
+    if session is None:
+        session = get_session()
+    if timeout is None:
+        timeout = (5, 60)
+
+    total = _probe(url, session, timeout)
+    if total is None or total == 0:
+        logger.debug(f"{url} does not support range requests, using one stream")
+        return download_file(
+            url,
+            destination,
+            bytes=bytes,
+            hash=hash,
+            overwrite=overwrite,
+            chunk_size=chunk_size,
+            session=session,
+            timeout=timeout,
+        )
+    if bytes is not None and total != bytes:
+        raise Exception(f"{url} has {total} bytes, expected {bytes}")
+
+    if segment_size is None:
+        segment_size = -(-total // max(workers, 1))
+    segments = [
+        (start, min(start + segment_size, total) - 1)
+        for start in range(0, total, segment_size)
+    ]
+
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    part = part_path(destination)
+    with open(part, "wb") as fp:
+        fp.truncate(total)
+
+    tracker = DownloadProgress(total=total, callback=progress)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    _download_segment,
+                    url,
+                    part,
+                    start,
+                    end,
+                    session,
+                    timeout,
+                    tracker,
+                    retries,
+                    backoff_factor,
+                    chunk_size,
+                )
+                for start, end in segments
+            ]
+            for future in futures:
+                future.result()
+
+        verify_file(part, bytes=total, hash=hash)
+    except BaseException:
+        part.unlink()
+        raise
+
+    with open(part, "rb+") as fp:
+        os.fsync(fp.fileno())
+    os.replace(part, destination)
+
+    logger.debug(
+        f"Downloaded {total} bytes of {url} in {len(segments)} segments, "
+        f"{tracker.throughput / 1e6:.1f} MB/s"
+    )
+
+    return destination
@@ -0,0 +1,282 @@
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple, cast
+
+import requests
+from loguru import logger
+
+from dataherb.fetch.compression import available_suffixes, decompress
+from dataherb.fetch.remote import get_data_from_url, random_user_agent
+from dataherb.utils.configs import Config
+from dataherb.utils.files import atomic_write_bytes
+
+logger.remove()
+logger.add(sys.stderr, level="INFO", enqueue=True)
+
+
+def _digest(content: bytes) -> str:
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+class HTTPCache:
+    """
+    An on-disk cache of http responses, revalidated with conditional
+    requests.
+
+    The body of a response is stored together with its `ETag` and
+    `Last-Modified` headers. The next fetch of the url sends them as
+    `If-None-Match` and `If-Modified-Since`, and the cached body is reused
+    if the server answers `304 Not Modified`. Within `max_age` seconds of the
+    last fetch, the cached body is used without any request, e.g., for
+    offline use. The cached body is also used if the server can not be
+    reached.
+
+    Precompressed siblings of a url, e.g., `flora.json.zst` and
+    `flora.json.gz`, are cached compressed and decompressed on read. Siblings
+    that are not published are cached as missing together with the digest of
+    the url itself, and are looked up again once the url has changed.
+
+    :param path: folder of the cache
+    :param retry_params: retry policies of the requests, see
+        `get_data_from_url`
+    """
+
+    def __init__(self, path: Path, retry_params: Optional[dict] = None):
+        self.path = Path(path)
+        self.retry_params = retry_params
+
+    @classmethod
+    def default(cls) -> Optional["HTTPCache"]:
+        """
+        the cache in the `.cache/http` folder of the dataherb workdir, or
+        None if dataherb is not configured
+        """
+        c = Config()
+        if not cast(Path, c.config_path).exists():
+            return None
+
+        return cls(Path(c.workdir) / ".cache" / "http")
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.path / f"{key}.body", self.path / f"{key}.json"
+
+    def cached(self, url: str) -> Optional[dict]:
+        """
+        the cache entry of the url: the headers and the time of the last
+        fetch, and the body; None if the url is not cached
+
+        :param url: url of the request
+        """
+        body_path, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text())
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+
+        # the body and the headers are written one after the other
+        if meta.get("url") != url or meta.get("digest") != _digest(body):
+            return None
+        if meta.get("missing"):
+            return None
+
+        return {**meta, "body": body}
+
+    def _store(
+        self, url: str, body: bytes, etag, last_modified, write_body: bool = True
+    ) -> None:
+        body_path, meta_path = self._paths(url)
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+            "digest": _digest(body),
+        }
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            if write_body:
+                atomic_write_bytes(body_path, body)
+            atomic_write_bytes(meta_path, json.dumps(meta).encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"Can not write http cache {self.path}: {e}")
+
+    def get(
+        self, url: str, max_age: Optional[float] = None, siblings: bool = False
+    ) -> bytes:
+        """
+        get the body of the url, from the cache if it is still valid
+
+        :param url: url of the request
+        :param max_age: seconds after the last fetch within which the cached
+            body is used without revalidation; always revalidate if None.
+        :param siblings: use the precompressed `<url>.zst` or `<url>.gz` if
+            it is published, falling back to the url itself.
+        :return: body of the response
+        """
+        url = str(url)
+        if not siblings:
+            return cast(bytes, self._get(url, max_age))
+
+        suffixes = available_suffixes()
+        # a sibling that was found last time is used first, so that it is
+        # also used within max_age or offline
+        found = [s for s in suffixes if self.cached(f"{url}{s}") is not None]
+        sibling, missing = self._get_sibling(url, found, max_age)
+        if sibling is not None:
+            return sibling
+
+        body = None
+        plain = self.cached(url)
+        if plain is not None and (
+            self._is_fresh(plain, max_age) or self._siblings_missing(url, plain)
+        ):
+            body = self._get(url, max_age)
+            if _digest(cast(bytes, body)) == plain["digest"]:
+                return cast(bytes, body)
+            # siblings are usually published together with a new version
+            logger.debug(f"{url} has changed, looking up its siblings")
+
+        sibling, not_published = self._get_sibling(
+            url, [s for s in suffixes if s not in missing], max_age
+        )
+        if sibling is not None:
+            return sibling
+
+        if body is None:
+            body = self._get(url, max_age)
+        for suffix in missing + not_published:
+            self._store_missing(f"{url}{suffix}", _digest(cast(bytes, body)))
+
+        return cast(bytes, body)
+
+    def _get_sibling(
+        self, url: str, suffixes: List[str], max_age: Optional[float]
+    ) -> Tuple[Optional[bytes], List[str]]:
+        """
+        get the decompressed body of the first sibling of the url that is
+        published
+
+        :return: the body, None if no sibling is found, and the suffixes of
+            the siblings that are not published
+        """
+        missing = []
+        for suffix in suffixes:
+            try:
+                body = self._get(f"{url}{suffix}", max_age, missing_ok=True)
+            except Exception as e:
+                logger.debug(f"Could not fetch {url}{suffix}: {e}")
+                continue
+            if body is None:
+                missing.append(suffix)
+                continue
+            logger.debug(f"Using precompressed {url}{suffix}")
+            return decompress(body, suffix), missing
+
+        return None, missing
+
+    @staticmethod
+    def _is_fresh(entry: dict, max_age: Optional[float]) -> bool:
+        """whether the entry was fetched within max_age seconds"""
+        return max_age is not None and time.time() - entry["fetched_at"] <= max_age
+
+    def _store_missing(self, url: str, digest: str) -> None:
+        """
+        cache that the sibling url is not published for the version of the
+        url itself with the digest
+        """
+        _, meta_path = self._paths(url)
+        meta = {"url": url, "missing": True, "digest": digest}
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            atomic_write_bytes(meta_path, json.dumps(meta).encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"Can not write http cache {self.path}: {e}")
+
+    def _siblings_missing(self, url: str, entry: dict) -> bool:
+        """
+        whether all the siblings of the url are cached as missing for the
+        version of the url in the entry
+        """
+        for suffix in available_suffixes():
+            _, meta_path = self._paths(f"{url}{suffix}")
+            try:
+                meta = json.loads(meta_path.read_text())
+            except (OSError, ValueError):
+                return False
+            if not meta.get("missing") or meta.get("digest") != entry["digest"]:
+                return False
+
+        return True
+
+    def _get(
+        self, url: str, max_age: Optional[float] = None, missing_ok: bool = False
+    ) -> Optional[bytes]:
+        """
+        get the body of the url; None if missing_ok and the url is not found
+        """
+        entry = self.cached(url)
+
+        if entry is not None and self._is_fresh(entry, max_age):
+            logger.debug(f"Using cached {url}")
+            return entry["body"]
+
+        headers = random_user_agent()
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = get_data_from_url(
+                url, retry_params=self.retry_params, headers=headers
+            )
+        except requests.RequestException as e:
+            if entry is None:
+                raise
+            logger.warning(f"Could not reach {url}, using cached version: {e}")
+            return entry["body"]
+
+        if response.status_code == 304 and entry is not None:
+            logger.debug(f"Not modified: {url}")
+            self._store(
+                url,
+                entry["body"],
+                response.headers.get("ETag", entry.get("etag")),
+                response.headers.get("Last-Modified", entry.get("last_modified")),
+                write_body=False,
+            )
+            return entry["body"]
+
+        if response.status_code in (403, 404) and missing_ok:
+            if entry is not None:
+                self.forget(url)
+            return None
+
+        if response.status_code != 200:
+            raise Exception(
+                f"Could not fetch remote file: {url}; {response.status_code}"
+            )
+
+        self._store(
+            url,
+            response.content,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+
+        return response.content
+
+    def forget(self, url: str) -> None:
+        """
+        remove the url from the cache
+
+        :param url: url of the request
+        """
+        for path in self._paths(str(url)):
+            path.unlink(missing_ok=True)
@@ -1,12 +1,16 @@
 import os
 import random
 import sys
+import threading
+from typing import Dict, Optional
 
 import requests
 from loguru import logger
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 
+from dataherb.fetch.compression import accept_encoding
+
 logger.remove()
 logger.add(sys.stderr, level="INFO", enqueue=True)
 
@@ -55,12 +59,116 @@ def random_user_agent():
     return {"User-Agent": random.choice(user_agent_list)}
 
 
+DEFAULT_RETRY_PARAMS = {
+    "retries": 5,
+    "backoff_factor": 0.3,
+    "status_forcelist": (500, 502, 504),
+}
+
+DEFAULT_POOL_PARAMS = {"pool_connections": 10, "pool_maxsize": 10, "pool_block": False}
+
+_pool_params = dict(DEFAULT_POOL_PARAMS)
+_sessions: Dict[tuple, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def _retry_key(retry_params: Optional[dict] = None) -> tuple:
+    """the full retry policy as a hashable key"""
+    retry_params = {**DEFAULT_RETRY_PARAMS, **(retry_params or {})}
+
+    return tuple(
+        sorted(
+            (k, tuple(v) if isinstance(v, (list, set, tuple)) else v)
+            for k, v in retry_params.items()
+        )
+    )
+
+
+def new_session(retry_params: Optional[dict] = None, **pool_params) -> requests.Session:
+    """
+    new_session creates a requests session with the retry policy and a
+    connection pool.
+
+    :param retry_params: retry policies, see `DEFAULT_RETRY_PARAMS`
+    :param pool_params: `pool_connections`, the number of hosts whose
+        connections are kept; `pool_maxsize`, the maximum number of
+        connections kept per host; and `pool_block`, whether to wait for a
+        free connection instead of opening more than `pool_maxsize`
+        connections to a host. See `DEFAULT_POOL_PARAMS`.
+    """
+    retry_params = dict(_retry_key(retry_params))
+    pool_params = {**_pool_params, **pool_params}
+
+    retry = Retry(
+        total=retry_params.get("retries"),
+        read=retry_params.get("retries"),
+        connect=retry_params.get("retries"),
+        backoff_factor=retry_params.get("backoff_factor"),
+        status_forcelist=retry_params.get("status_forcelist"),
+    )
+
+    adapter = HTTPAdapter(max_retries=retry, **pool_params)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+def get_session(retry_params: Optional[dict] = None) -> requests.Session:
+    """
+    get_session returns the session shared by all the fetches with the same
+    retry policy, so that connections are kept alive and reused. The session
+    is created on first use and can be used from multiple threads.
+
+    :param retry_params: retry policies, see `DEFAULT_RETRY_PARAMS`
+    """
+    key = _retry_key(retry_params)
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = new_session(retry_params)
+                _sessions[key] = session
+
+    return session
+
+
+def configure_pool(**pool_params) -> None:
+    """
+    configure_pool sets the connection pool of the shared sessions. The
+    sessions created before are closed.
+
+    ```python
+    configure_pool(pool_maxsize=32, pool_block=True)
+    ```
+
+    :param pool_params: `pool_connections`, `pool_maxsize` and `pool_block`,
+        see `new_session`.
+    """
+    unknown = set(pool_params) - set(DEFAULT_POOL_PARAMS)
+    if unknown:
+        raise Exception(f"Unknown pool parameters: {sorted(unknown)}")
+
+    with _sessions_lock:
+        _pool_params.update(pool_params)
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
 def get_data_from_url(
     link, retry_params=None, headers=None, timeout=None, session=None
 ):
     """
     get_data_from_url downloads data from the url and return the object
 
+    The request goes through a pooled session that is shared by all the
+    fetches with the same retry policy, see `get_session`. The response may
+    be compressed with any encoding that can be decoded, see
+    `accept_encoding`, and is decompressed transparently.
+
     :param link: link to the data file
     :type link: str
     :param retry_params: retry policies for request session, defaults to None
@@ -69,41 +177,22 @@ def get_data_from_url(
     :type headers: list, optional
     :param timeout: timeout configuration for session, defaults to None
     :type timeout: tuple, optional
-    :param session: requests session object, defaults to None
+    :param session: requests session object, defaults to the shared session
     :type session: requests.sessions.Session, optional
     :return: contens feched from link
     :rtype: requests.models.Response
     """
 
-    if retry_params is None:
-        retry_params = {}
-
-    retry_params = {
-        **{"retries": 5, "backoff_factor": 0.3, "status_forcelist": (500, 502, 504)},
-        **retry_params,
-    }
-
     if headers is None:
         headers = random_user_agent()
+    headers = {"Accept-Encoding": accept_encoding(), **headers}
 
     if timeout is None:
         timeout = (5, 14)
 
     if session is None:
-        session = requests.Session()
-
-    retry = Retry(
-        total=retry_params.get("retries"),
-        read=retry_params.get("retries"),
-        connect=retry_params.get("retries"),
-        backoff_factor=retry_params.get("backoff_factor"),
-        status_forcelist=retry_params.get("status_forcelist"),
-    )
-
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
+        session = get_session(retry_params)
 
-    data = session.get(link, headers=headers)
+    data = session.get(link, headers=headers, timeout=timeout)
 
     return data
@@ -1,25 +1,53 @@
 import json
+import os
 import shutil
 import sys
 import validators
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from yarl import URL
 
 from loguru import logger
 
 from dataherb.core.base import Herb
-from dataherb.core.search import search_by_ids_in_flora as _search_by_ids_in_flora
-from dataherb.core.search import search_by_keywords_in_flora
-from dataherb.fetch.remote import get_data_from_url
+from dataherb.core.bm25 import BM25SearchEngine
+from dataherb.core.facets import FacetIndex, facets_key
+from dataherb.core.field_index import FieldIndex
+from dataherb.core.inverted_index import InvertedIndex
+from dataherb.core.search import (
+    iter_search_by_keywords_in_flora,
+    search_by_keywords_in_flora,
+)
+from dataherb.core.search_cache import SearchCache
+from dataherb.core.search_engine import FuzzySearchEngine
+from dataherb.fetch.async_remote import fetch_many
+from dataherb.fetch.compression import COMPRESSED_SUFFIXES, compress
+from dataherb.fetch.http_cache import HTTPCache
 from dataherb.parse.model_json import MetaData
-from typing import List, Union, Optional
-from dataherb.core.base import Herb
+from dataherb.storage.journal import FloraJournal
+from dataherb.storage.snapshot import FloraSnapshot
+from dataherb.storage.sqlite import SQLITE_SUFFIXES, SQLiteFloraStore
+from dataherb.utils.configs import Config
+from dataherb.utils.files import atomic_write_bytes
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Union, cast
 
 
 logger.remove()
 logger.add(sys.stderr, level="INFO", enqueue=True)
 
 
+def _read_file(path: Path) -> bytes:
+    """Read the raw content of a file"""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _load_json(path: Path) -> Any:
+    """Load a json file"""
+    with open(path, "r") as f:
+        return json.load(f)
+
+
 class Flora:
     """
     A container of datasets. It loads a local folder of dataset metadata and
@@ -29,23 +57,91 @@ class Flora:
     of dataherb objects.
 
     :param flora: path to the flora database. Either an URL or a local path.
+        A local path can be a folder, an aggregated json file, or a SQLite
+        file (`.db`, `.sqlite`, `.sqlite3`).
     :param is_aggregated: if True, the flora is aggregated into one json file.
+    :param workers: number of workers used to load a folder based flora in
+        parallel. The default `None` loads the herbs one by one; `0` uses
+        all the cores available.
+    :param use_processes: if True, the `dataherb.json` files are parsed in a
+        process pool instead of the thread pool that reads them.
+    :param use_snapshot: if True, a local flora is loaded from a binary
+        snapshot next to the flora; only the json files that have changed
+        since the snapshot was taken are parsed again.
+    :param use_index: if True, keyword searches on a local flora shortlist the
+        candidates using an inverted index, which is persisted next to the
+        flora, and only score the shortlisted herbs; see
+        `InvertedIndex.shortlist` for the searches that score all the herbs.
+        A shortlist may miss weak fuzzy matches of the full scan. Changes to
+        the index are written by `add` and `remove` for floras of herb
+        folders, and by `save` for aggregated floras; an outdated index is
+        synced with the herbs when it is loaded.
+    :param search_cache_size: number of searches whose results are kept in
+        an LRU cache; 0 disables the cache.
+    :param workdir: working directory of a remote flora, where its http
+        cache is kept; defaults to the workdir in the configuration.
+    :param cache_max_age: a remote flora fetched less than `cache_max_age`
+        seconds ago is loaded from the http cache without any request; it is
+        revalidated with the server if None.
     """
 
-    def __init__(self, flora_path: Union[Path, URL], is_aggregated: bool = False):
+    def __init__(
+        self,
+        flora_path: Union[Path, URL],
+        is_aggregated: bool = False,
+        workers: Optional[int] = None,
+        use_processes: bool = False,
+        use_snapshot: bool = False,
+        use_index: bool = False,
+        search_cache_size: int = 128,
+        workdir: Optional[Path] = None,
+        cache_max_age: Optional[float] = None,
+    ):
         self.is_aggregated = is_aggregated
+        if workers is not None and workers < 1:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self.use_processes = use_processes
+        self.use_snapshot = use_snapshot
+        self.use_index = use_index
+        self.journal: Optional[FloraJournal] = None
+        self.store: Optional[SQLiteFloraStore] = None
+        self._flora: Optional[List[Herb]] = None
+        self._index: Dict[str, Herb] = {}
+        self.duplicate_ids: Set[str] = set()
+        self._search_engine: Optional[FuzzySearchEngine] = None
+        self._bm25_engine: Optional[BM25SearchEngine] = None
+        self._field_index: Optional[FieldIndex] = None
+        self._facet_index: Optional[FacetIndex] = None
+        self._inverted_index: Optional[InvertedIndex] = None
+        self._inverted_index_changed = False
+        self.version = 0
+        self.search_cache = SearchCache(maxsize=search_cache_size)
+        self.cache_max_age = cache_max_age
 
         if not isinstance(flora_path, (Path, URL)):
             raise Exception(f"flora must be a path or a url. ({flora_path})")
 
         if isinstance(flora_path, URL):
+            if self.use_index:
+                logger.warning("The search index is only supported for local floras.")
+                self.use_index = False
+            if workdir is None:
+                workdir = Path(Config().workdir)
+            self.workdir = Path(workdir)
             self.flora = self._get_remote_flora(flora_path)
 
-        if isinstance(flora_path, Path):
+        if isinstance(flora_path, Path) and flora_path.suffix in SQLITE_SUFFIXES:
+            self.workdir = flora_path.parent.parent
+            self.flora_path = flora_path
+            self.store = SQLiteFloraStore(flora_path)
+        elif isinstance(flora_path, Path):
             if flora_path.suffix == ".json":
                 self.is_aggregated = True
             self.workdir = flora_path.parent.parent
             self.flora_path = flora_path
+            if self.is_aggregated:
+                self.journal = FloraJournal(flora_path)
             self.flora = self._get_local_flora(flora_path)
 
         if is_aggregated != self.is_aggregated:
@@ -56,47 +152,157 @@ class Flora:
 
         logger.debug(f"flora workdir {self.workdir}")
 
+    @property
+    def flora(self) -> List[Herb]:
+        """
+        list of herbs in the flora
+
+        For SQLite floras, the herbs are only loaded on first access.
+        """
+        if self._flora is None:
+            self.flora = [
+                self._convert_to_herb(m)
+                for m in cast(SQLiteFloraStore, self.store).all()
+            ]
+
+        return cast(List[Herb], self._flora)
+
+    @flora.setter
+    def flora(self, herbs: List[Herb]) -> None:
+        self._flora = herbs
+        self._build_index()
+
+    def _build_index(self) -> None:
+        """
+        _build_index builds the index from herb id to herb.
+
+        The first herb is kept if an id shows up multiple times in the flora.
+        The duplicated ids are recorded in `duplicate_ids`.
+        """
+        self._index = {}
+        self.duplicate_ids = set()
+        self._changed()
+        for herb in cast(List[Herb], self._flora):
+            if herb.id in self._index:
+                self.duplicate_ids.add(herb.id)
+            else:
+                self._index[herb.id] = herb
+
+        if self.duplicate_ids:
+            logger.warning(
+                f"Found duplicated herb ids in flora: {sorted(self.duplicate_ids)}"
+            )
+
+    def _changed(self) -> None:
+        """
+        _changed bumps the version of the flora after the herbs have changed,
+        and drops the search engines and the cached search results.
+        """
+        self.version += 1
+        self._search_engine = None
+        self._bm25_engine = None
+        self._field_index = None
+        self._facet_index = None
+        self.search_cache.clear()
+
     def _get_local_flora(self, flora_config: Path) -> List[Herb]:
         """
         _get_local_flora fetch flora from the local folder or file.
 
         There are two scenarios:
 
-        - The flora is one aggregated local json file.
+        - The flora is one aggregated local json file. The mutations recorded
+            in the journal of the flora are replayed on top of it.
         - The flora is a folder that contains folders of dataset ids.
         """
         if self.is_aggregated:
-            with open(flora_config, "r") as f:
-                json_flora = json.load(f)
+            json_paths = [Path(flora_config)]
         else:
             flora_folder = Path(flora_config)
-            herb_paths = [f for f in flora_folder.iterdir() if f.is_dir()]
-            json_flora = [
-                json.load(open(f.joinpath("dataherb.json"), "r")) for f in herb_paths
+            json_paths = [
+                f.joinpath("dataherb.json")
+                for f in flora_folder.iterdir()
+                if f.is_dir()
             ]
 
-        return [
-            Herb(herb, base_path=self.workdir / f'{herb.get("id", "")}')
-            for herb in json_flora
-        ]
+        if self.use_snapshot:
+            snapshot = FloraSnapshot(Path(flora_config))
+            herbs = []
+            for herb_meta, search_corpus in snapshot.load(
+                json_paths, self._load_herb_jsons
+            ):
+                herb = Herb(
+                    herb_meta, base_path=self.workdir / f'{herb_meta.get("id", "")}'
+                )
+                herb.search_corpus = search_corpus
+                herbs.append(herb)
+        else:
+            if self.is_aggregated:
+                json_flora = _load_json(flora_config)
+            else:
+                json_flora = self._load_herb_jsons(json_paths)
+
+            herbs = [
+                Herb(herb, base_path=self.workdir / f'{herb.get("id", "")}')
+                for herb in json_flora
+            ]
+
+        if self.is_aggregated:
+            herbs = cast(FloraJournal, self.journal).replay(
+                herbs, self._convert_to_herb
+            )
+
+        return herbs
+
+    def _load_herb_jsons(self, herb_paths: List[Path]) -> List[dict]:
+        """
+        _load_herb_jsons loads the `dataherb.json` files of a folder based
+        flora, in parallel if `workers` is set.
+
+        The files are read in a thread pool. If `use_processes` is set, the
+        json parsing is handed to a process pool in chunks, which avoids
+        the GIL for large floras.
+
+        !!! note
+            Herbs are always constructed in the current process, as
+            `datapackage.Package` objects can not be pickled.
+
+        :param herb_paths: paths to the `dataherb.json` files
+        """
+        if self.workers is None:
+            return [_load_json(f) for f in herb_paths]
+
+        if not self.use_processes:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                return list(pool.map(_load_json, herb_paths))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            contents = list(pool.map(_read_file, herb_paths))
+
+        chunksize = max(1, len(contents) // (4 * cast(int, self.workers)))
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(json.loads, contents, chunksize=chunksize))
 
     def _get_remote_flora(self, flora_config: URL) -> List[Herb]:
         """
         _get_remote_flora fetch flora from the remote API.
 
+        The flora is kept in the http cache of the workdir, and only
+        downloaded again if it has changed on the server. A precompressed
+        `<flora>.zst` or `<flora>.gz` is used if it is published.
+
         !!! warning
             Currently, this mode only works for aggregated json flora.
         """
-        flora_request = get_data_from_url(flora_config)
-
-        if not flora_request.status_code == 200:
-            raise Exception(
-                "Could not download dataherb flora from remote. status code: {}".format(
-                    flora_request.status_code
-                )
+        http_cache = HTTPCache(self.workdir / ".cache" / "http")
+        try:
+            content = http_cache.get(
+                str(flora_config), max_age=self.cache_max_age, siblings=True
             )
-        else:
-            json_flora = flora_request.json()
+        except Exception as e:
+            raise Exception(f"Could not download dataherb flora from remote. {e}")
+
+        json_flora = json.loads(content)
 
         return [
             Herb(herb, base_path=self.workdir / f'{herb.get("id", "")}')
@@ -106,27 +312,96 @@ class Flora:
     def add(self, herb: Union[Herb, dict, MetaData]) -> None:
         """
         Add a herb to the flora.
+
+        For aggregated floras, the addition is appended to the journal of
+        the flora; use `compact` to fold it into the aggregated file.
         """
 
         herb = self._convert_to_herb(herb)
 
         logger.debug(f"adding herb with metadata: {herb.metadata}")
 
-        for h_exist in self.flora:
-            if herb.id == h_exist.id:
-                raise Exception(f"herb id = {herb.id} already exists")
+        if herb.id in self._index:
+            raise Exception(f"herb id = {herb.id} already exists")
+
+        if self.store is not None:
+            self.store.add(herb.metadata)
+
+        if self._flora is not None:
+            self._flora.append(herb)
+        self._index[herb.id] = herb
+        self._changed()
+        if self._inverted_index is not None:
+            self._inverted_index.add(herb.id, herb.herb_meta_json)
+            self._inverted_index_changed = True
 
-        self.flora.append(herb)
         if self.is_aggregated:
-            self.save(path=self.flora_path)
-        else:
+            cast(FloraJournal, self.journal).append_add(herb.metadata)
+        elif self.store is None:
             self.save(herb=herb)
 
+    def refresh_metadata(
+        self,
+        ids: Optional[Iterable[str]] = None,
+        concurrency: int = 32,
+        rate: Optional[float] = None,
+    ) -> Dict[str, BaseException]:
+        """
+        refresh_metadata fetches the `dataherb.json` of the git herbs from
+        their `metadata_uri` concurrently and updates the datapackages of the
+        herbs.
+
+        The herbs are only updated in memory; use `save` to persist them.
+
+        :param ids: ids of the herbs to refresh; all the git herbs if None
+        :param concurrency: maximum number of requests in flight
+        :param rate: maximum number of requests per second to each host
+        :return: dictionary from herb id to the error of the herbs that could
+            not be refreshed
+        """
+        if ids is None:
+            herbs = [h for h in self.flora if h.source == "git"]
+        else:
+            herbs = list(self.herbs(ids).values())
+            for herb in herbs:
+                if herb.source != "git":
+                    logger.warning(f"Can not refresh herb {herb.id} from {herb.source}")
+            herbs = [h for h in herbs if h.source == "git"]
+
+        responses = fetch_many(
+            [h.metadata_uri for h in herbs], concurrency=concurrency, rate=rate
+        )
+
+        errors: Dict[str, BaseException] = {}
+        for herb, response in zip(herbs, responses):
+            if isinstance(response, BaseException):
+                errors[herb.id] = response
+            elif response.status_code != 200:
+                errors[herb.id] = Exception(
+                    f"Could not fetch remote file: {herb.metadata_uri}; "
+                    f"{response.status_code}"
+                )
+            else:
+                try:
+                    payload = response.json()
+                    herb.set_datapackage(payload.get("datapackage", payload))
+                except Exception as e:
+                    errors[herb.id] = e
+
+        if errors:
+            logger.warning(f"Could not refresh herbs: {sorted(errors)}")
+        self._changed()
+
+        return errors
+
     def _convert_to_herb(self, herb: Union[Herb, dict, MetaData]) -> Herb:
         if isinstance(herb, MetaData):
-            herb = Herb(herb.metadata)
+            herb = Herb(
+                herb.metadata,
+                base_path=self.workdir / f'{herb.metadata.get("id", "")}',
+            )
         elif isinstance(herb, dict):
-            herb = Herb(herb)
+            herb = Herb(herb, base_path=self.workdir / f'{herb.get("id", "")}')
         elif isinstance(herb, Herb):
             pass
         else:
@@ -137,47 +412,84 @@ class Flora:
     def remove(self, herb_id: str) -> None:
         """
         Removes a herb from the flora.
+
+        For aggregated floras, the removal is appended to the journal of
+        the flora; use `compact` to fold it into the aggregated file.
         """
-        for id in [i.id for i in self.flora]:
-            if id == herb_id:
-                logger.debug(f"found herb id = {herb_id}")
+        if herb_id in self._index:
+            logger.debug(f"found herb id = {herb_id}")
+
+        if self.store is not None:
+            self.store.remove(herb_id)
+            self._discard(herb_id)
+            return
 
-        self.flora = [h for h in self.flora if h.id != herb_id]
+        self._discard(herb_id)
+        if self._inverted_index is not None:
+            self._inverted_index.remove(herb_id)
+            self._inverted_index_changed = True
 
         if self.is_aggregated:
-            self.save(path=self.flora_path)
+            cast(FloraJournal, self.journal).append_remove(herb_id)
         else:
-            self.remove_herb_from_flora(herb_id)
+            self.remove_herb_from_flora(herb_id, path=self.flora_path / herb_id)
+            self._save_inverted_index()
+
+    def _discard(self, herb_id: str) -> None:
+        """
+        _discard removes the herb from the id index and the list of herbs in
+        place, without rebuilding the index.
+        """
+        herb = self._index.pop(herb_id, None)
+        if self._flora is not None and herb is not None:
+            for i, h in enumerate(self._flora):
+                if h is herb:
+                    del self._flora[i]
+                    break
+            if herb_id in self.duplicate_ids:
+                self._flora[:] = [h for h in self._flora if h.id != herb_id]
+                self.duplicate_ids.discard(herb_id)
+        self._changed()
 
     def save(
         self,
         path: Optional[Path] = None,
         id: Optional[str] = None,
         herb: Optional[Herb] = None,
+        compression: Optional[Iterable[str]] = None,
     ) -> None:
-        """save flora metadata to json file"""
+        """
+        save flora metadata to json file
+
+        Aggregated floras can also be written as precompressed siblings,
+        e.g., `flora.json.zst` and `flora.json.gz`, which are downloaded
+        instead of `flora.json` by remote floras.
+
+        :param path: path of the flora
+        :param id: id of the herb to save, for floras of herb folders
+        :param herb: herb to save, for floras of herb folders
+        :param compression: suffixes of the precompressed siblings of an
+            aggregated flora, `.zst` and `.gz`; other siblings are removed.
+            By default, the siblings that exist are updated.
+        """
 
         if path is None:
             path = self.flora_path
 
-        logger.debug(
-            f"type of a herb in flora: {type(self.flora[0])}\n{self.flora[0].metadata}"
-        )
-
         if self.is_aggregated:
             serialized_flora = []
             for h in self.flora:
                 logger.debug(f"herb (type {type(h)}): {h}")
                 serialized_flora.append(h.metadata)
 
-            with open(path, "w") as fp:
-                json.dump(
-                    serialized_flora,
-                    fp,
-                    sort_keys=True,
-                    indent=4,
-                    separators=(",", ": "),
-                )
+            content = json.dumps(
+                serialized_flora,
+                sort_keys=True,
+                indent=4,
+                separators=(",", ": "),
+            ).encode("utf-8")
+            self._save_compressed(path, content, compression)
+            atomic_write_bytes(path, content)
         else:
             if (not id) and (not herb):
                 raise Exception("dataherb id must be provided")
@@ -188,6 +500,95 @@ class Flora:
                 logger.debug(f"Saving herb using herb id")
                 self.save_herb_meta(id, path / f"{id}")
 
+        self._save_inverted_index()
+
+    def _save_inverted_index(self) -> None:
+        """write the inverted index if it has changed since it was loaded"""
+        if self._inverted_index is not None and self._inverted_index_changed:
+            self._inverted_index.save(self.index_path)
+            self._inverted_index_changed = False
+
+    @staticmethod
+    def _save_compressed(
+        path: Path, content: bytes, compression: Optional[Iterable[str]] = None
+    ) -> None:
+        """write the precompressed siblings of an aggregated flora"""
+        siblings = {
+            suffix: path.with_name(f"{path.name}{suffix}")
+            for suffix in COMPRESSED_SUFFIXES
+        }
+        if compression is None:
+            compression = [s for s, p in siblings.items() if p.exists()]
+        compression = set(compression)
+        unknown = compression - set(siblings)
+        if unknown:
+            raise Exception(f"Unsupported compression: {sorted(unknown)}")
+
+        for suffix, sibling in siblings.items():
+            if suffix in compression:
+                atomic_write_bytes(sibling, compress(content, suffix))
+            elif sibling.exists():
+                logger.debug(f"Removing outdated {sibling}")
+                sibling.unlink()
+
+    def compact(self) -> None:
+        """
+        compact folds the journal of an aggregated flora back into
+        the aggregated flora file.
+
+        The flora file is replaced atomically before the journal is removed.
+        """
+        if not self.is_aggregated:
+            logger.warning("Only aggregated floras have a journal to compact.")
+            return
+
+        self.save(path=self.flora_path)
+        cast(FloraJournal, self.journal).clear()
+
+    def export(self, path: Path) -> None:
+        """
+        export writes the herbs of the flora into a new flora.
+
+        The storage of the new flora is determined by the path: a SQLite
+        file (`.db`, `.sqlite`, `.sqlite3`), an aggregated json file
+        (`.json`), or a folder of herbs otherwise.
+
+        :param path: path to the new flora, which must not exist yet.
+        """
+        if path.exists():
+            raise Exception(f"Can not export flora to {path}: path exists.")
+
+        metadatas: Iterable[dict]
+        if self.store is not None and self._flora is None:
+            metadatas = self.store.all()
+        else:
+            metadatas = (h.metadata for h in self.flora)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix in SQLITE_SUFFIXES:
+            store = SQLiteFloraStore(path, create=True)
+            store.add_many(metadatas)
+            store.close()
+        elif path.suffix == ".json":
+            atomic_write_bytes(
+                path,
+                json.dumps(
+                    list(metadatas), sort_keys=True, indent=4, separators=(",", ": ")
+                ).encode("utf-8"),
+            )
+        else:
+            for herb_meta in metadatas:
+                herb_path = path / f'{herb_meta.get("id", "")}'
+                herb_path.mkdir(parents=True)
+                atomic_write_bytes(
+                    herb_path / "dataherb.json",
+                    json.dumps(
+                        herb_meta, sort_keys=True, indent=4, separators=(",", ": ")
+                    ).encode("utf-8"),
+                )
+
+        logger.debug(f"Exported flora to {path}")
+
     def save_herb_meta(self, id: str, path: Optional[Path] = None) -> None:
         """Save a herb metadata to json file"""
         if path is None:
@@ -197,10 +598,12 @@ class Flora:
             path.mkdir(parents=True)
 
         logger.debug(f"Will replace dataherb id {id}")
-        with open(path / "dataherb.json", "w") as fp:
-            json.dump(
-                self.herb_meta(id), fp, sort_keys=True, indent=4, separators=(",", ": ")
-            )
+        atomic_write_bytes(
+            path / "dataherb.json",
+            json.dumps(
+                self.herb_meta(id), sort_keys=True, indent=4, separators=(",", ": ")
+            ).encode("utf-8"),
+        )
 
     def remove_herb_from_flora(self, id: str, path: Optional[Path] = None) -> None:
         """Remove a herb metadata to json file"""
@@ -218,16 +621,272 @@ class Flora:
                     f"Can not remove herb id {id}: {e.filename} - {e.strerror}."
                 )
 
-    def search(self, keywords: Union[str, List[str]]) -> List[dict]:
+    def search(
+        self,
+        keywords: Union[str, List[str]],
+        min_score: float = 50,
+        limit: Optional[int] = None,
+        ranker: str = "fuzzy",
+        keys: Optional[List[str]] = None,
+        facets: Optional[Dict[str, Union[str, List[str]]]] = None,
+    ) -> List[dict]:
         """
         search finds the datasets that matches the keywords
 
+        The results are cached by the keywords, the search parameters and
+        the version of the flora; see `search_cache`.
+
         :param keywords: keywords to be searched
+        :param min_score: minimum score of the datasets; the scores of the
+            `bm25` ranker are relative to the best match, which is always
+            kept.
+        :param limit: maximum number of datasets to return, all if None
+        :param ranker: `fuzzy` ranks by the best fuzzy match of any field;
+            `bm25` ranks by field weighted BM25 with typo tolerance, see
+            `BM25SearchEngine`.
+        :param keys: list of dictionary keys to look into, only used by the
+            `fuzzy` ranker; defaults to `SEARCH_KEYS`.
+        :param facets: only the datasets that match the facets are scored,
+            e.g., `{"tag": ["ml", "nlp"], "source": "git"}`; see `filter`.
         """
         if isinstance(keywords, str):
             keywords = [keywords]
 
-        return search_by_keywords_in_flora(flora=self.flora, keywords=keywords)
+        key = (
+            tuple(sorted(set(str(k) for k in keywords))),
+            None if keys is None else tuple(keys),
+            min_score,
+            limit,
+            ranker,
+            facets_key(facets or {}),
+            self.version,
+        )
+        results = self.search_cache.get(key)
+        if results is None:
+            results = self._search(
+                keywords,
+                min_score=min_score,
+                limit=limit,
+                ranker=ranker,
+                keys=keys,
+                facets=facets,
+            )
+            self.search_cache.put(key, results)
+
+        return results
+
+    def _search(
+        self,
+        keywords: List[str],
+        min_score: float,
+        limit: Optional[int],
+        ranker: str,
+        keys: Optional[List[str]],
+        facets: Optional[Dict[str, Union[str, List[str]]]],
+    ) -> List[dict]:
+        facets = {k: v for k, v in (facets or {}).items() if v is not None}
+        if ranker == "fuzzy" and keys is None and self._uses_store:
+            # only the candidates of the full text index are loaded and scored
+            return FuzzySearchEngine(self._store_herbs(keywords, facets)).search(
+                keywords, min_score=min_score, limit=limit
+            )
+
+        candidates: Optional[List[int]] = None
+        if facets:
+            candidates = self.facet_index.positions(**facets).tolist()
+
+        if ranker == "bm25":
+            return self.bm25_engine.search(
+                keywords, min_score=min_score, limit=limit, candidates=candidates
+            )
+        elif ranker != "fuzzy":
+            raise Exception(f"Unknown search ranker: {ranker}")
+
+        if keys is not None:
+            herbs = self.flora
+            if candidates is not None:
+                herbs = [herbs[i] for i in candidates]
+            return search_by_keywords_in_flora(
+                herbs, keywords, keys=keys, min_score=min_score, limit=limit
+            )
+
+        shortlist = self.inverted_index.shortlist(keywords) if self.use_index else None
+        if shortlist is not None:
+            positions = self.search_engine.positions
+            shortlisted = [positions[id] for id in shortlist if id in positions]
+            if candidates is not None:
+                shortlisted = sorted(set(shortlisted) & set(candidates))
+            candidates = shortlisted
+
+        return self.search_engine.search(
+            keywords, min_score=min_score, limit=limit, candidates=candidates
+        )
+
+    @property
+    def _uses_store(self) -> bool:
+        """whether searches run on the SQLite store instead of the herbs"""
+        return self.store is not None and self._flora is None
+
+    def _store_herbs(
+        self, keywords: List[str], facets: Dict[str, Union[str, List[str]]]
+    ) -> List[Herb]:
+        """
+        _store_herbs loads the herbs that are candidates of the keywords in
+        the full text index of the SQLite store and match the facets, see
+        `SQLiteFloraStore.search_ids`; herbs without any word of the keywords,
+        or a similar word, are not scored.
+        """
+        ids = cast(SQLiteFloraStore, self.store).search_ids(keywords, facets)
+
+        return list(self.herbs(ids).values())
+
+    def iter_search(
+        self,
+        keywords: Union[str, List[str]],
+        min_score: float = 50,
+        facets: Optional[Dict[str, Union[str, List[str]]]] = None,
+    ) -> Iterator[dict]:
+        """
+        iter_search yields the datasets that match the keywords as soon as
+        they are scored, in the order of the flora instead of by score.
+
+        The candidates are the same as those of `search` with the `fuzzy`
+        ranker.
+
+        :param keywords: keywords to be searched
+        :param min_score: minimum score of the datasets
+        :param facets: only the datasets that match the facets are scored,
+            see `filter`.
+        """
+        if isinstance(keywords, str):
+            keywords = [keywords]
+        facets = {k: v for k, v in (facets or {}).items() if v is not None}
+
+        herbs: Iterable[Herb]
+        if self._uses_store:
+            herbs = self._store_herbs(keywords, facets)
+        else:
+            herbs = self.flora
+            if facets:
+                herbs = [herbs[i] for i in self.facet_index.positions(**facets)]
+            shortlist = (
+                self.inverted_index.shortlist(keywords) if self.use_index else None
+            )
+            if shortlist is not None:
+                herbs = [h for h in herbs if h.id in shortlist]
+
+        yield from iter_search_by_keywords_in_flora(
+            herbs, keywords, min_score=min_score
+        )
+
+    @property
+    def index_path(self) -> Path:
+        """path to the inverted index of a local flora"""
+        return self.flora_path.parent / f".{self.flora_path.name}.index"
+
+    @property
+    def inverted_index(self) -> InvertedIndex:
+        """
+        inverted index of the flora for keyword searches, loaded from disk
+        and synced with the herbs on first access
+        """
+        if self._inverted_index is None:
+            index = InvertedIndex.load(self.index_path)
+            if index.sync({h.id: h.herb_meta_json for h in self.flora}):
+                index.save(self.index_path)
+            self._inverted_index = index
+
+        return self._inverted_index
+
+    @property
+    def search_engine(self) -> FuzzySearchEngine:
+        """
+        search engine of the flora, built on first search and rebuilt
+        after the flora has changed
+        """
+        if self._search_engine is None:
+            self._search_engine = FuzzySearchEngine(self.flora)
+
+        return self._search_engine
+
+    @property
+    def bm25_engine(self) -> BM25SearchEngine:
+        """
+        BM25 search engine of the flora; the corpus statistics are computed
+        on first search and recomputed after the flora has changed
+        """
+        if self._bm25_engine is None:
+            self._bm25_engine = BM25SearchEngine(self.flora)
+
+        return self._bm25_engine
+
+    @property
+    def facet_index(self) -> FacetIndex:
+        """
+        bitmaps of the herbs for the facets tag, source, license and format,
+        built on first use and rebuilt after the flora has changed
+        """
+        if self._facet_index is None:
+            self._facet_index = FacetIndex(self.flora)
+
+        return self._facet_index
+
+    def filter(self, **facets: Union[str, List[str]]) -> List[Herb]:
+        """
+        filter finds the datasets that match the facets.
+
+        A dataset has to match all the facets, and matches a facet if it has
+        any of the given values; values are case insensitive.
+
+        ```python
+        flora.filter(tag=["ml", "nlp"], source="git", format="csv")
+        ```
+
+        :param facets: values of the facets `tag`, `source`, `license` and
+            `format`.
+        """
+        herbs = self.flora
+
+        return [herbs[i] for i in self.facet_index.positions(**facets)]
+
+    @property
+    def field_index(self) -> FieldIndex:
+        """
+        index of the column names in the resource schemas of the herbs,
+        built on first use and rebuilt after the flora has changed
+        """
+        if self._field_index is None:
+            self._field_index = FieldIndex(self.flora)
+
+        return self._field_index
+
+    def find_by_field(self, name: str, type: Optional[str] = None) -> List[dict]:
+        """
+        find_by_field finds the datasets with a column of the name in any of
+        their resources, e.g., `salary`.
+
+        :param name: name of the column, case insensitive
+        :param type: type of the column in the schema, e.g., `string`
+        :return: list of dicts with keys id, herb and fields, where fields
+            are the matching columns with their resource, path, name and type
+        """
+        return self.field_index.find(name, type=type)
+
+    def _lookup(self, id: str) -> Optional[Herb]:
+        """
+        _lookup finds the herb in the index. Herbs of SQLite floras are
+        loaded from the database and kept in the index.
+
+        :param id: herb id
+        """
+        herb = self._index.get(id)
+        if herb is None and self.store is not None and self._flora is None:
+            herb_meta = self.store.get(id)
+            if herb_meta is not None:
+                herb = self._convert_to_herb(herb_meta)
+                self._index[id] = herb
+
+        return herb
 
     def herb_meta(self, id: str) -> Optional[dict]:
         """
@@ -236,14 +895,9 @@ class Flora:
         :param id: herb id of the dataset
         """
 
-        herbs = _search_by_ids_in_flora(self.flora, id)
-
-        if herbs:
-            herb = herbs[0].get("herb")
-            if herb:
-                return herb.metadata
-            else:
-                return None
+        herb = self._lookup(id)
+        if herb:
+            return herb.metadata
         else:
             return None
 
@@ -254,18 +908,50 @@ class Flora:
         :param id: herb id
         """
 
-        herbs = _search_by_ids_in_flora(self.flora, id)
-        if len(herbs) > 1:
+        if id in self.duplicate_ids:
             logger.error(
                 f"Found multiple datasets with id {id}, please fix this in your flora data json file, e.g, WORKDIRECTORY/flora/flora.json."
             )
 
-        if herbs:
-            herb = herbs[0].get("herb")
-            if herb:
-                return herb
-            else:
-                return None
-        else:
+        herb = self._lookup(id)
+        if herb is None:
             logger.error(f"Could not find herb {id}")
-            return None
+
+        return herb
+
+    def herbs(self, ids: Iterable[str]) -> Dict[str, Herb]:
+        """
+        herbs finds the herbs of many ids in one pass.
+
+        Ids that are not in the flora are left out of the result and
+        reported in the logs, as are the ids that are duplicated in the flora.
+
+        :param ids: herb ids
+        :return: dictionary from herb id to herb
+        """
+        ids = list(ids)
+        if self.store is not None and self._flora is None:
+            unknown = [id for id in ids if id not in self._index]
+            for id, herb_meta in self.store.get_many(unknown).items():
+                self._index[id] = self._convert_to_herb(herb_meta)
+
+        found = {}
+        missing = []
+        for id in ids:
+            herb = self._index.get(id)
+            if herb is None:
+                missing.append(id)
+            else:
+                found[id] = herb
+
+        if missing:
+            logger.error(f"Could not find herbs {missing}")
+
+        duplicated = sorted(self.duplicate_ids.intersection(found))
+        if duplicated:
+            logger.error(
+                f"Found multiple datasets with ids {duplicated}, "
+                "please fix this in your flora."
+            )
+
+        return found
@@ -0,0 +1,214 @@
+import heapq
+import itertools
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple, Union
+
+from loguru import logger
+
+from dataherb.core.base import Herb
+from dataherb.core.bm25 import BM25SearchEngine
+from dataherb.flora import Flora
+from dataherb.storage.sqlite import SQLITE_SUFFIXES
+
+logger.remove()
+logger.add(sys.stderr, level="INFO", enqueue=True)
+
+
+def discover_floras(workdir: Path) -> Dict[str, Path]:
+    """
+    discover_floras finds the floras in the `flora` folder of the workdir:
+    folders, aggregated json files, and SQLite files. Hidden files, e.g.,
+    snapshots and search indexes, are skipped.
+
+    :param workdir: the working directory of dataherb
+    :return: dictionary from flora name to flora path
+    """
+    flora_folder = Path(workdir) / "flora"
+    if not flora_folder.is_dir():
+        raise Exception(f"flora folder {flora_folder} does not exist")
+
+    floras = {}
+    for path in sorted(flora_folder.iterdir()):
+        if path.name.startswith("."):
+            continue
+        if path.is_dir():
+            floras[path.name] = path
+        elif path.suffix == ".json" or path.suffix in SQLITE_SUFFIXES:
+            floras[path.stem] = path
+
+    return floras
+
+
+class MultiFlora:
+    """
+    A collection of floras that are searched together.
+
+    The floras are loaded concurrently on first use and kept, so that
+    repeated searches do not reload them. Searches run on all the floras
+    concurrently and the ranked results are merged into one ranking, with
+    each result tagged with the name of its flora.
+
+    The `bm25` ranker scores relative to the best match, so the herbs of
+    all the floras are ranked by one BM25 engine instead, which shares the
+    corpus statistics and the best match across the floras.
+
+    :param floras: dictionary from flora name to flora path, or to a loaded
+        `Flora`.
+    :param workers: number of threads used to load and search the floras;
+        defaults to one per flora.
+    :param flora_kwargs: keyword arguments passed to `Flora` when a flora is
+        loaded, e.g., `use_snapshot=True`.
+    """
+
+    def __init__(
+        self,
+        floras: Mapping[str, Union[Path, Flora]],
+        workers: Optional[int] = None,
+        **flora_kwargs,
+    ):
+        self.paths: Dict[str, Path] = {}
+        self.floras: Dict[str, Flora] = {}
+        for name, flora in floras.items():
+            if isinstance(flora, Flora):
+                self.floras[name] = flora
+            else:
+                self.paths[name] = Path(flora)
+        self.names = list(floras)
+        self.workers = workers
+        self.flora_kwargs = flora_kwargs
+        self._bm25: Optional[Tuple[tuple, BM25SearchEngine, Dict[int, str]]] = None
+
+    @classmethod
+    def from_workdir(cls, workdir: Path, **kwargs) -> "MultiFlora":
+        """
+        Create a MultiFlora with all the floras in the workdir
+
+        :param workdir: the working directory of dataherb
+        """
+        return cls(discover_floras(workdir), **kwargs)
+
+    def _map(self, function, names: List[str]) -> list:
+        """run function on the names concurrently"""
+        if not names:
+            return []
+        workers = self.workers or len(names)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(function, names))
+
+    def _load_flora(self, name: str) -> Flora:
+        logger.debug(f"Loading flora {name} from {self.paths[name]}")
+        return Flora(flora_path=self.paths[name], **self.flora_kwargs)
+
+    def load(self) -> Dict[str, Flora]:
+        """
+        load the floras that have not been loaded yet, concurrently
+
+        :return: dictionary from flora name to flora
+        """
+        missing = [name for name in self.names if name not in self.floras]
+        for name, flora in zip(missing, self._map(self._load_flora, missing)):
+            self.floras[name] = flora
+
+        return {name: self.floras[name] for name in self.names}
+
+    def search(
+        self,
+        keywords: Union[str, List[str]],
+        min_score: float = 50,
+        limit: Optional[int] = None,
+        **kwargs,
+    ) -> List[dict]:
+        """
+        search finds the datasets that match the keywords in all the floras
+
+        :param keywords: keywords to be searched
+        :param min_score: minimum score of the datasets
+        :param limit: maximum number of datasets to return, all if None
+        :param kwargs: other arguments of `Flora.search`, e.g., `ranker`
+        :return: list of dicts with keys id, herb, score and flora, ranked
+            by score; ties keep the order of the floras.
+        """
+        if kwargs.get("ranker") == "bm25":
+            return self._search_bm25(
+                keywords, min_score, limit, facets=kwargs.get("facets")
+            )
+
+        floras = self.load()
+
+        def _search(name: str) -> List[dict]:
+            return [
+                {**result, "flora": name}
+                for result in floras[name].search(
+                    keywords, min_score=min_score, limit=limit, **kwargs
+                )
+            ]
+
+        rankings = self._map(_search, self.names)
+        merged = heapq.merge(*rankings, key=lambda r: -r["score"])
+
+        return list(itertools.islice(merged, limit))
+
+    @property
+    def bm25_engine(self) -> Tuple[BM25SearchEngine, Dict[int, str]]:
+        """
+        BM25 engine of the herbs of all the floras, and the name of the flora
+        of each herb by the `id` of the herb object; rebuilt when a flora
+        changes
+        """
+        floras = self.load()
+        key = tuple((name, id(flora), flora.version) for name, flora in floras.items())
+        if self._bm25 is None or self._bm25[0] != key:
+            herbs: List[Herb] = []
+            owners: Dict[int, str] = {}
+            for name, flora in floras.items():
+                herbs.extend(flora.flora)
+                for herb in flora.flora:
+                    owners.setdefault(id(herb), name)
+            self._bm25 = (key, BM25SearchEngine(herbs), owners)
+
+        return self._bm25[1], self._bm25[2]
+
+    def _search_bm25(
+        self,
+        keywords: Union[str, List[str]],
+        min_score: float,
+        limit: Optional[int],
+        facets: Optional[Dict[str, Union[str, List[str]]]] = None,
+    ) -> List[dict]:
+        if isinstance(keywords, str):
+            keywords = [keywords]
+        engine, owners = self.bm25_engine
+
+        candidates: Optional[List[int]] = None
+        facets = {k: v for k, v in (facets or {}).items() if v is not None}
+        if facets:
+            candidates = []
+            offset = 0
+            for flora in self.load().values():
+                positions = flora.facet_index.positions(**facets)
+                candidates.extend(offset + int(i) for i in positions)
+                offset += len(flora.flora)
+
+        return [
+            {**result, "flora": owners[id(result["herb"])]}
+            for result in engine.search(
+                keywords, min_score=min_score, limit=limit, candidates=candidates
+            )
+        ]
+
+    def herb(self, id: str) -> Optional[Herb]:
+        """
+        herb finds the herb with the id in the first flora that has it
+
+        :param id: herb id
+        """
+        for flora in self.load().values():
+            herb = flora._lookup(id)
+            if herb is not None:
+                return herb
+
+        logger.error(f"Could not find herb {id} in any flora")
+
+        return None
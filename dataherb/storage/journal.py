@@ -0,0 +1,129 @@
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+from dataherb.core.base import Herb
+
+logger.remove()
+logger.add(sys.stderr, level="INFO", enqueue=True)
+
+
+class FloraJournal:
+    """
+    An append-only journal of the mutations of an aggregated flora.
+
+    Adding or removing a herb appends one json line to the journal instead of
+    rewriting the whole aggregated flora file. The journal is replayed on top
+    of the aggregated file when the flora is loaded, and folded back into the
+    aggregated file by `Flora.compact`.
+
+    :param flora_path: path to the aggregated flora json file.
+    :param path: path to the journal; defaults to `<flora file>.journal`.
+    """
+
+    def __init__(self, flora_path: Path, path: Optional[Path] = None):
+        self.flora_path = Path(flora_path)
+        if path is None:
+            path = self.flora_path.parent / f"{self.flora_path.name}.journal"
+        self.path = path
+
+    def append_add(self, metadata: dict) -> None:
+        """
+        Record that a herb has been added
+
+        :param metadata: metadata of the herb
+        """
+        self._append({"op": "add", "herb": metadata})
+
+    def append_remove(self, herb_id: str) -> None:
+        """
+        Record that a herb has been removed
+
+        :param herb_id: id of the herb
+        """
+        self._append({"op": "remove", "id": herb_id})
+
+    def _append(self, record: dict) -> None:
+        """Append a record and make sure it hits the disk"""
+        line = json.dumps(record, sort_keys=True) + "\n"
+        with open(self.path, "a+b") as fp:
+            # start a new line if the last append was interrupted
+            if fp.seek(0, os.SEEK_END) > 0:
+                fp.seek(-1, os.SEEK_END)
+                if fp.read(1) != b"\n":
+                    line = "\n" + line
+            fp.write(line.encode("utf-8"))
+            fp.flush()
+            os.fsync(fp.fileno())
+
+    def records(self) -> List[dict]:
+        """
+        Read all the records in the journal.
+
+        A truncated last line, e.g., from a crash in the middle of an append,
+        is skipped.
+        """
+        if not self.path.exists():
+            return []
+
+        records = []
+        with open(self.path, "r") as fp:
+            for i, line in enumerate(fp):
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.decoder.JSONDecodeError:
+                    logger.warning(
+                        f"Skipping corrupted record in flora journal {self.path}, "
+                        f"line {i + 1}"
+                    )
+
+        return records
+
+    def replay(self, herbs: List[Herb], to_herb: Callable[[dict], Herb]) -> List[Herb]:
+        """
+        Apply the records of the journal to a list of herbs.
+
+        Adding a herb whose id already exists is skipped, so that replaying
+        a journal that has already been folded into the flora is harmless.
+
+        :param herbs: herbs loaded from the aggregated flora file
+        :param to_herb: function that converts herb metadata to a herb
+        """
+        records = self.records()
+        if not records:
+            return herbs
+
+        alive: Dict[int, Herb] = dict(enumerate(herbs))
+        positions: Dict[str, List[int]] = {}
+        for pos, herb in alive.items():
+            positions.setdefault(herb.id, []).append(pos)
+
+        next_pos = len(herbs)
+        for record in records:
+            if record.get("op") == "add":
+                herb = to_herb(record["herb"])
+                if positions.get(herb.id):
+                    continue
+                alive[next_pos] = herb
+                positions[herb.id] = [next_pos]
+                next_pos += 1
+            elif record.get("op") == "remove":
+                for pos in positions.pop(record["id"], []):
+                    alive.pop(pos)
+            else:
+                logger.warning(f"Unknown operation in flora journal: {record}")
+
+        logger.debug(f"Replayed {len(records)} records from {self.path}")
+
+        return list(alive.values())
+
+    def clear(self) -> None:
+        """Remove the journal"""
+        if self.path.exists():
+            self.path.unlink()
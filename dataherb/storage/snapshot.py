@@ -0,0 +1,119 @@
+import os
+import pickle
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from dataherb.core.base import herb_search_corpus
+from dataherb.utils.files import atomic_write_bytes
+
+logger.remove()
+logger.add(sys.stderr, level="INFO", enqueue=True)
+
+
+SNAPSHOT_VERSION = 1
+
+
+class FloraSnapshot:
+    """
+    A binary snapshot of the parsed metadata of a local flora.
+
+    The snapshot stores the herbs parsed from each source file of the flora,
+    i.e., the aggregated json file or the `dataherb.json` of each herb,
+    together with the precomputed search corpus of the herbs. A source file
+    is only parsed again if its mtime or size has changed.
+
+    :param flora_path: path to the flora, a json file or a folder.
+    :param path: path to the snapshot file; defaults to a hidden file
+        next to the flora.
+    """
+
+    def __init__(self, flora_path: Path, path: Optional[Path] = None):
+        self.flora_path = Path(flora_path)
+        if path is None:
+            path = self.flora_path.parent / f".{self.flora_path.name}.snapshot"
+        self.path = path
+
+        self.entries: Dict[str, dict] = self._load()
+        self.stats = {"reused": 0, "reloaded": 0}
+
+    def _load(self) -> Dict[str, dict]:
+        """Load the entries of the snapshot file if it is valid"""
+        if not self.path.exists():
+            return {}
+
+        try:
+            with open(self.path, "rb") as fp:
+                snapshot = pickle.load(fp)
+        except Exception as e:
+            logger.warning(f"Can not read flora snapshot {self.path}: {e}")
+            return {}
+
+        if (
+            not isinstance(snapshot, dict)
+            or snapshot.get("version") != SNAPSHOT_VERSION
+            or snapshot.get("flora_path") != str(self.flora_path)
+        ):
+            logger.debug(f"Discarding outdated flora snapshot {self.path}")
+            return {}
+
+        return snapshot.get("entries", {})
+
+    def load(
+        self, paths: List[Path], loader: Callable[[List[Path]], List[Any]]
+    ) -> List[Tuple[dict, Dict[str, Any]]]:
+        """
+        load returns the herbs and their search corpus for the source files.
+
+        Files that are unchanged since the snapshot was taken are served from
+        the snapshot, the others are parsed using the loader. The snapshot
+        file is updated if anything has changed.
+
+        :param paths: source files of the flora
+        :param loader: function that parses a list of json files
+        :return: list of (herb metadata, search corpus)
+        """
+        stats = {}
+        stale = []
+        for p in paths:
+            st = os.stat(p)
+            stats[str(p)] = (st.st_mtime_ns, st.st_size)
+            entry = self.entries.get(str(p))
+            if entry is None or entry["stat"] != stats[str(p)]:
+                stale.append(p)
+
+        for p, parsed in zip(stale, loader(stale)):
+            herbs = [parsed] if isinstance(parsed, dict) else parsed
+            self.entries[str(p)] = {
+                "stat": stats[str(p)],
+                "herbs": [(h, herb_search_corpus(h)) for h in herbs],
+            }
+
+        removed = set(self.entries) - set(stats)
+        for key in removed:
+            self.entries.pop(key)
+
+        self.stats = {"reused": len(paths) - len(stale), "reloaded": len(stale)}
+        logger.debug(f"flora snapshot {self.path}: {self.stats}")
+
+        if stale or removed:
+            self.save()
+
+        return [h for p in paths for h in self.entries[str(p)]["herbs"]]
+
+    def save(self) -> None:
+        """Save the snapshot to disk"""
+        content = pickle.dumps(
+            {
+                "version": SNAPSHOT_VERSION,
+                "flora_path": str(self.flora_path),
+                "entries": self.entries,
+            },
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        try:
+            atomic_write_bytes(self.path, content)
+        except OSError as e:
+            logger.warning(f"Can not write flora snapshot {self.path}: {e}")
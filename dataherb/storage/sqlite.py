@@ -0,0 +1,409 @@
+import json
+import re
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Union
+
+from loguru import logger
+from rapidfuzz import fuzz, process
+
+from dataherb.core.facets import FACETS, facet_values
+
+logger.remove()
+logger.add(sys.stderr, level="INFO", enqueue=True)
+
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+# version of the data derived from the metadata, i.e., the facets
+_DATA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS herbs (
+    pk INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    name TEXT,
+    source TEXT,
+    description TEXT,
+    tags TEXT,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS herbs_name ON herbs (name);
+CREATE INDEX IF NOT EXISTS herbs_source ON herbs (source);
+CREATE INDEX IF NOT EXISTS herbs_tags ON herbs (tags);
+
+CREATE TABLE IF NOT EXISTS herb_tags (
+    tag TEXT NOT NULL,
+    herb_id TEXT NOT NULL REFERENCES herbs (id) ON DELETE CASCADE,
+    PRIMARY KEY (tag, herb_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS herb_tags_herb_id ON herb_tags (herb_id);
+
+CREATE TABLE IF NOT EXISTS herb_facets (
+    facet TEXT NOT NULL,
+    value TEXT NOT NULL,
+    herb_id TEXT NOT NULL REFERENCES herbs (id) ON DELETE CASCADE,
+    PRIMARY KEY (facet, value, herb_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS herb_facets_herb_id ON herb_facets (herb_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS herbs_fts USING fts5 (
+    id, name, description, tags, content='herbs', content_rowid='pk'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS herbs_fts_vocab USING fts5vocab (
+    herbs_fts, 'row'
+);
+
+CREATE TRIGGER IF NOT EXISTS herbs_after_insert AFTER INSERT ON herbs BEGIN
+    INSERT INTO herbs_fts (rowid, id, name, description, tags)
+    VALUES (new.pk, new.id, new.name, new.description, new.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS herbs_after_delete AFTER DELETE ON herbs BEGIN
+    INSERT INTO herbs_fts (herbs_fts, rowid, id, name, description, tags)
+    VALUES ('delete', old.pk, old.id, old.name, old.description, old.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS herbs_after_update AFTER UPDATE ON herbs BEGIN
+    INSERT INTO herbs_fts (herbs_fts, rowid, id, name, description, tags)
+    VALUES ('delete', old.pk, old.id, old.name, old.description, old.tags);
+    INSERT INTO herbs_fts (rowid, id, name, description, tags)
+    VALUES (new.pk, new.id, new.name, new.description, new.tags);
+END;
+"""
+
+
+def _tags(metadata: dict) -> List[str]:
+    """tags of the herb as a list of strings"""
+    tags = metadata.get("tags") or []
+    if isinstance(tags, str):
+        tags = [tags]
+
+    return [str(t) for t in tags]
+
+
+def _facet_rows(metadata: dict) -> List[tuple]:
+    """rows of the herb_facets table of the herb"""
+    id = metadata.get("id", "")
+
+    return [
+        (facet, value, id)
+        for facet, values in facet_values(metadata).items()
+        for value in values
+    ]
+
+
+def fts_query(
+    keywords: Iterable[str], expansions: Optional[Mapping[str, List[str]]] = None
+) -> str:
+    """
+    fts_query converts search keywords into an FTS5 query that matches
+    any of the words in the keywords as a prefix, or any of their expansions.
+
+    :param keywords: search keywords
+    :param expansions: terms of the index that also match each word, e.g.,
+        the terms that are similar to a word with a typo.
+    """
+    tokens = []
+    for keyword in keywords:
+        tokens.extend(re.findall(r"\w+", str(keyword).lower()))
+
+    terms = []
+    for token in dict.fromkeys(tokens):
+        terms.append(f'"{token}"*')
+        terms.extend(f'"{t}"' for t in (expansions or {}).get(token, []))
+
+    return " OR ".join(dict.fromkeys(terms))
+
+
+class SQLiteFloraStore:
+    """
+    Herb metadata stored in a single SQLite file.
+
+    The `id`, `name`, `source` and `tags` of the herbs are stored in indexed
+    columns, as are the facets of the herbs, see `facet_values`, and the full
+    text of the name, description and tags is indexed using FTS5. The full
+    metadata of the herb is kept as json.
+
+    The connection can be shared among threads; queries are serialized
+    with a lock.
+
+    :param path: path to the SQLite file.
+    :param create: create the SQLite file if it does not exist; otherwise a
+        missing file is an error, so that a mistyped path does not silently
+        open an empty flora.
+    :param fuzzy_cutoff: minimum similarity (0-100) of a keyword and a term
+        of the full text index for the term to be considered a typo of the
+        keyword in `search_ids`.
+    """
+
+    def __init__(self, path: Path, create: bool = False, fuzzy_cutoff: float = 80):
+        self.path = Path(path)
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self._lock = threading.Lock()
+        self._vocabulary: Optional[tuple] = None
+        mode = "rwc" if create else "rw"
+        try:
+            self.connection = sqlite3.connect(
+                f"{self.path.resolve().as_uri()}?mode={mode}",
+                uri=True,
+                check_same_thread=False,
+            )
+        except sqlite3.OperationalError as e:
+            raise Exception(f"Can not open SQLite flora {self.path}: {e}")
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """fill the facets of the herbs of files created by older versions"""
+        (version,) = self.connection.execute("PRAGMA user_version").fetchone()
+        if version >= _DATA_VERSION:
+            return
+
+        logger.debug(f"Indexing the facets of SQLite flora {self.path}")
+        with self.connection:
+            self.connection.execute("DELETE FROM herb_facets")
+            for (metadata,) in self.connection.execute(
+                "SELECT metadata FROM herbs"
+            ).fetchall():
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO herb_facets (facet, value, herb_id) "
+                    "VALUES (?, ?, ?)",
+                    _facet_rows(json.loads(metadata)),
+                )
+            self.connection.execute(f"PRAGMA user_version = {_DATA_VERSION}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self.connection.execute("SELECT COUNT(*) FROM herbs").fetchone()
+
+        return count
+
+    def __contains__(self, id: str) -> bool:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM herbs WHERE id = ?", (id,)
+            ).fetchone()
+
+        return row is not None
+
+    def ids(self) -> List[str]:
+        """ids of all the herbs"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT id FROM herbs ORDER BY pk"
+            ).fetchall()
+
+        return [r[0] for r in rows]
+
+    def get(self, id: str) -> Optional[dict]:
+        """
+        metadata of the herb
+
+        :param id: herb id
+        """
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT metadata FROM herbs WHERE id = ?", (id,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return json.loads(row[0])
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, dict]:
+        """
+        metadata of many herbs
+
+        :param ids: herb ids
+        :return: dictionary from herb id to herb metadata
+        """
+        ids = list(dict.fromkeys(ids))
+        found = {}
+        # stay below the maximum number of host parameters of old SQLite
+        for i in range(0, len(ids), 900):
+            chunk = ids[i : i + 900]
+            with self._lock:
+                rows = self.connection.execute(
+                    "SELECT id, metadata FROM herbs "
+                    f"WHERE id IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+            found.update({id: json.loads(metadata) for id, metadata in rows})
+
+        return found
+
+    def all(self) -> Iterator[dict]:
+        """iterate over the metadata of all the herbs"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT metadata FROM herbs ORDER BY pk"
+            ).fetchall()
+
+        for (metadata,) in rows:
+            yield json.loads(metadata)
+
+    def add(self, metadata: dict) -> None:
+        """
+        Add a herb
+
+        :param metadata: metadata of the herb
+        """
+        self.add_many([metadata])
+
+    def add_many(self, metadatas: Iterable[dict]) -> None:
+        """
+        Add herbs in one transaction
+
+        :param metadatas: metadata of the herbs
+        """
+        with self._lock, self.connection:
+            for metadata in metadatas:
+                id = metadata.get("id", "")
+                tags = _tags(metadata)
+                try:
+                    self.connection.execute(
+                        "INSERT INTO herbs "
+                        "(id, name, source, description, tags, metadata) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (
+                            id,
+                            metadata.get("name"),
+                            metadata.get("source"),
+                            metadata.get("description"),
+                            " ".join(tags),
+                            json.dumps(metadata, sort_keys=True),
+                        ),
+                    )
+                except sqlite3.IntegrityError:
+                    raise Exception(f"herb id = {id} already exists")
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO herb_tags (tag, herb_id) VALUES (?, ?)",
+                    [(t, id) for t in tags],
+                )
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO herb_facets (facet, value, herb_id) "
+                    "VALUES (?, ?, ?)",
+                    _facet_rows(metadata),
+                )
+
+    def remove(self, id: str) -> bool:
+        """
+        Remove a herb
+
+        :param id: herb id
+        :return: whether the herb was found
+        """
+        with self._lock, self.connection:
+            cursor = self.connection.execute("DELETE FROM herbs WHERE id = ?", (id,))
+
+        return cursor.rowcount > 0
+
+    def vocabulary(self) -> List[str]:
+        """
+        terms of the full text index, cached until the database changes
+        """
+        with self._lock:
+            (data_version,) = self.connection.execute("PRAGMA data_version").fetchone()
+            key = (data_version, self.connection.total_changes)
+            if self._vocabulary is None or self._vocabulary[0] != key:
+                rows = self.connection.execute(
+                    "SELECT term FROM herbs_fts_vocab"
+                ).fetchall()
+                self._vocabulary = (key, [r[0] for r in rows])
+
+        return self._vocabulary[1]
+
+    def expansions(self, keywords: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        expansions finds the terms of the full text index that are similar
+        to the words of the keywords, so that a typo still finds the herbs.
+
+        :param keywords: search keywords
+        :return: dictionary from word to similar terms
+        """
+        vocabulary = self.vocabulary()
+        tokens = []
+        for keyword in keywords:
+            tokens.extend(re.findall(r"\w+", str(keyword).lower()))
+
+        return {
+            token: [
+                term
+                for term, _, _ in process.extract(
+                    token,
+                    vocabulary,
+                    scorer=fuzz.ratio,
+                    score_cutoff=self.fuzzy_cutoff,
+                    limit=None,
+                )
+            ]
+            for token in dict.fromkeys(tokens)
+        }
+
+    def search_ids(
+        self,
+        keywords: Iterable[str],
+        facets: Optional[Mapping[str, Union[str, Iterable[str]]]] = None,
+    ) -> List[str]:
+        """
+        search_ids finds the candidate herbs for the keywords using the full
+        text index, in the order of the flora.
+
+        A herb is a candidate if any word of the keywords is a prefix of, or
+        similar to, a term of its id, name, description or tags. The facets
+        are filtered in SQL, with the semantics of `FacetIndex.mask`.
+
+        :param keywords: search keywords
+        :param facets: values of the facets, e.g., `{"tag": ["ml", "nlp"]}`
+        :return: ids of the candidate herbs
+        """
+        keywords = list(keywords)
+        query = fts_query(keywords, self.expansions(keywords))
+        if not query:
+            return []
+
+        sql = (
+            "SELECT herbs.id FROM herbs_fts "
+            "JOIN herbs ON herbs.pk = herbs_fts.rowid "
+            "WHERE herbs_fts MATCH ?"
+        )
+        parameters: List[str] = [query]
+        for facet, values in (facets or {}).items():
+            if facet not in FACETS:
+                raise Exception(f"Unknown facet {facet}; use one of {FACETS}")
+            if values is None:
+                continue
+            values = [values] if isinstance(values, str) else list(values)
+            sql += (
+                " AND herbs.id IN (SELECT herb_id FROM herb_facets "
+                f"WHERE facet = ? AND value IN ({', '.join('?' * len(values))}))"
+            )
+            parameters.extend([facet] + [str(v).lower() for v in values])
+
+        with self._lock:
+            rows = self.connection.execute(
+                f"{sql} ORDER BY herbs.pk", parameters
+            ).fetchall()
+
+        return [r[0] for r in rows]
+
+    def ids_by_tag(self, tag: str) -> List[str]:
+        """
+        ids of the herbs with the tag
+
+        :param tag: tag of the herbs
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT herb_id FROM herb_tags WHERE tag = ?", (tag,)
+            ).fetchall()
+
+        return [r[0] for r in rows]
+
+    def close(self) -> None:
+        """Close the connection"""
+        self.connection.close()
@@ -98,3 +98,19 @@ class Config:
     @property
     def flora(self):
         return self.config.get("default", {}).get("flora")
+
+    @property
+    def cache_max_bytes(self) -> Optional[int]:
+        """byte budget of the resource cache, `cache.max_bytes` in the config"""
+        from dataherb.cache.resource_cache import DEFAULT_MAX_BYTES
+
+        return self.config.get("cache", {}).get("max_bytes", DEFAULT_MAX_BYTES)
+
+    @property
+    def cache_dedupe(self) -> bool:
+        """whether new downloads are linked to the blob store, `cache.dedupe`
+        in the config; off if dataherb is not configured"""
+        if not cast(Path, self.config_path).exists():
+            return False
+
+        return bool(self.config.get("cache", {}).get("dedupe", False))
@@ -0,0 +1,58 @@
+import os
+import secrets
+import stat
+import tempfile
+from pathlib import Path
+from typing import Optional, Tuple
+
+
+def _create_temp_file(path: Path) -> Tuple[int, str]:
+    """
+    _create_temp_file creates a new temporary file next to the path, with the
+    permissions of `open`, i.e., `0o666` without the umask which is applied
+    by the kernel.
+
+    :param path: destination of the file
+    :return: the file descriptor and the path of the temporary file
+    """
+    for _ in range(tempfile.TMP_MAX):
+        tmp_path = os.path.join(path.parent, f".{path.name}.{secrets.token_hex(4)}")
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
+            continue
+        return fd, tmp_path
+
+    raise FileExistsError(f"Could not create a temporary file for {path}")
+
+
+def atomic_write_bytes(path: Path, content: bytes) -> None:
+    """
+    atomic_write_bytes writes the content to a temporary file in the same
+    folder and renames it to the destination.
+
+    The file keeps the permissions of the file it replaces; a new file gets
+    the permissions of `open`, instead of the private `0o600` of
+    `tempfile.mkstemp`.
+
+    :param path: destination of the file
+    :param content: content to be written
+    """
+    try:
+        mode: Optional[int] = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = None
+
+    fd, tmp_path = _create_temp_file(path)
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(content)
+            fp.flush()
+            os.fsync(fp.fileno())
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
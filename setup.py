@@ -34,6 +34,7 @@ def setup():
         license="MIT",
         packages=_find_packages(exclude=("tests",)),
         install_requires=_requirements(),
+        extras_require={"zstd": ["zstandard"]},
         include_package_data=True,
         entry_points={"console_scripts": ["dataherb=dataherb.command:dataherb"]},
         test_suite="nose.collector",
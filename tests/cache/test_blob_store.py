@@ -0,0 +1,94 @@
+import hashlib
+import os
+
+import pytest
+
+from dataherb.cache.blob_store import BlobStore
+from dataherb.core.base import Herb
+
+TABLE = b"code,country\nDE,Germany\nFR,France\n"
+
+
+def _herbs(root, n=3):
+    for i in range(n):
+        herb = root / f"herb-{i}"
+        (herb / "dataset").mkdir(parents=True)
+        (herb / "dataset" / "countries.csv").write_bytes(TABLE)
+        (herb / "dataset" / "data.csv").write_text("a,b\n" + "1,2\n" * i)
+        (herb / ".git").mkdir()
+        (herb / ".git" / "countries.csv").write_bytes(TABLE)
+
+
+@pytest.mark.parametrize("mode", ["hardlink", "copy"])
+def test_blob_store_dedupe(tmp_path, mode):
+    _herbs(tmp_path / "wd")
+    unique = tmp_path / "wd" / "herb-0" / "dataset" / "unique.csv"
+    unique.write_bytes(TABLE.upper())
+    store = BlobStore(tmp_path / "wd" / ".cache" / "blobs", mode=mode)
+
+    stats = store.dedupe(tmp_path / "wd")
+    assert stats["files"] == 7
+    # only the files with the same size are hashed
+    assert stats["hashed"] == 4
+    assert stats["blobs"] == 1
+    # a file without a duplicate is left as it is
+    assert unique.stat().st_nlink == 1
+    assert unique.stat().st_mode & 0o200
+
+    paths = [tmp_path / "wd" / f"herb-{i}/dataset/countries.csv" for i in range(3)]
+    assert all(p.read_bytes() == TABLE for p in paths)
+    blob = store.lookup(f"sha256:{hashlib.sha256(TABLE).hexdigest()}")
+    assert not blob.stat().st_mode & 0o222
+    if mode == "hardlink":
+        assert stats["linked"] == 2
+        assert stats["bytes_saved"] == 2 * len(TABLE)
+        assert all(os.path.samefile(p, blob) for p in paths)
+        # writing in place would change every herb, so linked files are
+        # read-only
+        assert not any(p.stat().st_mode & 0o222 for p in paths)
+        # linked files are not hashed again, only the unique file
+        assert store.dedupe(tmp_path / "wd")["hashed"] == 1
+    else:
+        assert stats["linked"] == 0
+        assert not any(os.path.samefile(p, blob) for p in paths)
+        assert all(p.stat().st_mode & 0o200 for p in paths)
+
+
+def test_blob_store_alias(tmp_path):
+    store = BlobStore(tmp_path / "blobs")
+    (tmp_path / "a.csv").write_bytes(TABLE)
+    md5 = hashlib.md5(TABLE).hexdigest()
+
+    assert store.link(md5, tmp_path / "b.csv") is None
+    result = store.add(tmp_path / "a.csv", hash=md5)
+    assert result["new"]
+    assert store.link(md5, tmp_path / "b.csv")
+    assert (tmp_path / "b.csv").read_bytes() == TABLE
+
+    with pytest.raises(Exception):
+        store.add(tmp_path / "a.csv", hash="0" * 32)
+
+
+def test_download_resource_blob(tmp_path):
+    md5 = hashlib.md5(TABLE).hexdigest()
+    store = BlobStore(tmp_path / "blobs")
+    (tmp_path / "countries.csv").write_bytes(TABLE)
+    store.add(tmp_path / "countries.csv", hash=md5)
+    herb = Herb(
+        {
+            "id": "remote-herb",
+            "source": "git",
+            # nothing is downloaded, the blob is known
+            "metadata_uri": "http://127.0.0.1:9/dataherb.json",
+            "datapackage": {
+                "name": "remote-herb",
+                "resources": [
+                    {"name": "countries", "path": "countries.csv", "hash": md5}
+                ],
+            },
+        },
+        base_path=tmp_path / "remote-herb",
+    )
+
+    path = herb.download_resource(0, blob_store=store)
+    assert path.read_bytes() == TABLE
@@ -0,0 +1,134 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dataherb.cache.resource_cache import ResourceCache, sha256_file
+from dataherb.cmd.cache import cache_table, format_bytes, stats_table
+
+
+def _put(cache, tmp_path, url, content):
+    source = tmp_path / "source"
+    source.write_bytes(content)
+    return cache.put(source, url)
+
+
+def test_resource_cache_put_get(tmp_path):
+    cache = ResourceCache(tmp_path / "cache")
+    assert cache.get("https://example.com/a.csv") is None
+
+    path = _put(cache, tmp_path, "https://example.com/a.csv", b"a,b\n1,2\n")
+    assert path.read_bytes() == b"a,b\n1,2\n"
+    assert path.name == f"{sha256_file(path)}.csv"
+    assert cache.get("https://example.com/a.csv") == path
+    # the same content is stored once
+    assert _put(cache, tmp_path, "https://mirror.com/a.csv", b"a,b\n1,2\n") == path
+    assert cache.entries()[0]["urls"] == [
+        "https://example.com/a.csv",
+        "https://mirror.com/a.csv",
+    ]
+    # the resource has changed
+    assert cache.get("https://example.com/a.csv", hash="abc") is None
+
+    stats = cache.stats()
+    assert stats["files"] == 1
+    assert stats["urls"] == 2
+    assert stats["bytes"] == 8
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_resource_cache_lru(tmp_path):
+    cache = ResourceCache(tmp_path / "cache", max_bytes=250)
+    paths = [
+        _put(cache, tmp_path, f"https://example.com/{i}.bin", bytes([i]) * 100)
+        for i in range(2)
+    ]
+    time.sleep(0.01)
+    # 0 is now more recently used than 1
+    assert cache.get("https://example.com/0.bin") == paths[0]
+
+    _put(cache, tmp_path, "https://example.com/2.bin", bytes([2]) * 100)
+    assert not paths[1].exists()
+    assert cache.get("https://example.com/1.bin") is None
+    assert cache.get("https://example.com/0.bin") == paths[0]
+    assert cache.stats()["bytes"] == 200
+
+    # files that are not in the manifest are removed
+    (cache.path / "orphan.csv").write_text("orphan")
+    evicted = cache.prune(max_bytes=100)
+    assert len(evicted) == 1
+    assert not (cache.path / "orphan.csv").exists()
+    assert [e["urls"] for e in cache.entries()] == [["https://example.com/0.bin"]]
+
+    assert cache.prune(max_bytes=0)
+    assert cache.entries() == []
+
+
+def test_cache_tables(tmp_path):
+    cache = ResourceCache(tmp_path / "cache", max_bytes=None)
+    _put(cache, tmp_path, "https://example.com/a.csv", b"a,b\n1,2\n")
+
+    cache_table(cache.entries())
+    stats_table(cache.stats())
+    assert format_bytes(8) == "8 B"
+    assert format_bytes(1536 * 1024) == "1.5 MiB"
+    assert format_bytes(None) == "unlimited"
+
+
+def test_resource_cache_hits_batched(tmp_path):
+    cache = ResourceCache(tmp_path / "cache")
+    path = _put(cache, tmp_path, "https://example.com/a.csv", b"a,b\n1,2\n")
+    stamp = cache.manifest_path.stat().st_mtime_ns
+
+    for _ in range(3):
+        assert cache.get("https://example.com/a.csv") == path
+    assert cache.manifest_path.stat().st_mtime_ns == stamp
+
+    cache.flush()
+    assert ResourceCache(cache.path).stats()["hits"] == 3
+    # a cached file of another size is outdated
+    assert cache.get("https://example.com/a.csv", bytes=9) is None
+
+
+def test_resource_cache_shared(tmp_path):
+    caches = [ResourceCache(tmp_path / "cache") for _ in range(2)]
+    paths = [
+        _put(cache, tmp_path, f"https://example.com/{i}.csv", f"{i}\n".encode())
+        for i, cache in enumerate(caches)
+    ]
+
+    # no update of the other cache is lost, so nothing is pruned
+    assert caches[0].prune() == []
+    assert all(path.exists() for path in paths)
+    assert {e["urls"][0] for e in caches[1].entries()} == {
+        "https://example.com/0.csv",
+        "https://example.com/1.csv",
+    }
+
+
+def test_resource_cache_concurrent_fetch(tmp_path, http_root, http_url, http_server):
+    (http_root / "a.csv").write_bytes(b"a,b\n1,2\n" * 1000)
+    caches = [ResourceCache(tmp_path / "cache") for _ in range(4)]
+    url = f"{http_url}/a.csv"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        paths = list(executor.map(lambda cache: cache.fetch(url), caches))
+
+    assert len(set(paths)) == 1
+    assert paths[0].read_bytes() == b"a,b\n1,2\n" * 1000
+    # the url is downloaded once, the others wait for it
+    assert http_server.requests.count("/a.csv") == 1
+
+
+def test_resource_cache_prune_keeps_downloads(tmp_path):
+    caches = [ResourceCache(tmp_path / "cache") for _ in range(2)]
+    downloads = caches[0].path / ".downloads"
+    downloads.mkdir(parents=True)
+    (downloads / "active.part").write_bytes(b"a,b\n")
+    (downloads / "abandoned.part").write_bytes(b"a,b\n")
+
+    with caches[0]._download_lock("active"):
+        caches[1].prune()
+        assert (downloads / "active.part").exists()
+        assert not (downloads / "abandoned.part").exists()
+
+    caches[1].prune()
+    assert list(downloads.iterdir()) == []
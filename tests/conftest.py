@@ -0,0 +1,160 @@
+import functools
+import hashlib
+import re
+import shutil
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pytest
+
+__CWD__ = Path(__file__).parent
+
+
+@pytest.fixture(scope="session")
+def flora_path() -> Path:
+    return __CWD__ / "integration/data/demo-flora"
+
+
+@pytest.fixture
+def flora_copy(tmp_path, flora_path) -> Path:
+    """a copy of the demo flora in a workdir that can be modified"""
+    flora = tmp_path / "flora" / "demo-flora"
+    shutil.copytree(flora_path, flora)
+
+    return flora
+
+
+class FileServer(ThreadingHTTPServer):
+    """the local http server of the tests, with the settings and the
+    records of the handler"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.connections: List[Tuple[str, int]] = []
+        self.requests: List[str] = []
+        self.request_headers: List[dict] = []
+        self.etags = True
+        # number of failed responses of a path before it is served
+        self.failures: Dict[str, int] = {}
+        self.failure_status = 503
+        self.ranges = True
+        # number of bytes of a path that are sent before the connection drops
+        self.cutoffs: Dict[str, int] = {}
+
+
+class Handler(SimpleHTTPRequestHandler):
+    """
+    keep-alive file server that records the client connections, and
+    supports ETag, Range requests and injected failures
+    """
+
+    server: FileServer
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.connections.append(self.client_address)
+
+    def _etag(self):
+        path = Path(self.translate_path(self.path))
+        if path.is_file() and self.server.etags:
+            return f'"{hashlib.md5(path.read_bytes()).hexdigest()}"'
+
+    def end_headers(self):
+        etag = self._etag()
+        if etag:
+            self.send_header("ETag", etag)
+        super().end_headers()
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.server.request_headers.append(dict(self.headers))
+        failures = self.server.failures.get(self.path, 0)
+        if failures:
+            self.server.failures[self.path] = failures - 1
+            self.send_error(self.server.failure_status)
+            return
+        etag = self._etag()
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        path = Path(self.translate_path(self.path))
+        ranged = self.server.ranges and "Range" in self.headers
+        if path.is_file() and (ranged or self.path in self.server.cutoffs):
+            self._send_file(path.read_bytes())
+            return
+        super().do_GET()
+
+    def _send_file(self, content: bytes):
+        start, end = 0, len(content) - 1
+        match = re.match(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+        if match and self.server.ranges:
+            if match.group(1):
+                start = int(match.group(1))
+                end = int(match.group(2) or end)
+            else:
+                start = max(0, len(content) - int(match.group(2)))
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(content)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            end = min(end, len(content) - 1)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(content)}")
+        else:
+            self.send_response(200)
+        body = content[start : end + 1]
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+        cutoff = self.server.cutoffs.get(self.path)
+        if cutoff is not None and cutoff < len(body):
+            del self.server.cutoffs[self.path]
+            # drop the connection in the middle of the body
+            self.wfile.write(body[:cutoff])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def http_root(tmp_path) -> Path:
+    root = tmp_path / "www"
+    root.mkdir()
+    for i in range(5):
+        (root / f"file-{i}.json").write_text(f'{{"i": {i}}}')
+
+    return root
+
+
+@pytest.fixture
+def http_server(http_root):
+    """a local http server of the files in http_root"""
+    server = FileServer(
+        ("127.0.0.1", 0), functools.partial(Handler, directory=str(http_root))
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def http_url(http_server) -> str:
+    host, port = http_server.server_address
+    return f"http://{host}:{port}"
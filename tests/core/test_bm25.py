@@ -0,0 +1,66 @@
+import pytest
+
+from dataherb.core.bm25 import BM25SearchEngine
+from dataherb.core.inverted_index import tokenize
+from dataherb.flora import Flora
+
+
+@pytest.mark.parametrize(
+    "keywords, expected",
+    [
+        pytest.param(["covid"], "git-dataherb-covid-19"),
+        pytest.param(["motorway"], "dataset-eu-motorways-network"),
+        pytest.param(["eurostat freight"], "dataset-eurostats-freight-modal-split"),
+        pytest.param(["nutss"], "dataset-eu-nuts", id="typo"),
+        pytest.param(["git-data-science-job"], "git-data-science-job", id="id"),
+    ],
+)
+def test_bm25_search_engine(flora_path, keywords, expected):
+    fl = Flora(flora_path=flora_path)
+    results = BM25SearchEngine(fl.flora).search(keywords, min_score=0)
+
+    assert results[0]["id"] == expected
+    assert results[0]["score"] == 100
+    assert [r["bm25"] for r in results] == sorted(
+        [r["bm25"] for r in results], reverse=True
+    )
+
+
+def test_bm25_search_engine_field_weights(flora_path):
+    fl = Flora(flora_path=flora_path)
+    engine = BM25SearchEngine(fl.flora, weights={"name": 1.0})
+
+    assert set(engine.postings) == {
+        token for h in fl.flora for token in tokenize(h.metadata["name"])
+    }
+
+
+def test_flora_search_bm25(flora_path):
+    fl = Flora(flora_path=flora_path)
+
+    results = fl.search("eurostat freight", ranker="bm25", min_score=0, limit=2)
+    assert [r["id"] for r in results] == [
+        "dataset-eurostats-freight-modal-split",
+        "dataset-eurostats-goods-load-unload",
+    ]
+    # corpus statistics are cached across queries
+    engine = fl.bm25_engine
+    fl.search("covid", ranker="bm25")
+    assert fl.bm25_engine is engine
+
+    with pytest.raises(Exception):
+        fl.search("covid", ranker="unknown")
+
+
+def test_bm25_search_engine_thresholds(flora_path):
+    fl = Flora(flora_path=flora_path)
+    engine = BM25SearchEngine(fl.flora, expansion_cache_size=2)
+
+    # the relative score always keeps the best match
+    results = engine.search(["covid"], min_score=100)
+    assert [r["score"] for r in results] == [100]
+    assert engine.search(["covid"], min_bm25=results[0]["bm25"] + 1) == []
+
+    for token in ["covid", "nutss", "motorway"]:
+        engine.expand(token)
+    assert engine._expand.cache_info().currsize == 2
@@ -0,0 +1,69 @@
+import pytest
+
+from dataherb.core.facets import FacetIndex, facet_values
+from dataherb.flora import Flora
+
+
+def test_facet_values():
+    values = facet_values(
+        {
+            "source": "S3",
+            "tags": ["ML", "nlp"],
+            "datapackage": {
+                "licenses": [{"name": "CC-BY-4.0"}],
+                "resources": [
+                    {"path": "data/a.csv", "format": "csv"},
+                    {"path": "data/b.parquet"},
+                ],
+            },
+        }
+    )
+
+    assert values == {
+        "tag": {"ml", "nlp"},
+        "source": {"s3"},
+        "license": {"cc-by-4.0"},
+        "format": {"csv", "parquet"},
+    }
+
+
+@pytest.fixture
+def tagged_flora(flora_copy):
+    fl = Flora(flora_path=flora_copy)
+    for id, source, tags in [
+        ("s3-jobs", "s3", ["jobs", "ml"]),
+        ("git-jobs", "git", ["jobs"]),
+    ]:
+        meta = fl.herb_meta("git-data-science-job")
+        meta.update({"id": id, "source": source, "tags": tags})
+        fl.add(meta)
+
+    return fl
+
+
+def test_flora_filter(tagged_flora):
+    fl = tagged_flora
+
+    assert [h.id for h in fl.filter(tag="jobs")] == ["s3-jobs", "git-jobs"]
+    assert [h.id for h in fl.filter(tag=["ML"], source="s3")] == ["s3-jobs"]
+    assert [h.id for h in fl.filter(source="s3", format="csv")] == ["s3-jobs"]
+    assert len(fl.filter(source="git")) == len(fl.flora) - 1
+    assert fl.filter(tag="unknown") == []
+
+    with pytest.raises(Exception):
+        fl.filter(color="green")
+
+    assert FacetIndex(fl.flora).values("source") == {"git": 10, "s3": 1}
+
+
+@pytest.mark.parametrize("ranker", ["fuzzy", "bm25"])
+def test_flora_search_facets(tagged_flora, ranker):
+    fl = tagged_flora
+
+    results = fl.search("data science", ranker=ranker, facets={"tag": "jobs"})
+    assert {r["id"] for r in results} == {"s3-jobs", "git-jobs"}
+
+    results = fl.search(
+        "data science", ranker=ranker, facets={"tag": "jobs", "source": "s3"}
+    )
+    assert [r["id"] for r in results] == ["s3-jobs"]
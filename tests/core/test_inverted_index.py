@@ -0,0 +1,95 @@
+from dataherb.core.inverted_index import InvertedIndex
+from dataherb.flora import Flora
+
+
+def test_inverted_index_candidates(flora_path):
+    fl = Flora(flora_path=flora_path)
+    index = InvertedIndex()
+    assert index.sync({h.id: h.metadata for h in fl.flora})
+    assert not index.sync({h.id: h.metadata for h in fl.flora})
+
+    assert "git-data-science-job" in index.candidates(["listings"])
+    # typo tolerance from the trigrams
+    assert "git-data-science-job" in index.candidates(["lisstings"])
+    assert index.candidates(["zzzzqqq"]) == set()
+    # only the fields scored by the search are indexed
+    assert index.candidates(["salary"]) == set()
+
+    index.remove("git-data-science-job")
+    assert "git-data-science-job" not in index.candidates(["listings"])
+
+
+def test_flora_with_index(flora_copy):
+    fl = Flora(flora_path=flora_copy)
+    fl_index = Flora(flora_path=flora_copy, use_index=True)
+
+    results = fl_index.search("data science")
+    assert fl_index.index_path.exists()
+    assert [(r["id"], r["score"]) for r in results] == [
+        (r["id"], r["score"]) for r in fl.search("data science")
+    ]
+    assert "git-data-science-job" in {r["id"] for r in results}
+
+    meta = fl_index.herb_meta("git-data-science-job")
+    meta["id"] = "git-unicorn-listings"
+    meta["name"] = "unicorn listings"
+    fl_index.add(meta)
+    assert [r["id"] for r in fl_index.search("unicorn")] == ["git-unicorn-listings"]
+
+    reloaded = Flora(flora_path=flora_copy, use_index=True)
+    assert "git-unicorn-listings" in reloaded.inverted_index.candidates(["unicorn"])
+
+    reloaded.remove("git-unicorn-listings")
+    assert reloaded.search("unicorn") == []
+
+
+def test_flora_index_written_on_save(flora_copy):
+    flora_json = flora_copy.parent / "flora.json"
+    Flora(flora_path=flora_copy).export(flora_json)
+    fl = Flora(flora_path=flora_json, use_index=True)
+    fl.search("data science")
+
+    meta = fl.herb_meta("git-data-science-job")
+    meta["id"] = "git-unicorn-listings"
+    fl.add(meta)
+    assert "git-unicorn-listings" not in InvertedIndex.load(fl.index_path).herb_terms
+
+    fl.save()
+    assert "git-unicorn-listings" in InvertedIndex.load(fl.index_path).herb_terms
+
+
+def test_flora_index_shortlist(flora_copy):
+    fl_index = Flora(flora_path=flora_copy, use_index=True)
+    meta = fl_index.herb_meta("git-data-science-job")
+    meta.update({"id": "git-jobs", "tags": ["jobs"]})
+    fl_index.add(meta)
+    fl = Flora(flora_path=flora_copy)
+
+    # short keywords have too few trigrams and are scored on all the herbs
+    assert fl_index.inverted_index.candidates(["jbs"]) == set()
+    assert fl_index.inverted_index.shortlist(["jbs"]) is None
+    results = fl_index.search("jbs")
+    assert "git-jobs" in {r["id"] for r in results}
+    assert [(r["id"], r["score"]) for r in results] == [
+        (r["id"], r["score"]) for r in fl.search("jbs")
+    ]
+    assert [r["id"] for r in fl_index.iter_search("jbs")] == [
+        r["id"] for r in fl.iter_search("jbs")
+    ]
+
+    assert fl_index.inverted_index.shortlist(["listings"]) == (
+        fl_index.inverted_index.candidates(["listings"])
+    )
+
+
+def test_flora_index_written_by_folder_flora(flora_copy):
+    fl = Flora(flora_path=flora_copy, use_index=True)
+    fl.search("data science")
+
+    meta = fl.herb_meta("git-data-science-job")
+    meta["id"] = "git-unicorn-listings"
+    fl.add(meta)
+    assert "git-unicorn-listings" in InvertedIndex.load(fl.index_path).herb_terms
+
+    fl.remove("git-unicorn-listings")
+    assert "git-unicorn-listings" not in InvertedIndex.load(fl.index_path).herb_terms
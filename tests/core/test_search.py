@@ -0,0 +1,37 @@
+from dataherb.core.search import (
+    iter_search_by_keywords_in_flora,
+    search_by_keywords_in_flora,
+)
+from dataherb.flora import Flora
+
+
+def test_search_by_keywords_in_flora_limit(flora_path):
+    fl = Flora(flora_path=flora_path)
+
+    results = search_by_keywords_in_flora(fl.flora, ["dataset"], min_score=0)
+    top = search_by_keywords_in_flora(fl.flora, ["dataset"], min_score=0, limit=3)
+
+    assert top == results[:3]
+    assert search_by_keywords_in_flora(fl.flora, ["dataset"], limit=0) == []
+
+
+def test_iter_search_by_keywords_in_flora(flora_path):
+    fl = Flora(flora_path=flora_path)
+
+    matches = iter_search_by_keywords_in_flora(fl.flora, ["data science"])
+    first = next(matches)
+
+    assert first["score"] >= 50
+    assert {r["id"] for r in [first, *matches]} == {
+        r["id"] for r in search_by_keywords_in_flora(fl.flora, ["data science"])
+    }
+
+
+def test_flora_search_limit(flora_path):
+    fl = Flora(flora_path=flora_path)
+
+    results = fl.search("eu", min_score=0)
+    assert fl.search("eu", min_score=0, limit=2) == results[:2]
+    assert [r["id"] for r in fl.iter_search("eu", min_score=0)] == [
+        h.id for h in fl.flora
+    ]
@@ -0,0 +1,43 @@
+from dataherb.core.search_cache import SearchCache
+from dataherb.flora import Flora
+
+
+def test_search_cache_lru():
+    cache = SearchCache(maxsize=2)
+    cache.put("a", [{"id": "a"}])
+    cache.put("b", [{"id": "b"}])
+    assert cache.get("a") == [{"id": "a"}]
+
+    cache.put("c", [{"id": "c"}])
+    assert cache.get("b") is None
+    assert cache.get("a") == [{"id": "a"}]
+    assert cache.info() == {"hits": 2, "misses": 1, "size": 2, "maxsize": 2}
+
+
+def test_search_cache_disabled():
+    cache = SearchCache(maxsize=0)
+    cache.put("a", [])
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_flora_search_cache(flora_copy):
+    fl = Flora(flora_path=flora_copy)
+
+    results = fl.search(["data", "science"])
+    assert fl.search(["science", "data", "data"]) == results
+    assert fl.search_cache.info()["hits"] == 1
+    assert fl.search(["data", "science"], limit=1) == results[:1]
+    assert fl.search_cache.info()["misses"] == 2
+
+    version = fl.version
+    meta = fl.herb_meta("git-data-science-job")
+    meta["id"] = "git-data-science-job-copy"
+    fl.add(meta)
+
+    assert fl.version > version
+    assert len(fl.search_cache) == 0
+    assert "git-data-science-job-copy" in [
+        r["id"] for r in fl.search(["data", "science"])
+    ]
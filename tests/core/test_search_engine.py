@@ -0,0 +1,34 @@
+import pytest
+
+from dataherb.core.search import search_by_keywords_in_flora
+from dataherb.core.search_engine import FuzzySearchEngine
+from dataherb.flora import Flora
+
+
+@pytest.mark.parametrize(
+    "keywords, min_score",
+    [
+        pytest.param(["data science"], 50),
+        pytest.param(["covid", "ufo"], 50),
+        pytest.param(["eurostats freight"], 0),
+    ],
+)
+def test_fuzzy_search_engine(flora_path, keywords, min_score):
+    fl = Flora(flora_path=flora_path)
+    engine = FuzzySearchEngine(fl.flora)
+
+    expected = search_by_keywords_in_flora(fl.flora, keywords, min_score=min_score)
+    results = engine.search(keywords, min_score=min_score)
+
+    assert [(r["id"], r["score"]) for r in results] == [
+        (r["id"], r["score"]) for r in expected
+    ]
+
+
+def test_fuzzy_search_engine_limit(flora_path):
+    fl = Flora(flora_path=flora_path)
+    engine = FuzzySearchEngine(fl.flora)
+
+    results = engine.search(["dataset"], min_score=0)
+    assert engine.search(["dataset"], min_score=0, limit=3) == results[:3]
+    assert engine.search(["dataset"], limit=0) == []
@@ -0,0 +1,11 @@
+import pytest
+
+from dataherb.fetch.remote import DEFAULT_POOL_PARAMS, configure_pool
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    """start every test with new shared sessions and the default pool"""
+    configure_pool(**DEFAULT_POOL_PARAMS)
+    yield
+    configure_pool(**DEFAULT_POOL_PARAMS)
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import time
+
+import pytest
+from dataherb.fetch.async_remote import HostRateLimiter, fetch_many
+from dataherb.flora import Flora
+
+
+def test_fetch_many(http_url, http_server):
+    links = [f"{http_url}/file-{i % 5}.json" for i in range(20)]
+    links.append(f"{http_url}/missing.json")
+    http_server.failures["/file-0.json"] = 2
+
+    results = fetch_many(links, concurrency=4, backoff_factor=0)
+
+    assert [r.json() for r in results[:20]] == [{"i": i % 5} for i in range(20)]
+    assert results[20].status_code == 404
+    assert http_server.requests.count("/file-0.json") == 4 + 2
+
+
+@pytest.mark.parametrize("status", [500, 502, 504])
+def test_fetch_many_retries_server_errors(http_url, http_server, status):
+    http_server.failures["/file-3.json"] = 2
+    http_server.failure_status = status
+
+    (result,) = fetch_many([f"{http_url}/file-3.json"], backoff_factor=0)
+
+    assert result.json() == {"i": 3}
+    assert http_server.requests == ["/file-3.json"] * 3
+
+
+def test_fetch_many_retries_exhausted(http_url, http_server):
+    http_server.failures["/file-1.json"] = 5
+
+    (result,) = fetch_many([f"{http_url}/file-1.json"], retries=1, backoff_factor=0)
+
+    assert result.status_code == 503
+    assert http_server.requests == ["/file-1.json"] * 2
+
+
+def test_fetch_many_connection_error():
+    (result,) = fetch_many(["http://127.0.0.1:1/x.json"], retries=0)
+
+    assert isinstance(result, Exception)
+
+
+def test_fetch_many_in_running_loop(http_url):
+    async def main():
+        return fetch_many([f"{http_url}/file-2.json"])
+
+    (result,) = asyncio.run(main())
+
+    assert result.json() == {"i": 2}
+
+
+def test_host_rate_limiter():
+    limiter = HostRateLimiter(rate=20)
+
+    async def main():
+        await asyncio.gather(*[limiter.wait("http://a.com/x") for _ in range(5)])
+
+    start = time.monotonic()
+    asyncio.run(main())
+
+    assert time.monotonic() - start >= 4 / 20
+
+
+def test_flora_refresh_metadata(flora_copy, http_root, http_url, http_server):
+    fl = Flora(flora_path=flora_copy)
+    ids = [h.id for h in fl.flora]
+    for id in ids:
+        herb = fl.herb(id)
+        datapackage = {**herb.metadata["datapackage"], "title": f"refreshed {id}"}
+        (http_root / id).mkdir()
+        (http_root / id / "dataherb.json").write_text(
+            json.dumps({**herb.metadata, "datapackage": datapackage})
+        )
+        herb.metadata_uri = f"{http_url}/{id}/dataherb.json"
+    fl.herb(ids[0]).metadata_uri = f"{http_url}/missing/dataherb.json"
+
+    version = fl.version
+    errors = fl.refresh_metadata(concurrency=4)
+
+    assert list(errors) == [ids[0]]
+    assert fl.version > version
+    for id in ids[1:]:
+        assert fl.herb(id).datapackage.descriptor["title"] == f"refreshed {id}"
+        assert fl.herb_meta(id)["datapackage"]["title"] == f"refreshed {id}"
+        assert "datapackage" not in fl.herb_meta(id)["datapackage"]
+        assert len(fl.herb(id).resources) == len(
+            fl.herb_meta(id)["datapackage"]["resources"]
+        )
+
+    assert fl.refresh_metadata(ids=ids[1:2]) == {}
@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import json
+
+import pytest
+from yarl import URL
+
+from dataherb.fetch.compression import (
+    StreamDecompressor,
+    available_suffixes,
+    compress,
+    decompress,
+)
+from dataherb.fetch.download import download_file
+from dataherb.fetch.http_cache import HTTPCache
+from dataherb.flora import Flora
+
+CONTENT = b"a,b\n" + b"".join(f"{i},{i * i}\n".encode() for i in range(5000))
+
+
+@pytest.mark.parametrize("suffix", [".gz", ".zst"])
+def test_stream_decompressor(suffix):
+    if suffix == ".zst":
+        pytest.importorskip("zstandard")
+    compressed = compress(CONTENT, suffix)
+    assert decompress(compressed, suffix) == CONTENT
+
+    decompressor = StreamDecompressor(suffix)
+    chunks = [
+        decompressor.decompress(compressed[i : i + 100])
+        for i in range(0, len(compressed), 100)
+    ]
+    assert b"".join(chunks) + decompressor.flush() == CONTENT
+
+
+def test_stream_decompressor_gzip_members():
+    compressed = gzip.compress(b"abc") + gzip.compress(b"def")
+    assert decompress(compressed, ".gz") == b"abcdef"
+
+    with pytest.raises(Exception):
+        decompress(compressed[:-4], ".gz")
+    with pytest.raises(Exception):
+        compress(CONTENT, ".bz2")
+
+
+def test_download_sibling(tmp_path, http_root, http_url, http_server):
+    suffix = available_suffixes()[0]
+    (http_root / "data.csv").write_bytes(CONTENT)
+    (http_root / f"data.csv{suffix}").write_bytes(compress(CONTENT, suffix))
+    md5 = hashlib.md5(CONTENT).hexdigest()
+
+    destination = download_file(
+        f"{http_url}/data.csv",
+        tmp_path / "data.csv",
+        bytes=len(CONTENT),
+        hash=md5,
+        siblings=True,
+    )
+    assert destination.read_bytes() == CONTENT
+    assert http_server.requests == [f"/data.csv{suffix}"]
+
+    # no sibling is published
+    (http_root / "plain.csv").write_bytes(CONTENT)
+    download_file(f"{http_url}/plain.csv", tmp_path / "plain.csv", siblings=True)
+    assert (tmp_path / "plain.csv").read_bytes() == CONTENT
+    assert http_server.requests[-1] == "/plain.csv"
+
+
+def test_accept_encoding(tmp_path, http_root, http_url, http_server):
+    (http_root / "data.csv").write_bytes(CONTENT)
+    download_file(f"{http_url}/data.csv", tmp_path / "data.csv")
+    assert "gzip" in http_server.request_headers[-1]["Accept-Encoding"]
+
+    (tmp_path / "more.csv.part").write_bytes(CONTENT[:100])
+    download_file(f"{http_url}/data.csv", tmp_path / "more.csv")
+    assert http_server.request_headers[-1]["Accept-Encoding"] == "identity"
+    assert (tmp_path / "more.csv").read_bytes() == CONTENT
+
+
+def test_remote_flora_sibling(tmp_path, flora_path, http_root, http_url, http_server):
+    herbs = [
+        json.loads((p / "dataherb.json").read_text())
+        for p in sorted(flora_path.iterdir())
+        if (p / "dataherb.json").exists()
+    ]
+    (http_root / "flora.json").write_text(json.dumps(herbs))
+    aggregated = Flora(flora_path=http_root / "flora.json", is_aggregated=True)
+    aggregated.save(compression=[".gz"])
+    content = (http_root / "flora.json").read_bytes()
+    assert decompress((http_root / "flora.json.gz").read_bytes(), ".gz") == content
+
+    cache = tmp_path / "workdir"
+    remote = Flora(flora_path=URL(f"{http_url}/flora.json"), workdir=cache)
+    assert len(remote.flora) == len(json.loads(content))
+    assert http_server.requests[-1] == "/flora.json.gz"
+
+    # cached compressed, and used first the next time
+    http_server.requests.clear()
+    remote = Flora(
+        flora_path=URL(f"{http_url}/flora.json"), workdir=cache, cache_max_age=60
+    )
+    assert len(remote.flora) == len(json.loads(content))
+    assert http_server.requests == []
+
+    # the sibling is removed when it is no longer saved
+    aggregated.save(compression=[])
+    assert not (http_root / "flora.json.gz").exists()
+    assert (
+        HTTPCache(cache / ".cache" / "http").get(
+            f"{http_url}/flora.json", siblings=True
+        )
+        == (http_root / "flora.json").read_bytes()
+    )
+
+
+def test_http_cache_missing_siblings(tmp_path, http_root, http_url, http_server):
+    cache = HTTPCache(tmp_path / "cache")
+    url = f"{http_url}/flora.json"
+    (http_root / "flora.json").write_bytes(CONTENT)
+    assert cache.get(url, siblings=True) == CONTENT
+    assert http_server.requests == [
+        f"/flora.json{suffix}" for suffix in available_suffixes()
+    ] + ["/flora.json"]
+
+    # the missing siblings are not looked up again
+    http_server.requests.clear()
+    assert cache.get(url, siblings=True) == CONTENT
+    assert http_server.requests == ["/flora.json"]
+
+    # siblings published with a new version are looked up and used
+    content = CONTENT + b"5000,25000000\n"
+    (http_root / "flora.json").write_bytes(content)
+    (http_root / "flora.json.gz").write_bytes(compress(content, ".gz"))
+    assert cache.get(url, siblings=True) == content
+    http_server.requests.clear()
+    assert cache.get(url, siblings=True) == content
+    assert http_server.requests == ["/flora.json.gz"]
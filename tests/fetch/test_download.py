@@ -0,0 +1,221 @@
+import hashlib
+import json
+
+import pytest
+import requests
+
+from dataherb.cache.resource_cache import ResourceCache
+from dataherb.core.base import Herb
+from dataherb.fetch.download import (
+    download_file,
+    download_segmented,
+    part_path,
+    verify_file,
+)
+
+CONTENT = bytes(range(256)) * 4096
+
+
+@pytest.fixture
+def big_file(http_root):
+    (http_root / "big.bin").write_bytes(CONTENT)
+    return "/big.bin"
+
+
+def test_download_file(tmp_path, http_url, big_file):
+    destination = tmp_path / "data" / "big.bin"
+    hash = f"sha256:{hashlib.sha256(CONTENT).hexdigest()}"
+
+    download_file(f"{http_url}{big_file}", destination, bytes=len(CONTENT), hash=hash)
+
+    assert destination.read_bytes() == CONTENT
+    assert not part_path(destination).exists()
+    verify_file(destination, bytes=len(CONTENT), hash=hash)
+
+
+def test_download_file_resume(tmp_path, http_url, http_server, big_file):
+    destination = tmp_path / "big.bin"
+    http_server.cutoffs[big_file] = 300000
+
+    with pytest.raises(requests.RequestException):
+        download_file(f"{http_url}{big_file}", destination, chunk_size=1024)
+    assert not destination.exists()
+    assert 0 < part_path(destination).stat().st_size <= 300000
+
+    download_file(
+        f"{http_url}{big_file}",
+        destination,
+        hash=hashlib.md5(CONTENT).hexdigest(),
+    )
+
+    assert destination.read_bytes() == CONTENT
+    assert http_server.request_headers[-1]["Range"].startswith("bytes=")
+
+
+def test_download_file_without_ranges(tmp_path, http_url, http_server, big_file):
+    http_server.ranges = False
+    destination = tmp_path / "big.bin"
+    part_path(destination).write_bytes(b"stale")
+
+    download_file(f"{http_url}{big_file}", destination, bytes=len(CONTENT))
+
+    assert destination.read_bytes() == CONTENT
+
+
+def test_download_file_complete_part(tmp_path, http_url, big_file):
+    destination = tmp_path / "big.bin"
+    part_path(destination).write_bytes(CONTENT)
+
+    download_file(f"{http_url}{big_file}", destination, bytes=len(CONTENT))
+
+    assert destination.read_bytes() == CONTENT
+
+
+@pytest.mark.parametrize(
+    "checks",
+    [
+        pytest.param({"bytes": 10}, id="bytes"),
+        pytest.param({"hash": "md5:" + "0" * 32}, id="hash"),
+    ],
+)
+def test_download_file_verification(tmp_path, http_url, big_file, checks):
+    destination = tmp_path / "big.bin"
+
+    with pytest.raises(Exception):
+        download_file(f"{http_url}{big_file}", destination, **checks)
+
+    assert not destination.exists()
+    assert not part_path(destination).exists()
+
+
+def test_herb_get_resource_remote(tmp_path, http_root, http_url, monkeypatch):
+    (http_root / "dataset").mkdir()
+    (http_root / "dataset" / "data.csv").write_text("a,b\n1,2\n")
+    (http_root / "dataset" / "other.csv").write_text("c\n3\n")
+    herb = Herb(
+        {
+            "id": "remote-herb",
+            "source": "git",
+            "metadata_uri": f"{http_url}/dataherb.json",
+            "datapackage": {
+                "name": "remote-herb",
+                "resources": [
+                    {
+                        "name": "data",
+                        "path": "dataset/data.csv",
+                        "format": "csv",
+                        "bytes": 8,
+                        "hash": hashlib.md5(b"a,b\n1,2\n").hexdigest(),
+                    },
+                    {"name": "other", "path": "dataset/other.csv", "format": "csv"},
+                ],
+            },
+        },
+        base_path=tmp_path / "remote-herb",
+    )
+    monkeypatch.setattr(ResourceCache, "default", classmethod(lambda cls: None))
+
+    assert herb.resource_url("dataset/data.csv") == f"{http_url}/dataset/data.csv"
+    assert not herb.is_local
+    # without a cache, the remote file is read and the herb folder is untouched
+    resource = herb.get_resource(0, source_only=False)
+    assert resource.source == f"{http_url}/dataset/data.csv"
+    assert resource.read() == [["1", "2"]]
+    assert not (tmp_path / "remote-herb").exists()
+
+    path = herb.download_resource(0)
+    assert path == tmp_path / "remote-herb" / "dataset" / "data.csv"
+    assert path.read_text() == "a,b\n1,2\n"
+    # the other resource is not in the folder, so it is still remote
+    assert herb.get_resource(1) == f"{http_url}/dataset/other.csv"
+    assert herb.get_resource(0) == str(path)
+
+
+def test_download_segmented(tmp_path, http_url, http_server, big_file):
+    destination = tmp_path / "big.bin"
+    reports = []
+
+    download_segmented(
+        f"{http_url}{big_file}",
+        destination,
+        bytes=len(CONTENT),
+        hash=hashlib.md5(CONTENT).hexdigest(),
+        workers=4,
+        segment_size=100000,
+        progress=lambda p: reports.append(p.report()),
+    )
+
+    assert destination.read_bytes() == CONTENT
+    assert not part_path(destination).exists()
+    assert reports[-1]["downloaded"] == len(CONTENT)
+    assert reports[-1]["total"] == len(CONTENT)
+    ranges = [h["Range"] for h in http_server.request_headers]
+    assert len(ranges) == 1 + 11
+    assert "bytes=1000000-1048575" in ranges
+
+
+def test_download_segmented_retries(tmp_path, http_url, http_server, big_file):
+    destination = tmp_path / "big.bin"
+    reports = []
+    http_server.cutoffs[big_file] = 5000
+
+    download_segmented(
+        f"{http_url}{big_file}",
+        destination,
+        workers=1,
+        segment_size=len(CONTENT),
+        backoff_factor=0,
+        chunk_size=1024,
+        progress=lambda p: reports.append(p.report()),
+    )
+
+    assert destination.read_bytes() == CONTENT
+    assert reports[-1]["retries"] == 1
+    assert http_server.request_headers[-1]["Range"].startswith("bytes=")
+    assert http_server.request_headers[-1]["Range"] != "bytes=0-1048575"
+
+
+def test_download_segmented_without_ranges(tmp_path, http_url, http_server, big_file):
+    http_server.ranges = False
+    destination = tmp_path / "big.bin"
+
+    download_segmented(f"{http_url}{big_file}", destination, bytes=len(CONTENT))
+
+    assert destination.read_bytes() == CONTENT
+    assert "Range" not in http_server.request_headers[-1]
+
+
+def test_download_segmented_verification(tmp_path, http_url, big_file):
+    destination = tmp_path / "big.bin"
+
+    with pytest.raises(Exception):
+        download_segmented(f"{http_url}{big_file}", destination, hash="md5:" + "0" * 32)
+
+    assert not destination.exists()
+    assert not part_path(destination).exists()
+
+
+def test_herb_get_resource_cache(tmp_path, http_root, http_url, http_server):
+    (http_root / "data.csv").write_text("a,b\n1,2\n")
+    herb = Herb(
+        {
+            "id": "remote-herb",
+            "source": "git",
+            "metadata_uri": f"{http_url}/dataherb.json",
+            "datapackage": {
+                "name": "remote-herb",
+                "resources": [{"name": "data", "path": "data.csv", "format": "csv"}],
+            },
+        },
+        base_path=tmp_path / "remote-herb",
+    )
+    cache = ResourceCache(tmp_path / "cache")
+
+    for _ in range(2):
+        resource = herb.get_resource(0, source_only=False, cache=cache)
+        assert resource.read() == [["1", "2"]]
+
+    assert http_server.requests == ["/data.csv"]
+    assert not herb.is_local
+    assert cache.stats()["hits"] == 1
+    assert cache.entries()[0]["urls"] == [f"{http_url}/data.csv"]
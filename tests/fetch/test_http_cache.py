@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+from yarl import URL
+
+from dataherb.fetch.http_cache import HTTPCache
+from dataherb.flora import Flora
+
+
+def test_http_cache_etag(tmp_path, http_root, http_url, http_server):
+    cache = HTTPCache(tmp_path / "cache")
+    url = f"{http_url}/file-0.json"
+
+    assert cache.get(url) == b'{"i": 0}'
+    assert cache.get(url) == b'{"i": 0}'
+    assert "If-None-Match" in http_server.request_headers[1]
+
+    (http_root / "file-0.json").write_text('{"i": 10}')
+    assert cache.get(url) == b'{"i": 10}'
+    assert cache.cached(url)["body"] == b'{"i": 10}'
+
+
+def test_http_cache_last_modified(tmp_path, http_root, http_url, http_server):
+    http_server.etags = False
+    cache = HTTPCache(tmp_path / "cache")
+    url = f"{http_url}/file-1.json"
+
+    assert cache.get(url) == b'{"i": 1}'
+    # a different body with the same modification time is not refetched
+    mtime = os.stat(http_root / "file-1.json").st_mtime
+    (http_root / "file-1.json").write_text('{"i": 11}')
+    os.utime(http_root / "file-1.json", (mtime, mtime))
+
+    assert cache.get(url) == b'{"i": 1}'
+    assert "If-Modified-Since" in http_server.request_headers[1]
+
+
+def test_http_cache_max_age(tmp_path, http_url, http_server):
+    cache = HTTPCache(tmp_path / "cache")
+    url = f"{http_url}/file-2.json"
+
+    cache.get(url)
+    http_server.shutdown()
+
+    assert cache.get(url, max_age=60) == b'{"i": 2}'
+    assert len(http_server.requests) == 1
+
+
+def test_http_cache_offline(tmp_path, http_url, http_server):
+    cache = HTTPCache(tmp_path / "cache", retry_params={"retries": 0})
+    url = f"{http_url}/file-3.json"
+    cache.get(url)
+    with pytest.raises(Exception):
+        cache.get(f"{http_url}/missing.json")
+
+    http_server.shutdown()
+    http_server.server_close()
+    assert cache.get(url) == b'{"i": 3}'
+    with pytest.raises(Exception):
+        cache.get(f"{http_url}/file-4.json")
+
+    for path in cache.path.iterdir():
+        path.write_bytes(path.read_bytes().replace(b"file-3.json", b"missing"))
+    assert cache.cached(url) is None
+
+
+def test_remote_flora_cache(tmp_path, flora_path, http_root, http_url, http_server):
+    herbs = [
+        json.loads((p / "dataherb.json").read_text())
+        for p in sorted(flora_path.iterdir())
+        if (p / "dataherb.json").exists()
+    ]
+    (http_root / "flora.json").write_text(json.dumps(herbs))
+
+    fl = Flora(flora_path=URL(f"{http_url}/flora.json"), workdir=tmp_path)
+    assert len(fl.flora) == len(herbs)
+    assert fl.workdir == tmp_path
+    assert fl.flora[0].base_path == tmp_path / herbs[0]["id"]
+
+    fl = Flora(flora_path=URL(f"{http_url}/flora.json"), workdir=tmp_path)
+    assert len(fl.flora) == len(herbs)
+    # precompressed siblings are not published, and are only looked up once
+    assert http_server.requests.count("/flora.json") == 2
+    assert http_server.requests.count("/flora.json.gz") == 1
+    requests = len(http_server.requests)
+
+    fl = Flora(
+        flora_path=URL(f"{http_url}/flora.json"), workdir=tmp_path, cache_max_age=60
+    )
+    assert len(fl.flora) == len(herbs)
+    assert len(http_server.requests) == requests
+
+    fl.export(tmp_path / "exported.json")
+    assert len(Flora(flora_path=tmp_path / "exported.json").flora) == len(herbs)
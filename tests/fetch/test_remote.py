@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from dataherb.fetch.remote import (
+    configure_pool,
+    get_data_from_url,
+    get_session,
+    new_session,
+)
+
+
+def test_get_session_is_shared():
+    assert get_session() is get_session()
+    assert get_session() is get_session({"retries": 5})
+    assert get_session({"retries": 1}) is not get_session()
+
+
+def test_get_data_from_url_reuses_connections(http_url, http_server):
+    for i in range(5):
+        assert get_data_from_url(f"{http_url}/file-{i}.json").json() == {"i": i}
+
+    assert len(http_server.connections) == 1
+
+
+def test_get_data_from_url_threads(http_url, http_server):
+    configure_pool(pool_maxsize=2, pool_block=True)
+    results = {}
+
+    def fetch(i):
+        results[i] = get_data_from_url(f"{http_url}/file-{i % 5}.json").json()
+
+    threads = [threading.Thread(target=fetch, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == {i: {"i": i % 5} for i in range(20)}
+    assert len(http_server.connections) <= 2
+
+
+def test_unpooled_session(http_url, http_server):
+    for i in range(3):
+        with new_session() as session:
+            get_data_from_url(f"{http_url}/file-{i}.json", session=session)
+
+    assert len(http_server.connections) == 3
+
+    with pytest.raises(Exception):
+        configure_pool(pool_size=3)
@@ -0,0 +1,161 @@
+import json
+
+import git
+import pytest
+from click.testing import CliRunner
+
+from dataherb.cache.blob_store import BlobStore
+from dataherb.cmd.download import (
+    CLONE_MODES,
+    clone_herb,
+    download_herbs,
+    summary_table,
+)
+from dataherb.command import dataherb
+from dataherb.core.base import Herb
+
+SHARED = "code,country\nDE,Germany\nFR,France\n"
+
+
+@pytest.fixture
+def remotes(tmp_path):
+    """bare git repositories of three herbs, and their flora"""
+    flora = tmp_path / "flora"
+    for i in range(3):
+        id = f"herb-{i}"
+        work = tmp_path / "src" / id
+        work.mkdir(parents=True)
+        repo = git.Repo.init(work)
+        (work / "countries.csv").write_text(SHARED)
+        (work / "data.csv").write_text("a,b\n" + "1,2\n" * (i + 1))
+        repo.index.add(["countries.csv", "data.csv"])
+        repo.index.commit("add data")
+        bare = tmp_path / "remotes" / f"{id}.git"
+        repo.clone(bare, bare=True)
+
+        (flora / id).mkdir(parents=True)
+        (flora / id / "dataherb.json").write_text(
+            json.dumps(
+                {
+                    "id": id,
+                    "name": id,
+                    "source": "git",
+                    "uri": str(bare),
+                    "tags": ["geo"] if i < 2 else ["other"],
+                    "datapackage": {"name": id, "resources": []},
+                }
+            )
+        )
+
+    return flora
+
+
+def test_download_herbs(tmp_path, remotes):
+    herbs = [
+        Herb(
+            json.loads((remotes / f"herb-{i}" / "dataherb.json").read_text()),
+            base_path=tmp_path,
+        )
+        for i in range(3)
+    ]
+    herbs.append(
+        Herb({"id": "broken", "uri": str(tmp_path / "missing.git")}, base_path=tmp_path)
+    )
+    workdir = tmp_path / "workdir"
+    events = []
+    store = BlobStore(workdir / ".cache" / "blobs", mode="hardlink")
+    (tmp_path / "known.csv").write_text(SHARED)
+    store.add(tmp_path / "known.csv")
+
+    results = download_herbs(
+        herbs,
+        workdir,
+        workers=2,
+        blob_store=store,
+        progress=lambda id, message, fraction: events.append((id, message)),
+        dedupe=True,
+    )
+    assert [r["id"] for r in results] == ["herb-0", "herb-1", "herb-2", "broken"]
+    assert [r["status"] for r in results] == ["ok", "ok", "ok", "failed"]
+    assert (workdir / "herb-2" / "data.csv").read_text() == "a,b\n" + "1,2\n" * 3
+    assert ("broken", "failed") in events
+    # the file that is in the store is linked to the blob
+    inodes = {(workdir / f"herb-{i}" / "countries.csv").stat().st_ino for i in range(3)}
+    assert inodes == {(tmp_path / "known.csv").stat().st_ino}
+    # the other files are left as they are
+    data = (workdir / "herb-0" / "data.csv").stat()
+    assert data.st_nlink == 1
+    assert data.st_mode & 0o200
+
+    results = download_herbs(herbs[:3], workdir, workers=2)
+    assert [r["action"] for r in results] == ["pull"] * 3
+    assert all(r["status"] == "ok" for r in results)
+    summary_table(results)
+
+
+def test_download_command(tmp_path, remotes):
+    workdir = tmp_path / "workdir"
+    runner = CliRunner()
+    args = ["download", "-f", str(remotes), "-w", str(workdir), "--no-pull"]
+
+    result = runner.invoke(dataherb, args + ["--tag", "geo"])
+    assert result.exit_code == 0, result.output
+    assert sorted(p.name for p in workdir.iterdir() if not p.name.startswith(".")) == [
+        "herb-0",
+        "herb-1",
+    ]
+
+    # new downloads are not deduplicated by default
+    assert (workdir / "herb-0" / "countries.csv").stat().st_mode & 0o200
+
+    result = runner.invoke(dataherb, args + ["herb-2", "herb-0", "--dedupe"])
+    assert result.exit_code == 0, result.output
+    assert (workdir / "herb-2" / "countries.csv").read_text() == SHARED
+    assert "skip" in result.output
+
+    result = runner.invoke(dataherb, args + ["missing"])
+    assert result.exit_code == 1
+
+
+@pytest.fixture
+def history_remote(tmp_path):
+    """a bare repository whose data file has several versions"""
+    work = tmp_path / "src" / "history"
+    (work / "dataset").mkdir(parents=True)
+    repo = git.Repo.init(work)
+    for i in range(3):
+        (work / "dataset" / "data.csv").write_text("a,b\n" + f"{i},{i}\n" * 100)
+        (work / "extra.bin").write_bytes(bytes([i]) * 1000)
+        repo.index.add(["dataset/data.csv", "extra.bin"])
+        repo.index.commit(f"version {i}")
+    bare = tmp_path / "remotes" / "history.git"
+    repo.clone(bare, bare=True)
+    git.Repo(bare).git.config("uploadpack.allowFilter", "true")
+
+    return Herb(
+        {
+            "id": "history",
+            "uri": str(bare),
+            "datapackage": {
+                "name": "history",
+                "resources": [{"name": "data", "path": "dataset/data.csv"}],
+            },
+        },
+        base_path=tmp_path,
+    )
+
+
+@pytest.mark.parametrize("mode", CLONE_MODES)
+def test_clone_modes(tmp_path, history_remote, mode):
+    destination = tmp_path / "clones" / mode
+    repo = clone_herb(history_remote, destination, mode=mode)
+
+    assert (destination / "dataset" / "data.csv").read_text().startswith("a,b\n2,2")
+    assert (destination / "extra.bin").exists() == (mode != "sparse")
+    commits = int(repo.git.rev_list("--count", "HEAD"))
+    assert commits == (1 if mode == "shallow" else 3)
+    if mode in ("blobless", "sparse"):
+        assert repo.git.config("remote.origin.partialclonefilter") == "blob:none"
+
+    with pytest.raises(Exception):
+        clone_herb(history_remote, tmp_path / "clones" / "unknown", mode="unknown")
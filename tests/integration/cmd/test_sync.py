@@ -0,0 +1,237 @@
+import hashlib
+import json
+import shutil
+
+import git
+import pytest
+from click.testing import CliRunner
+
+from dataherb.cmd import sync
+from dataherb.cmd.sync import SYNC_MANIFEST, load_manifest, sync_herb, sync_table
+from dataherb.command import dataherb
+from dataherb.core.base import Herb
+
+
+def _publish(root, files):
+    """write the files and the dataherb.json that describes them"""
+    root.mkdir(parents=True, exist_ok=True)
+    resources = []
+    for path, content in files.items():
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_bytes(content)
+        resources.append(
+            {
+                "name": path.split("/")[-1].split(".")[0],
+                "path": path,
+                "bytes": len(content),
+                "hash": hashlib.md5(content).hexdigest(),
+            }
+        )
+    (root / "dataherb.json").write_text(
+        json.dumps({"id": "synced", "datapackage": {"resources": resources}})
+    )
+
+
+FILES = {"dataset/a.csv": b"a\n1\n", "dataset/b.csv": b"b\n2\n"}
+
+
+def test_sync_git(tmp_path, http_root, http_url, http_server):
+    _publish(http_root / "synced", FILES)
+    herb = Herb(
+        {
+            "id": "synced",
+            "source": "git",
+            "metadata_uri": f"{http_url}/synced/dataherb.json",
+        },
+        base_path=tmp_path,
+    )
+    folder = tmp_path / "synced"
+
+    result = sync_herb(herb, folder)
+    assert sorted(result["updated"]) == sorted(FILES)
+    assert (folder / "dataset" / "a.csv").read_bytes() == FILES["dataset/a.csv"]
+    assert set(load_manifest(folder)["resources"]) == set(FILES)
+    assert json.loads((folder / "dataherb.json").read_text())["id"] == "synced"
+
+    http_server.requests.clear()
+    result = sync_herb(herb, folder)
+    assert result["updated"] == []
+    assert http_server.requests == ["/synced/dataherb.json"]
+
+    # only the changed resource is transferred
+    _publish(http_root / "synced", {**FILES, "dataset/b.csv": b"b\n3\n"})
+    http_server.requests.clear()
+    assert sync_herb(herb, folder, dry_run=True)["updated"] == ["dataset/b.csv"]
+    result = sync_herb(herb, folder)
+    assert result["updated"] == ["dataset/b.csv"]
+    assert http_server.requests == ["/synced/dataherb.json"] * 2 + [
+        "/synced/dataset/b.csv"
+    ]
+    assert (folder / "dataset" / "b.csv").read_bytes() == b"b\n3\n"
+    sync_table("synced", result)
+
+    # a missing local file is transferred again
+    (folder / "dataset" / "a.csv").unlink()
+    assert sync_herb(herb, folder)["updated"] == ["dataset/a.csv"]
+
+
+def test_sync_failure_and_removal(tmp_path, http_root, http_url):
+    _publish(http_root / "synced", FILES)
+    herb = Herb(
+        {
+            "id": "synced",
+            "source": "git",
+            "metadata_uri": f"{http_url}/synced/dataherb.json",
+        },
+        base_path=tmp_path,
+    )
+    folder = tmp_path / "synced"
+    sync_herb(herb, folder)
+    before = load_manifest(folder)["resources"]
+
+    # the published file does not match its descriptor
+    _publish(http_root / "synced", {**FILES, "dataset/a.csv": b"a\n9\n"})
+    (http_root / "synced" / "dataset" / "a.csv").write_bytes(b"a\n8\n")
+    result = sync_herb(herb, folder)
+    assert list(result["failed"]) == ["dataset/a.csv"]
+    assert (
+        load_manifest(folder)["resources"]["dataset/a.csv"] == before["dataset/a.csv"]
+    )
+    assert (folder / "dataset" / "a.csv").read_bytes() == FILES["dataset/a.csv"]
+
+    _publish(http_root / "synced", {"dataset/b.csv": FILES["dataset/b.csv"]})
+    result = sync_herb(herb, folder)
+    assert result["removed"] == ["dataset/a.csv"]
+    assert (folder / "dataset" / "a.csv").exists()
+    result = sync_herb(herb, folder, delete=True)
+    assert result["removed"] == ["dataset/a.csv"]
+    assert not (folder / "dataset" / "a.csv").exists()
+    assert list(load_manifest(folder)["resources"]) == ["dataset/b.csv"]
+    assert not list(folder.glob(f".{SYNC_MANIFEST}.*"))
+
+
+def test_sync_s3(tmp_path, monkeypatch):
+    bucket = tmp_path / "bucket"
+    _publish(bucket / "synced", FILES)
+    copies = []
+
+    def aws_cli(cmd):
+        assert cmd[:2] == ("s3", "cp")
+        copies.append(cmd[-2])
+        shutil.copyfile(cmd[-2].replace("s3://bucket", str(bucket)), cmd[-1])
+
+    monkeypatch.setattr(sync, "_aws_cli", aws_cli)
+    herb = Herb(
+        {"id": "synced", "source": "s3", "uri": "s3://bucket/synced/"},
+        base_path=tmp_path,
+    )
+    folder = tmp_path / "local" / "synced"
+
+    assert sorted(sync_herb(herb, folder)["updated"]) == sorted(FILES)
+    assert (folder / "dataset" / "b.csv").read_bytes() == FILES["dataset/b.csv"]
+
+    copies.clear()
+    _publish(bucket / "synced", {**FILES, "dataset/a.csv": b"a\n2\n"})
+    assert sync_herb(herb, folder)["updated"] == ["dataset/a.csv"]
+    assert copies == [
+        "s3://bucket/synced/dataherb.json",
+        "s3://bucket/synced/dataset/a.csv",
+    ]
+
+    with pytest.raises(Exception):
+        sync_herb(Herb({"id": "x", "source": "ftp"}, base_path=tmp_path), folder)
+
+
+def test_sync_command(tmp_path, http_root, http_url):
+    _publish(http_root / "synced", FILES)
+    flora = tmp_path / "flora"
+    (flora / "synced").mkdir(parents=True)
+    (flora / "synced" / "dataherb.json").write_text(
+        json.dumps(
+            {
+                "id": "synced",
+                "source": "git",
+                "metadata_uri": f"{http_url}/synced/dataherb.json",
+                "datapackage": {"resources": []},
+            }
+        )
+    )
+    args = ["sync", "synced", "-f", str(flora), "-w", str(tmp_path / "workdir")]
+
+    result = CliRunner().invoke(dataherb, args + ["--dry-run"])
+    assert result.exit_code == 0, result.output
+    assert not (tmp_path / "workdir" / "synced").exists()
+
+    result = CliRunner().invoke(dataherb, args)
+    assert result.exit_code == 0, result.output
+    assert "updated" in result.output
+    assert (tmp_path / "workdir" / "synced" / SYNC_MANIFEST).exists()
+
+
+def test_sync_existing_files(tmp_path, http_root, http_url, http_server):
+    _publish(http_root / "synced", FILES)
+    herb = Herb(
+        {
+            "id": "synced",
+            "source": "git",
+            "metadata_uri": f"{http_url}/synced/dataherb.json",
+        },
+        base_path=tmp_path,
+    )
+    folder = tmp_path / "synced"
+    _publish(folder, {**FILES, "dataset/b.csv": b"b\n0\n"})
+
+    # files that match their descriptors are not transferred on the first sync
+    http_server.requests.clear()
+    result = sync_herb(herb, folder)
+    assert result["unchanged"] == ["dataset/a.csv"]
+    assert result["updated"] == ["dataset/b.csv"]
+    assert http_server.requests == ["/synced/dataherb.json", "/synced/dataset/b.csv"]
+    assert set(load_manifest(folder)["resources"]) == set(FILES)
+
+
+def test_sync_git_checkout(tmp_path):
+    source = tmp_path / "source"
+    _publish(source, FILES)
+    repo = git.Repo.init(source)
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "test")
+        config.set_value("user", "email", "test@example.com")
+    repo.git.add(A=True)
+    repo.git.commit(m="publish")
+    folder = tmp_path / "workdir" / "synced"
+    git.Repo.clone_from(str(source), str(folder))
+    sparse = tmp_path / "sparse"
+    checkout = git.Repo.clone_from(str(source), str(sparse), no_checkout=True)
+    checkout.git.sparse_checkout("set", "--no-cone", "/dataherb.json")
+    checkout.git.checkout()
+    herb = Herb({"id": "synced", "source": "git"}, base_path=tmp_path)
+
+    _publish(source, {**FILES, "dataset/b.csv": b"b\n0\n"})
+    repo.git.add(A=True)
+    repo.git.commit(m="update")
+
+    # checkouts are pulled instead of transferring the files
+    result = sync_herb(herb, folder, dry_run=True)
+    assert result["updated"] == ["dataherb.json", "dataset/b.csv"]
+    assert (folder / "dataset" / "b.csv").read_bytes() == FILES["dataset/b.csv"]
+
+    result = sync_herb(herb, folder)
+    assert result["updated"] == ["dataherb.json", "dataset/b.csv"]
+    assert result["unchanged"] == ["dataset/a.csv"]
+    assert (folder / "dataset" / "b.csv").read_bytes() == b"b\n0\n"
+    assert not (folder / SYNC_MANIFEST).exists()
+
+    # the sparse checkout is extended to the resources of the datapackage
+    assert not (sparse / "dataset").exists()
+    sync_herb(herb, sparse)
+    assert (sparse / "dataset" / "b.csv").read_bytes() == b"b\n0\n"
+
+    flora = tmp_path / "flora"
+    (flora / "synced").mkdir(parents=True)
+    (flora / "synced" / "dataherb.json").write_text(json.dumps(herb.metadata))
+    result = CliRunner().invoke(
+        dataherb,
+        ["sync", "synced", "-f", str(flora), "-w", str(tmp_path / "workdir")],
+    )
+    assert result.exit_code == 0, result.output
@@ -1,3 +1,5 @@
+import pytest
+
 from dataherb.flora import Flora
 
 
@@ -36,3 +38,76 @@ def test_flora_herb_by_id(flora_path):
         "published_at",
         "id",
     }
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_flora_parallel_load(flora_path, use_processes):
+    fl = Flora(flora_path=flora_path)
+    fl_parallel = Flora(flora_path=flora_path, workers=2, use_processes=use_processes)
+
+    assert [h.id for h in fl_parallel.flora] == [h.id for h in fl.flora]
+
+
+def test_flora_lazy_hydration(flora_path):
+    fl = Flora(flora_path=flora_path)
+
+    assert not any(h.is_hydrated for h in fl.flora)
+
+    hb = fl.herb("git-data-science-job")
+    assert len(hb.datapackage.resources) == 2
+    assert hb.is_hydrated
+    assert [h.id for h in fl.flora if h.is_hydrated] == ["git-data-science-job"]
+
+
+def test_flora_herbs(flora_path):
+    fl = Flora(flora_path=flora_path)
+
+    herbs = fl.herbs(["git-data-science-job", "dataset-eu-nuts", "not-a-herb"])
+
+    assert set(herbs) == {"git-data-science-job", "dataset-eu-nuts"}
+    assert herbs["dataset-eu-nuts"].id == "dataset-eu-nuts"
+    assert fl.herb("not-a-herb") is None
+    assert not fl.duplicate_ids
+
+
+def test_flora_add_remove_index(flora_copy):
+    fl = Flora(flora_path=flora_copy)
+    meta = fl.herb_meta("git-data-science-job")
+    meta["id"] = "git-data-science-job-copy"
+
+    fl.add(meta)
+    assert fl.herb("git-data-science-job-copy").id == "git-data-science-job-copy"
+    with pytest.raises(Exception):
+        fl.add(meta)
+
+    herbs = fl.flora
+    fl.remove("git-data-science-job-copy")
+    assert fl.herb("git-data-science-job-copy") is None
+    assert fl.flora is herbs
+    assert "git-data-science-job-copy" not in [h.id for h in fl.flora]
+    assert not (flora_copy / "git-data-science-job-copy").exists()
+
+
+def test_flora_find_by_field(flora_path):
+    fl = Flora(flora_path=flora_path)
+
+    found = fl.find_by_field("Salary")
+    assert [r["id"] for r in found] == [
+        "git-dataherb-python-demo-dataset",
+        "git-data-science-job",
+    ]
+    assert found[0]["fields"] == [
+        {
+            "resource": "indeed_job_listing",
+            "path": "dataset/indeed_job_listing.csv",
+            "name": "salary",
+            "type": "string",
+        }
+    ]
+    assert not any(h.is_hydrated for h in fl.flora)
+
+    assert [r["id"] for r in fl.find_by_field("nuts_level", type="integer")] == [
+        "dataset-eu-nuts"
+    ]
+    assert [len(r["fields"]) for r in fl.find_by_field("nuts_level")] == [6]
+    assert fl.find_by_field("salary", type="number") == []
@@ -0,0 +1,57 @@
+from dataherb.flora import Flora
+from dataherb.multi_flora import MultiFlora, discover_floras
+
+
+def test_multi_flora_search(flora_copy):
+    workdir = flora_copy.parent.parent
+    Flora(flora_path=flora_copy).export(workdir / "flora" / "demo-flora-sqlite.db")
+    Flora(flora_path=flora_copy, use_snapshot=True)
+
+    floras = discover_floras(workdir)
+    assert set(floras) == {"demo-flora", "demo-flora-sqlite"}
+
+    mf = MultiFlora(floras)
+    results = mf.search("data science", min_score=0)
+
+    scores = [r["score"] for r in results]
+    assert scores == sorted(scores, reverse=True)
+    assert {r["flora"] for r in results} == {"demo-flora", "demo-flora-sqlite"}
+
+    top = mf.search("nuforc ufo records", limit=2)
+    assert [r["id"] for r in top] == ["git-dataherb-nuforc-ufo-records"] * 2
+    assert [r["flora"] for r in top] == ["demo-flora", "demo-flora-sqlite"]
+
+    assert [
+        (r["flora"], r["id"]) for r in mf.search("data science", min_score=0, limit=3)
+    ] == [(r["flora"], r["id"]) for r in results[:3]]
+
+
+def test_multi_flora_cache(flora_copy):
+    fl = Flora(flora_path=flora_copy)
+    mf = MultiFlora({"loaded": fl, "demo": flora_copy})
+
+    floras = mf.load()
+    assert floras["loaded"] is fl
+    assert mf.load()["demo"] is floras["demo"]
+    assert mf.herb("git-data-science-job").id == "git-data-science-job"
+    assert mf.herb("not-a-herb") is None
+
+
+def test_multi_flora_search_bm25(flora_copy):
+    workdir = flora_copy.parent.parent
+    Flora(flora_path=flora_copy).export(workdir / "flora" / "demo-flora-sqlite.db")
+    mf = MultiFlora.from_workdir(workdir)
+
+    results = mf.search("eurostat freight", ranker="bm25", min_score=0)
+    # the same herb scores the same in both floras on the shared scale
+    assert [(r["id"], r["score"]) for r in results[:2]] == [
+        ("dataset-eurostats-freight-modal-split", 100)
+    ] * 2
+    assert {r["flora"] for r in results[:2]} == {"demo-flora", "demo-flora-sqlite"}
+
+    engine = mf.bm25_engine[0]
+    mf.search("covid", ranker="bm25")
+    assert mf.bm25_engine[0] is engine
+
+    only_git = mf.search("eurostat", ranker="bm25", facets={"source": "git"})
+    assert all(r["herb"].source == "git" for r in only_git)
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from dataherb.flora import Flora
+
+
+@pytest.fixture
+def aggregated_flora(flora_copy):
+    herbs = [
+        json.loads((f / "dataherb.json").read_text())
+        for f in sorted(flora_copy.iterdir())
+        if f.is_dir()
+    ]
+    flora_json = flora_copy.parent / "demo-flora.json"
+    flora_json.write_text(json.dumps(herbs))
+
+    return flora_json
+
+
+def test_journal_add_remove(aggregated_flora):
+    original = aggregated_flora.read_text()
+
+    fl = Flora(flora_path=aggregated_flora)
+    meta = fl.herb_meta("git-data-science-job")
+    meta["id"] = "git-data-science-job-copy"
+    fl.add(meta)
+    fl.remove("dataset-eu-nuts")
+
+    assert aggregated_flora.read_text() == original
+    assert [r["op"] for r in fl.journal.records()] == ["add", "remove"]
+
+    fl_reloaded = Flora(flora_path=aggregated_flora)
+    assert [h.id for h in fl_reloaded.flora] == [h.id for h in fl.flora]
+    assert fl_reloaded.herb("dataset-eu-nuts") is None
+
+    fl_reloaded.compact()
+    assert not fl_reloaded.journal.path.exists()
+    assert {h["id"] for h in json.loads(aggregated_flora.read_text())} == {
+        h.id for h in fl.flora
+    }
+
+    # replaying a journal that was already folded in is harmless
+    fl_reloaded.journal.append_add(meta)
+    assert [h.id for h in Flora(flora_path=aggregated_flora).flora] == [
+        h.id for h in fl.flora
+    ]
+
+
+def test_journal_truncated_record(aggregated_flora):
+    fl = Flora(flora_path=aggregated_flora)
+    fl.remove("dataset-eu-nuts")
+    with open(fl.journal.path, "a") as fp:
+        fp.write('{"op": "remove", "id": "git-data-')
+
+    fl.remove("git-data-science-job")
+
+    ids = [h.id for h in Flora(flora_path=aggregated_flora).flora]
+    assert "dataset-eu-nuts" not in ids
+    assert "git-data-science-job" not in ids
+    assert len(ids) == 7
@@ -0,0 +1,53 @@
+import json
+
+from dataherb.flora import Flora
+from dataherb.storage.snapshot import FloraSnapshot
+
+
+def _herb_paths(flora_path):
+    return sorted(f / "dataherb.json" for f in flora_path.iterdir() if f.is_dir())
+
+
+def _load(paths):
+    return [json.loads(p.read_text()) for p in paths]
+
+
+def test_snapshot_reuses_unchanged_files(flora_copy):
+    paths = _herb_paths(flora_copy)
+
+    snapshot = FloraSnapshot(flora_copy)
+    herbs = snapshot.load(paths, _load)
+    assert snapshot.stats == {"reused": 0, "reloaded": len(paths)}
+    assert snapshot.path.exists()
+
+    meta = json.loads(paths[0].read_text())
+    meta["name"] = "renamed herb"
+    paths[0].write_text(json.dumps(meta))
+
+    snapshot = FloraSnapshot(flora_copy)
+    herbs_reloaded = snapshot.load(paths, _load)
+    assert snapshot.stats == {"reused": len(paths) - 1, "reloaded": 1}
+    assert herbs_reloaded[0][0]["name"] == "renamed herb"
+    assert [h[0]["id"] for h in herbs_reloaded] == [h[0]["id"] for h in herbs]
+
+
+def test_flora_from_snapshot(flora_copy):
+    fl = Flora(flora_path=flora_copy)
+    fl_snapshot = Flora(flora_path=flora_copy, use_snapshot=True)
+    fl_snapshot = Flora(flora_path=flora_copy, use_snapshot=True)
+
+    assert [h.metadata for h in fl_snapshot.flora] == [h.metadata for h in fl.flora]
+    assert [(r["id"], r["score"]) for r in fl_snapshot.search("data science")] == [
+        (r["id"], r["score"]) for r in fl.search("data science")
+    ]
+
+
+def test_aggregated_flora_from_snapshot(flora_copy):
+    flora_json = flora_copy.parent / "demo-flora.json"
+    flora_json.write_text(json.dumps(_load(_herb_paths(flora_copy))))
+
+    fl_snapshot = Flora(flora_path=flora_json, use_snapshot=True)
+    fl_snapshot = Flora(flora_path=flora_json, use_snapshot=True)
+
+    assert (flora_copy.parent / ".demo-flora.json.snapshot").exists()
+    assert fl_snapshot.herb("git-data-science-job").id == "git-data-science-job"
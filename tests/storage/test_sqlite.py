@@ -0,0 +1,115 @@
+import pytest
+
+from dataherb.flora import Flora
+from dataherb.storage.sqlite import SQLiteFloraStore
+
+
+@pytest.fixture
+def sqlite_flora(flora_copy):
+    flora_db = flora_copy.parent / "demo-flora.db"
+    Flora(flora_path=flora_copy).export(flora_db)
+
+    return flora_db
+
+
+def test_sqlite_flora(sqlite_flora, flora_copy):
+    fl_json = Flora(flora_path=flora_copy)
+    fl = Flora(flora_path=sqlite_flora)
+
+    assert len(fl.store) == len(fl_json.flora)
+    assert fl.herb_meta("git-data-science-job") == fl_json.herb_meta(
+        "git-data-science-job"
+    )
+    assert fl._flora is None
+
+    results = fl.search("data science")
+    assert "git-data-science-job" in [r["id"] for r in results]
+    assert set(fl.herbs(["dataset-eu-nuts", "not-a-herb"])) == {"dataset-eu-nuts"}
+
+    assert {h.id for h in fl.flora} == {h.id for h in fl_json.flora}
+
+
+def test_sqlite_flora_add_remove(sqlite_flora):
+    fl = Flora(flora_path=sqlite_flora)
+    meta = fl.herb_meta("git-data-science-job")
+    meta["id"] = "git-data-science-job-copy"
+    meta["tags"] = ["jobs"]
+
+    fl.add(meta)
+    with pytest.raises(Exception):
+        fl.add(meta)
+    assert Flora(flora_path=sqlite_flora).herb("git-data-science-job-copy")
+    assert fl.store.ids_by_tag("jobs") == ["git-data-science-job-copy"]
+
+    fl.remove("git-data-science-job-copy")
+    fl_reloaded = Flora(flora_path=sqlite_flora)
+    assert fl_reloaded.herb("git-data-science-job-copy") is None
+    assert fl_reloaded.store.ids_by_tag("jobs") == []
+
+
+@pytest.mark.parametrize("destination", ["converted.json", "converted"])
+def test_sqlite_flora_export(sqlite_flora, destination):
+    fl = Flora(flora_path=sqlite_flora)
+    fl.export(sqlite_flora.parent / destination)
+
+    fl_converted = Flora(flora_path=sqlite_flora.parent / destination)
+    assert {h.id for h in fl_converted.flora} == set(fl.store.ids())
+
+
+@pytest.mark.parametrize(
+    "keywords, limit", [("data science", None), ("data scince", 3), ("eu", 1)]
+)
+def test_sqlite_flora_search_matches_json(sqlite_flora, flora_copy, keywords, limit):
+    fl_json = Flora(flora_path=flora_copy)
+    fl = Flora(flora_path=sqlite_flora)
+
+    assert [r["id"] for r in fl.search(keywords, limit=limit)] == [
+        r["id"] for r in fl_json.search(keywords, limit=limit)
+    ]
+
+
+def test_sqlite_flora_missing_file(tmp_path):
+    with pytest.raises(Exception):
+        Flora(flora_path=tmp_path / "mistyped.db")
+
+    assert not (tmp_path / "mistyped.db").exists()
+
+
+def test_sqlite_flora_search_facets(flora_copy):
+    fl_json = Flora(flora_path=flora_copy)
+    for id, source, tags in [
+        ("s3-jobs", "s3", ["jobs", "ml"]),
+        ("git-jobs", "git", []),
+    ]:
+        meta = fl_json.herb_meta("git-data-science-job")
+        meta.update({"id": id, "source": source, "tags": tags})
+        fl_json.add(meta)
+    flora_db = flora_copy.parent / "tagged.db"
+    fl_json.export(flora_db)
+    fl = Flora(flora_path=flora_db)
+
+    for facets in [{"tag": "jobs"}, {"tag": ["ML"], "source": "s3"}, {"source": "git"}]:
+        results = fl.search("data scince", facets=facets)
+        assert [r["id"] for r in results] == [
+            r["id"] for r in fl_json.search("data scince", facets=facets)
+        ]
+        assert {r["id"] for r in fl.iter_search("data scince", facets=facets)} == {
+            r["id"] for r in results
+        }
+
+    # only the candidates are loaded from the database
+    fl = Flora(flora_path=flora_db)
+    assert [r["id"] for r in fl.search("jobs", facets={"source": "s3"})] == ["s3-jobs"]
+    assert fl._flora is None
+    assert list(fl._index) == ["s3-jobs"]
+
+    with pytest.raises(Exception):
+        fl.search("data", facets={"color": "green"})
+
+    # facets of files created before the facets were stored
+    with fl.store.connection:
+        fl.store.connection.execute("DELETE FROM herb_facets")
+        fl.store.connection.execute("PRAGMA user_version = 0")
+    fl.store.close()
+    store = SQLiteFloraStore(flora_db)
+    assert store.search_ids(["data"], {"tag": "jobs"}) == ["s3-jobs"]
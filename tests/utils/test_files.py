@@ -0,0 +1,27 @@
+import os
+import stat
+
+from dataherb.utils.files import atomic_write_bytes
+
+
+def test_atomic_write_bytes_new_file_mode(tmp_path):
+    reference = tmp_path / "reference.json"
+    reference.write_bytes(b"[]")
+    path = tmp_path / "flora.json"
+    atomic_write_bytes(path, b"[]")
+
+    assert path.read_bytes() == b"[]"
+    # the same permissions as a file created by open
+    assert stat.S_IMODE(path.stat().st_mode) == stat.S_IMODE(reference.stat().st_mode)
+    assert sorted(tmp_path.iterdir()) == [path, reference]
+
+
+def test_atomic_write_bytes_keeps_mode(tmp_path):
+    path = tmp_path / "dataherb.json"
+    path.write_bytes(b"{}")
+    os.chmod(path, 0o644)
+
+    atomic_write_bytes(path, b'{"id": "x"}')
+
+    assert path.read_bytes() == b'{"id": "x"}'
+    assert stat.S_IMODE(path.stat().st_mode) == 0o644